@@ -2,7 +2,6 @@
 import tempfile
 import asyncio
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from autogen_agentchat.agents import AssistantAgent, CodeExecutorAgent
 from autogen_agentchat.base import TaskResult
@@ -12,9 +11,9 @@ from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core import EVENT_LOGGER_NAME
 from autogen_ext.code_executors.azure import ACADynamicSessionsCodeExecutor
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
 
 import logging
 
@@ -30,20 +29,7 @@ logging.basicConfig()
 
 # https://microsoft.github.io/autogen/stable/user-guide/core-user-guide/design-patterns/code-execution-groupchat.html
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o-2024-11-20",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o-2024-11-20", api_version="2024-06-01")
 
 
 
@@ -64,7 +50,7 @@ async def main():
         executor = ACADynamicSessionsCodeExecutor(
             work_dir=work_dir,
             pool_management_endpoint=config.aca_dynamic_sessions_pool_endpoint(),
-            credential=DefaultAzureCredential()
+            credential=factory.azure_credential()
         )
         executor_agent = CodeExecutorAgent(
             "executor_agent", code_executor=executor)
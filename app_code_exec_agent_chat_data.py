@@ -4,21 +4,20 @@ import json
 import os
 import tempfile
 import asyncio
-from typing import Sequence
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from autogen_agentchat.agents import AssistantAgent, CodeExecutorAgent
-from autogen_agentchat.base import TaskResult, TerminatedException, TerminationCondition
+from autogen_agentchat.base import TaskResult
 from autogen_agentchat.conditions import TextMentionTermination, MaxMessageTermination
-from autogen_agentchat.messages import TextMessage, AgentEvent, ChatMessage, StopMessage, MultiModalMessage
+from autogen_agentchat.messages import TextMessage
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_agentchat.ui import Console
 from autogen_core import EVENT_LOGGER_NAME, CancellationToken
 from autogen_ext.code_executors.azure import ACADynamicSessionsCodeExecutor
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.termination import TextContentTermination
 
 import logging
 
@@ -34,65 +33,7 @@ logging.basicConfig()
 
 # https://microsoft.github.io/autogen/stable/user-guide/core-user-guide/design-patterns/code-execution-groupchat.html
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o-2024-11-20",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
-
-
-class TextContentTermination(TerminationCondition):
-    """Terminate the conversation if a specific text is returned.
-
-
-    Args:
-        text: The text to compare the message to.
-        sources: Check only messages of the specified agents for the text to look for.
-    """
-
-    def __init__(self, text: str, sources: Sequence[str] | None = None) -> None:
-        self._termination_text = text
-        self._terminated = False
-        self._sources = sources
-
-    @property
-    def terminated(self) -> bool:
-        return self._terminated
-
-    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
-        if self._terminated:
-            raise TerminatedException(
-                "Termination condition has already been reached")
-        for message in messages:
-            if self._sources is not None and message.source not in self._sources:
-                continue
-
-            if isinstance(message.content, str) and self._termination_text == message.content:
-                self._terminated = True
-                return StopMessage(
-                    content=f"Text '{self._termination_text}' mentioned", source="TextMentionTermination"
-                )
-            elif isinstance(message, MultiModalMessage):
-                for item in message.content:
-                    if isinstance(item, str) and self._termination_text == item:
-                        self._terminated = True
-                        return StopMessage(
-                            content=f"Text '{self._termination_text}' mentioned", source="TextMentionTermination"
-                        )
-        return None
-
-    async def reset(self) -> None:
-        self._terminated = False
-
+model_client = factory.model_client(model="gpt-4o-2024-11-20", api_version="2024-06-01")
 
 
 def temp_dir():
@@ -147,7 +88,7 @@ async def main():
         executor = ACADynamicSessionsCodeExecutor(
             work_dir=work_dir,
             pool_management_endpoint=config.aca_dynamic_sessions_pool_endpoint(),
-            credential=DefaultAzureCredential(),
+            credential=factory.azure_credential(),
             # suppress_result_output=True,
         )
         # Get the path to batches.csv file (in the same directory as this script)
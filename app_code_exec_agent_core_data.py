@@ -2,7 +2,7 @@
 import os
 from autogen_ext.code_executors.docker import DockerCommandLineCodeExecutor
 from autogen_ext.code_executors.azure import ACADynamicSessionsCodeExecutor
-from autogen_core import CancellationToken, SingleThreadedAgentRuntime
+from autogen_core import CancellationToken
 import tempfile
 import asyncio
 import re
@@ -11,6 +11,7 @@ from typing import List
 
 from autogen_core import DefaultTopicId, MessageContext, RoutedAgent, default_subscription, message_handler
 from autogen_core.code_executor import CodeBlock, CodeExecutor
+from autogen_core.model_context import UnboundedChatCompletionContext
 from autogen_core.models import (
     AssistantMessage,
     ChatCompletionClient,
@@ -18,37 +19,23 @@ from autogen_core.models import (
     SystemMessage,
     UserMessage,
 )
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.deadline import DeadlineExceeded, TurnDeadline, deadline_after
+from auto_gen_explore.agents.token_budget import TokenBudgetedChatCompletionContext
+from auto_gen_explore.runtime.profiler import single_threaded_runtime
 
 
 # https://microsoft.github.io/autogen/stable/user-guide/core-user-guide/design-patterns/code-execution-groupchat.html
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o-2024-11-20",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
-
-cancellation_token = CancellationToken()
-
+model_client = factory.model_client(model="gpt-4o-2024-11-20", api_version="2024-06-01")
 
 @dataclass
 class Message:
     content: str
+    deadline: float | None = None  # time.time() by which the task should be completed
 
 
 @default_subscription
@@ -56,7 +43,7 @@ class Assistant(RoutedAgent):
     def __init__(self, model_client: ChatCompletionClient) -> None:
         super().__init__("An assistant agent.")
         self._model_client = model_client
-        self._chat_history: List[LLMMessage] = [
+        self._system_messages: List[LLMMessage] = [
             SystemMessage(
                 content="""Write Python script in markdown block, and it will be executed.
 Always save figures to file in the current directory. Do not use plt.show(). All code required to complete this task must be contained within a single response.
@@ -75,17 +62,28 @@ Always save figures to file in the current directory. Do not use plt.show(). All
 """,
             )
         ]
+        token_budget = config.model_context_token_budget()
+        self._model_context = UnboundedChatCompletionContext() if token_budget is None else \
+            TokenBudgetedChatCompletionContext(token_budget=token_budget, model_client=model_client)
 
     @message_handler
     async def handle_message(self, message: Message, ctx: MessageContext) -> None:
-        self._chat_history.append(UserMessage(
+        await self._model_context.add_message(UserMessage(
             content=message.content, source="user"))
-        result = await self._model_client.create(self._chat_history)
+        with TurnDeadline(message.deadline, ctx.cancellation_token) as deadline:
+            try:
+                result = await deadline.run(self._model_client.create(
+                    self._system_messages + await self._model_context.get_messages(),
+                    cancellation_token=deadline.cancellation_token))
+            except DeadlineExceeded:
+                # the results so far have been printed as they were produced
+                print(f"\n{'-'*80}\nAssistant:\nDeadline exceeded - stopping with the results so far")
+                return
         print(f"\n{'-'*80}\nAssistant:\n{result.content}")
-        self._chat_history.append(AssistantMessage(
+        await self._model_context.add_message(AssistantMessage(
             content=result.content, source="assistant"))  # type: ignore
         # type: ignore
-        await self.publish_message(Message(content=result.content), DefaultTopicId())
+        await self.publish_message(Message(content=result.content, deadline=message.deadline), DefaultTopicId())
 
 
 def extract_markdown_code_blocks(markdown_text: str) -> List[CodeBlock]:
@@ -110,18 +108,23 @@ class Executor(RoutedAgent):
         code_blocks = extract_markdown_code_blocks(message.content)
         # print(code_blocks)
         if code_blocks:
-            result = await self._code_executor.execute_code_blocks(
-                code_blocks, cancellation_token=ctx.cancellation_token
-            )
-            print(f"\n{'-'*80}\nExecutor:\n{result.output}")
-            
-            e: ACADynamicSessionsCodeExecutor = self._code_executor
-            files = await e.get_file_list(cancellation_token)
-            print(f"Files: {files}")
-            downloaded_files = await e.download_files(files, cancellation_token)
-            print(f"Downloaded files: {downloaded_files}")
-            
-            await self.publish_message(Message(content=result.output), DefaultTopicId())
+            with TurnDeadline(message.deadline, ctx.cancellation_token) as deadline:
+                try:
+                    result = await deadline.run(self._code_executor.execute_code_blocks(
+                        code_blocks, cancellation_token=deadline.cancellation_token
+                    ))
+                    print(f"\n{'-'*80}\nExecutor:\n{result.output}")
+
+                    e: ACADynamicSessionsCodeExecutor = self._code_executor
+                    files = await deadline.run(e.get_file_list(deadline.cancellation_token))
+                    print(f"Files: {files}")
+                    downloaded_files = await deadline.run(e.download_files(files, deadline.cancellation_token))
+                    print(f"Downloaded files: {downloaded_files}")
+                except DeadlineExceeded:
+                    print(f"\n{'-'*80}\nExecutor:\nDeadline exceeded - stopping with the results so far")
+                    return
+
+            await self.publish_message(Message(content=result.output, deadline=message.deadline), DefaultTopicId())
 
 def make_temp_dir():
     """Create a temporary directory for the work_dir under temp_dir in the current folder ."""
@@ -149,16 +152,17 @@ async def main(): # aca ds executor
     print(f"Using work_dir: {work_dir}")
 
     # Create an local embedded runtime.
-    runtime = SingleThreadedAgentRuntime()
+    profiler = factory.runtime_profiler()
+    runtime = single_threaded_runtime(profiler)
 
     executor = ACADynamicSessionsCodeExecutor(
         work_dir=work_dir,
         pool_management_endpoint=config.aca_dynamic_sessions_pool_endpoint(),
-        credential=DefaultAzureCredential()
+        credential=factory.azure_credential()
     )
     # Get the path to batches.csv file (in the same directory as this script)
     batches_path = os.path.join(os.path.dirname(__file__), "batches.csv")
-    await executor.upload_files([batches_path],cancellation_token=cancellation_token)
+    await executor.upload_files([batches_path],cancellation_token=CancellationToken())
 
     # Register the assistant and executor agents by providing
     # their agent types, the factory functions for creating instance and subscriptions.
@@ -179,9 +183,13 @@ async def main(): # aca ds executor
             # "Show the total time to manufacture each end batch"), DefaultTopicId()
             # "Determine which batches would have the biggest impact on the end batch manufacturing time if they were delayed"), DefaultTopicId()
             # "Determine which batches would have the biggest impact on the end batch manufacturing time if they were delayed. Plot the top five batches on a bar chart."), DefaultTopicId()
-            "Determine which batches would have the biggest impact on the end batch manufacturing time if they were delayed. Plot the top five batches on a bar chart using the description as the batch label."), DefaultTopicId()
+            "Determine which batches would have the biggest impact on the end batch manufacturing time if they were delayed. Plot the top five batches on a bar chart using the description as the batch label.",
+            deadline=deadline_after(config.turn_deadline_seconds())), DefaultTopicId()
     )
     await runtime.stop_when_idle()
+    if profiler is not None:
+        profiler.report()
+        profiler.close()
 
 
 asyncio.run(main())
@@ -7,22 +7,22 @@ from anyio import open_file
 from autogen_core import CancellationToken
 from autogen_core.code_executor import CodeBlock
 from autogen_ext.code_executors.azure import ACADynamicSessionsCodeExecutor
-from azure.identity import DefaultAzureCredential
 from azure.core.credentials import AccessToken
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.deadline import DeadlineExceeded, TurnDeadline
 
 # https://microsoft.github.io/autogen/stable/user-guide/extensions-user-guide/azure-container-code-executor.html
 # https://learn.microsoft.com/en-us/azure/container-apps/sessions-tutorial-autogen
 
-cancellation_token = CancellationToken()
 POOL_MANAGEMENT_ENDPOINT = config.aca_dynamic_sessions_pool_endpoint()
 
 
-async def main1():
+async def main1(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
 
         code_blocks = [
@@ -32,7 +32,7 @@ async def main1():
         assert code_result.exit_code == 0 and "hello world!" in code_result.output
 
 
-async def main2():
+async def main2(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         test_file_1 = "test_upload_1.txt"
         test_file_1_contents = "test1 contents"
@@ -50,7 +50,7 @@ async def main2():
         assert os.path.isfile(os.path.join(temp_dir, test_file_2))
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
         await executor.upload_files([test_file_1, test_file_2], cancellation_token)
 
@@ -76,7 +76,7 @@ with open("{test_file_2}") as f:
         assert test_file_2_contents in code_result.output
 
 
-async def main3():
+async def main3(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         test_file_1 = "test_upload_1.txt"
         test_file_1_contents = "test1 contents"
@@ -87,7 +87,7 @@ async def main3():
         assert not os.path.isfile(os.path.join(temp_dir, test_file_2))
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
 
         code_blocks = [
@@ -124,12 +124,12 @@ with open("{test_file_2}", "w") as f:
             assert test_file_2_contents in content
 
 
-async def main4():
+async def main4(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Using work_dir: {temp_dir}")
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
 
         code_blocks = [
@@ -157,12 +157,12 @@ with open("packages.txt", "w") as f:
                 print(f"=============== {file} =======================\n{content}")
         input("Press Enter to continue...")
 
-async def main5():
+async def main5(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Using work_dir: {temp_dir}")
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
 
         code_blocks = [
@@ -180,12 +180,12 @@ print(foo)
         input("Press Enter to continue...")
 
 
-async def main6():
+async def main6(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Using work_dir: {temp_dir}")
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
         batches_path = os.path.join(os.path.dirname(__file__), "batches.csv")
         await executor.upload_files([batches_path], cancellation_token=cancellation_token)
@@ -196,12 +196,12 @@ async def main6():
         print(f"Executed: {code_result}")
         input("Press Enter to continue...")
 
-async def main7():
+async def main7(cancellation_token: CancellationToken):
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"Using work_dir: {temp_dir}")
 
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
         code_blocks = [
             CodeBlock(code='with open("output.txt" , "w") as f:\n\tf.write("hello world")\nprint(os.getcwd())\nprint(os.listdir(os.getcwd()))\n', language="python")]
@@ -210,6 +210,14 @@ async def main7():
         input("Press Enter to continue...")
 
 
+async def run_with_deadline(main):
+    """Run `main` with a cancellation token that's cancelled when the turn deadline passes"""
+    with TurnDeadline.after(config.turn_deadline_seconds()) as deadline:
+        try:
+            await deadline.run(main(deadline.cancellation_token))
+        except DeadlineExceeded:
+            print("Deadline exceeded - outstanding calls cancelled (the output above is what completed)")
+
 
 # output current directory
 # print(os.getcwd())
@@ -217,10 +225,10 @@ async def main7():
 # print(os.listdir(os.getcwd()))
 
 
-# asyncio.run(main1())
-# asyncio.run(main2())
-# asyncio.run(main3())
-# asyncio.run(main4())
-# asyncio.run(main5())
-# asyncio.run(main6())
-asyncio.run(main7())
+# asyncio.run(run_with_deadline(main1))
+# asyncio.run(run_with_deadline(main2))
+# asyncio.run(run_with_deadline(main3))
+# asyncio.run(run_with_deadline(main4))
+# asyncio.run(run_with_deadline(main5))
+# asyncio.run(run_with_deadline(main6))
+asyncio.run(run_with_deadline(main7))
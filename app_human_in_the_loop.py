@@ -1,12 +1,7 @@
 import asyncio
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from auto_gen_explore import config
-
-
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from auto_gen_explore.models import factory
 
 
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
@@ -15,26 +10,14 @@ from autogen_agentchat.ui import Console
 
 from autogen_agentchat.conditions import TextMentionTermination
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
 assistant = AssistantAgent("assistant", model_client=model_client)
-def user_input(prompt: str) -> str:
-    return input(prompt + "\n> ")
+# Console input (or HUMAN_INPUT_SCRIPT) without blocking the event loop while waiting for the user.
+input_provider = factory.human_input_provider()
+session_id = "console"
 
-user_proxy = UserProxyAgent("user_proxy", input_func=user_input)  # Use input() to get user input from console.
+user_proxy = UserProxyAgent("user_proxy", input_func=input_provider.input_func(session_id))
 
 # Create the termination condition which will end the conversation when the user says "APPROVE".
 termination = TextMentionTermination("APPROVE")
@@ -63,7 +46,7 @@ async def main_feedback_between_runs():
         # Use asyncio.run(...) when running in a script.
         await Console(stream)
         # Get the user response.
-        task = input("Enter your feedback (type 'exit' to leave): ")
+        task = await input_provider.get_input(session_id, "Enter your feedback (type 'exit' to leave): ")
         if task.lower().strip() == "exit":
             break
 
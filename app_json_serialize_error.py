@@ -1,42 +1,23 @@
 import asyncio
 import json
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import HandoffTermination
 from autogen_agentchat.teams import RoundRobinGroupChat
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import MaxMessageTermination
 from autogen_agentchat.teams import RoundRobinGroupChat, Swarm
 from autogen_agentchat.ui import Console
 
-from auto_gen_explore import config
+from auto_gen_explore.models import factory
 
 # Testing the serialization of the state of the team and swarm as part of tracking down an error
 # https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/state.html#saving-and-loading-teams
 
 
-# Create the token provider
-api_key = config.openai_key_if_set()
-if api_key:
-    token_provider = None
-else:
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-    
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,
-    api_key=api_key,
-)
+model_client = factory.model_client()
 
 
 async def main1():
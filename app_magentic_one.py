@@ -9,7 +9,12 @@ from dataclasses import dataclass
 from typing import List
 
 from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.teams.magentic_one import MagenticOne
+from autogen_agentchat.agents import CodeExecutorAgent
+from autogen_agentchat.base import TerminationCondition
+from autogen_agentchat.teams import MagenticOneGroupChat
+from autogen_ext.agents.file_surfer import FileSurfer
+from autogen_ext.agents.magentic_one import MagenticOneCoderAgent
+from autogen_ext.agents.web_surfer import MultimodalWebSurfer
 from autogen_agentchat.ui import Console
 from autogen_core import DefaultTopicId, MessageContext, RoutedAgent, default_subscription, message_handler
 from autogen_core.code_executor import CodeBlock, CodeExecutor
@@ -20,44 +25,42 @@ from autogen_core.models import (
     SystemMessage,
     UserMessage,
 )
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
 
 
 # https://microsoft.github.io/autogen/stable/user-guide/core-user-guide/design-patterns/code-execution-groupchat.html
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
 POOL_MANAGEMENT_ENDPOINT = config.aca_dynamic_sessions_pool_endpoint()
 
 
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    # model="gpt-4o",
-    model="gpt-4o-2024-11-20",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o-2024-11-20", api_version="2024-06-01")
+
 
+def magentic_one_team(client: ChatCompletionClient, code_executor: CodeExecutor,
+                      termination_condition: TerminationCondition | None) -> MagenticOneGroupChat:
+    """The team autogen_ext.teams.magentic_one.MagenticOne creates, with a termination condition (MagenticOne doesn't take one)"""
+    return MagenticOneGroupChat(
+        [
+            FileSurfer("FileSurfer", model_client=client),
+            MultimodalWebSurfer("WebSurfer", model_client=client),
+            MagenticOneCoderAgent("Coder", model_client=client),
+            CodeExecutorAgent("ComputerTerminal", code_executor=code_executor),
+        ],
+        model_client=client,
+        termination_condition=termination_condition,
+    )
 
 
 async def example_usage():
     with tempfile.TemporaryDirectory() as temp_dir:
         # executor = DockerCommandLineCodeExecutor()
         executor = ACADynamicSessionsCodeExecutor(
-            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=DefaultAzureCredential(), work_dir=temp_dir
+            pool_management_endpoint=POOL_MANAGEMENT_ENDPOINT, credential=factory.azure_credential(), work_dir=temp_dir
         )
-        m1 = MagenticOne(client=model_client, code_executor=executor)
+        m1 = magentic_one_team(model_client, executor, factory.team_budget_termination())
         # task = "Write a Python script to fetch data from an API."
         # task = "Find the class times for Purple Salsa tonight."
         task = "What python packages are installed?"
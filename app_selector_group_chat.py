@@ -1,13 +1,9 @@
 import asyncio
 from typing import Sequence
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from auto_gen_explore import config
-
-
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.termination import with_budget
 
 
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
@@ -17,20 +13,7 @@ from autogen_agentchat.teams import SelectorGroupChat
 from autogen_agentchat.ui import Console
 
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
 
 # https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/selector-group-chat.html
@@ -63,7 +46,7 @@ def percentage_change_tool(start: float, end: float) -> float:
 planning_agent = AssistantAgent(
     "PlanningAgent",
     description="An agent for planning tasks, this agent should be the first to engage when given a new task.",
-    model_client=model_client,
+    model_client=factory.agent_model_client("PlanningAgent", model="gpt-4o", api_version="2024-06-01"),
     system_message="""
     You are a planning agent.
     Your job is to break down complex tasks into smaller, manageable subtasks.
@@ -108,7 +91,7 @@ data_analyst_agent = AssistantAgent(
 # configure termination
 text_mention_termination = TextMentionTermination("TERMINATE")
 max_messages_termination = MaxMessageTermination(max_messages=25)
-termination = text_mention_termination | max_messages_termination
+termination = with_budget(text_mention_termination | max_messages_termination, factory.team_budget_termination())
 
 # set up selector chat
 
@@ -134,6 +117,7 @@ def selector_func(messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
 user_proxy_agent = UserProxyAgent(
     "UserProxyAgent",
     description="A proxy for the user to approve or disapprove tasks.",
+    input_func=factory.human_input_provider().input_func("console"),
 )
 
 
@@ -157,7 +141,7 @@ def selector_func_with_user_proxy(messages: Sequence[AgentEvent | ChatMessage])
 team = SelectorGroupChat(
     # [planning_agent, web_search_agent, data_analyst_agent],
     [planning_agent, web_search_agent, data_analyst_agent, user_proxy_agent],
-    model_client=model_client,
+    model_client=factory.agent_model_client("selector", model="gpt-4o", api_version="2024-06-01"),
     termination_condition=termination,
     selector_prompt=selector_prompt,
     # Allow an agent to speak multiple turns in a row.
@@ -1,19 +1,15 @@
 import asyncio
 import logging
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-
-from typing import Sequence
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import HandoffTermination
-from autogen_agentchat.base import TerminationCondition, TerminatedException
-from autogen_agentchat.messages import HandoffMessage, AgentEvent, ChatMessage, StopMessage, TextMessage
+from autogen_agentchat.messages import HandoffMessage, TextMessage
 from autogen_agentchat.teams import Swarm
 from autogen_agentchat.ui import Console
 from autogen_core.memory import ListMemory, MemoryContent, MemoryMimeType
 # from autogen_ext.memory.chromadb import ChromaDBVectorMemory, PersistentChromaDBVectorMemoryConfig
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
 from auto_gen_explore.memory import ListMemory2
 from auto_gen_explore.plugins.lights import LightsPlugin
 from auto_gen_explore.plugins.meals import MealsPlugin
@@ -37,25 +33,7 @@ logging.basicConfig(
 logging.getLogger("kernel").setLevel(config.semantic_kernel_log_level())
 logging.getLogger("AIAgent").setLevel(config.agent_log_level())
 
-# Create the token provider
-api_key = config.openai_key_if_set()
-if api_key:
-    token_provider = None
-else:
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    api_key=api_key,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client()
 
 lights_plugin = LightsPlugin()
 meals_plugin = MealsPlugin()
@@ -63,7 +41,7 @@ meals_plugin = MealsPlugin()
 
 triage_agent = AssistantAgent(
     "triage_agent",
-    model_client=model_client,
+    model_client=factory.agent_model_client("triage_agent"),
     system_message="You are a bot to help users. "
     "Introduce yourself. Always be very brief. "
     "For food related questions, transfer to the meals agent. "
@@ -119,39 +97,6 @@ meals_agent = AssistantAgent(
 )
 # user_agent = UserProxyAgent("user")
 
-class AgentTextMessageTermination(TerminationCondition):
-    """Class that attempts to inject a handoff to the user agent when a text message is received from the agent"""
-
-
-    def __init__(self) -> None:
-        self._terminated = False
-
-    @property
-    def terminated(self) -> bool:
-        return self._terminated
-
-    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
-        if self.terminated:
-            raise TerminatedException("Termination condition has already been reached")
-        if len(messages) == 0:
-            return None
-        # # print(f"{yellow}!!!messages {messages} {reset}")
-        print(f"{yellow}!!!messages-start")
-        for message in messages:
-            print(f"  {message}")
-        print(f"{yellow}!!!messages-end {reset}")
-        
-        # Stop on first text message not from user
-        # May want to change this to stop on first message that isn't handoff or function call etc
-        if isinstance(messages[-1], TextMessage) and messages[-1].source != "user":
-            # self._terminated = True
-            # raise TerminatedException("Got TextMessage")
-            return StopMessage(content="TextMessage received", source=self.__class__.__name__)
-            # return HandoffMessage(target="user", source=self.__class__.__name__, content="TextMessage received from agent - ask user for input")
-
-    async def reset(self) -> None:
-        self._terminated = False
-
 termination=HandoffTermination(target="user")
 # termination=HandoffTermination(target="user") | AgentTextMessageTermination()
 team=Swarm(
@@ -1,7 +1,5 @@
 import asyncio
 import logging
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from typing import Any, Dict, List
 
@@ -10,6 +8,8 @@ from autogen_agentchat.conditions import TextMentionTermination
 from autogen_agentchat.teams import Swarm
 from autogen_agentchat.ui import Console
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.termination import with_budget
 
 ##https://en.wikipedia.org/wiki/ANSI_escape_code#8-bit
 grey = '\x1b[38;5;8m'
@@ -29,20 +29,7 @@ logging.basicConfig(
 logging.getLogger("kernel").setLevel(config.semantic_kernel_log_level())
 logging.getLogger("AIAgent").setLevel(config.agent_log_level())
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client()
 
 
 # https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/swarm.html
@@ -120,7 +107,7 @@ writer = AssistantAgent(
 
 # Define termination condition
 text_termination = TextMentionTermination("TERMINATE")
-termination = text_termination
+termination = with_budget(text_termination, factory.team_budget_termination())
 
 research_team = Swarm(
     participants=[planner, financial_analyst, news_analyst, writer], termination_condition=termination
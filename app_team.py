@@ -1,12 +1,8 @@
 import asyncio
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from auto_gen_explore import config
-
-
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.termination import with_budget
 
 
 from autogen_agentchat.agents import AssistantAgent
@@ -17,20 +13,7 @@ from autogen_core import CancellationToken
 
 from autogen_agentchat.conditions import ExternalTermination, TextMentionTermination
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
 # Create the primary agent.
 primary_agent = AssistantAgent(
@@ -50,7 +33,8 @@ critic_agent = AssistantAgent(
 text_termination = TextMentionTermination("APPROVE")
 
 # Create a team with the primary and critic agents.
-team = RoundRobinGroupChat([primary_agent, critic_agent], termination_condition=text_termination)
+team = RoundRobinGroupChat([primary_agent, critic_agent],
+                           termination_condition=with_budget(text_termination, factory.team_budget_termination()))
 
 async def main_simple():
     result = await team.run(task="Write a short poem about the fall season.")
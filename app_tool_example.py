@@ -1,31 +1,17 @@
 import asyncio
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from auto_gen_explore import config
+from auto_gen_explore.models import factory
 
 
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from autogen_core.model_context import BufferedChatCompletionContext
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
 
 
-# Create the token provider
-token_provider = get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-	azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,  # Optional if you choose key-based authentication.
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
 
 
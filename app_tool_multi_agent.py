@@ -2,13 +2,10 @@ import asyncio
 import logging
 from typing import Sequence
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from auto_gen_explore import config
-
-
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.termination import with_budget
 
 
 from autogen_agentchat.agents import AssistantAgent
@@ -33,18 +30,7 @@ logging.getLogger(
     "auto_gen_explore.plugins.meals").setLevel(config.meal_plugin_log_level())
 
 
-# Create the token provider
-token_provider = get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-	azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,  # Optional if you choose key-based authentication.
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
 
 lights_plugin = LightsPlugin()
@@ -53,7 +39,7 @@ meals_plugin = MealsPlugin()
 # an alternative to omni_agent is to have multiple agents with a planner
 planning_agent = AssistantAgent(
     name="PlanningAgent",
-    model_client=model_client,
+    model_client=factory.agent_model_client("PlanningAgent", model="gpt-4o", api_version="2024-06-01"),
     system_message="""
     You are a planning agent.
     Your job is to break down complex tasks into smaller, manageable subtasks for other agents to perform.
@@ -109,11 +95,11 @@ def selector_func(messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
 
 text_mention_termination = TextMentionTermination("TERMINATE")
 max_messages_termination = MaxMessageTermination(max_messages=25)
-termination = text_mention_termination | max_messages_termination
+termination = with_budget(text_mention_termination | max_messages_termination, factory.team_budget_termination())
 
 team = SelectorGroupChat(
     [planning_agent, lights_agent, meals_agent],
-    model_client=model_client,
+    model_client=factory.agent_model_client("selector", model="gpt-4o", api_version="2024-06-01"),
     termination_condition=termination,
     selector_prompt=selector_prompt,
     # Allow an agent to speak multiple turns in a row.
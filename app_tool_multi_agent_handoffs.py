@@ -1,22 +1,32 @@
 import asyncio
 import json
 import logging
+import os
 import uuid
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
 from autogen_core.tools import FunctionTool, Tool
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from pydantic import BaseModel
 
 from auto_gen_explore import config
-
-from autogen_core import (FunctionCall, MessageContext, RoutedAgent,
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.conversation_store import ConversationRef, ConversationStore
+from auto_gen_explore.agents.deadline import DeadlineExceeded, TurnDeadline, deadline_after, partial_results_reply
+from auto_gen_explore.agents.human_input import HumanInputProvider
+from auto_gen_explore.agents.token_budget import MessageTokenCounter, trim_to_budget
+from auto_gen_explore.agents.tool_execution import ToolExecutor, tool_concurrency
+from auto_gen_explore.agents.tool_loop_budget import ToolLoopError
+from auto_gen_explore.models.prompt_cache import canonical_tool_schemas
+from auto_gen_explore.runtime.profiler import RuntimeProfiler, single_threaded_runtime
+from auto_gen_explore.runtime.distributed import (DistributedAgentWorkers, RemoteConversationStore, SessionEndWatcher,
+                                                  serve_conversation_store, start_agent_host, start_worker_runtime)
+
+from autogen_core import (AgentInstantiationContext, AgentRuntime, FunctionCall, MessageContext, RoutedAgent,
                           SingleThreadedAgentRuntime, TopicId,
                           TypeSubscription, message_handler)
-from autogen_core.models import (AssistantMessage, ChatCompletionClient,
+from autogen_core.models import (AssistantMessage, ChatCompletionClient, CreateResult,
                                  FunctionExecutionResult,
-                                 FunctionExecutionResultMessage, LLMMessage,
+                                 FunctionExecutionResultMessage,
                                  SystemMessage, UserMessage)
 
 # Set the logging level for  semantic_kernel.kernel to DEBUG.
@@ -28,18 +38,7 @@ logging.basicConfig(
 # logging.getLogger("httpx").setLevel(logging.INFO) # useful to see the URLs used (e.g. when debugging a 404 for AOAI)
 logging.getLogger("kernel").setLevel(config.semantic_kernel_log_level())
 
-# Create the token provider
-token_provider = get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-	azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,  # Optional if you choose key-based authentication.
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client()
 
 # Messages for agent communication
 
@@ -47,13 +46,16 @@ class UserLogin(BaseModel):
     pass
 
 
+# The conversation is kept in conversation_store - messages only carry a reference to it
 class UserTask(BaseModel):
-    context: List[LLMMessage]
+    conversation: ConversationRef
+    deadline: float | None = None  # time.time() by which the user turn should be completed
 
 
 class AgentResponse(BaseModel):
     reply_to_topic_type: str
-    context: List[LLMMessage]
+    conversation: ConversationRef
+    error: ToolLoopError | None = None  # set if the agent stopped before completing the task
 
 
 
@@ -69,151 +71,209 @@ class AIAgent(RoutedAgent):
         delegate_tools: List[Tool],
         agent_topic_type: str,
         user_topic_type: str,
+        conversation_store: ConversationStore,
     ) -> None:
         super().__init__(description)
         self._system_message = system_message
         self._model_client = model_client
+        self._conversation_store = conversation_store
+        # The conversation can be long - if there's a budget only the most recent messages that fit it are sent
+        self._token_budget = config.model_context_token_budget()
+        self._token_counter = MessageTokenCounter(model_client)
         self._tools = dict([(tool.name, tool) for tool in tools])
-        self._tool_schema = [tool.schema for tool in tools]
+        self._tool_executor = ToolExecutor(self._tools, timeout_seconds=config.tool_call_timeout_seconds())
+        self._tool_loop_guard = factory.tool_loop_guard()
         self._delegate_tools = dict([(tool.name, tool) for tool in delegate_tools])
-        self._delegate_tool_schema = [tool.schema for tool in delegate_tools]
+        # Built once in canonical order so the system message + tools prefix is identical on every call
+        self._tool_schema = canonical_tool_schemas(tools + delegate_tools)
         self._agent_topic_type = agent_topic_type
         self._user_topic_type = user_topic_type
 
+    async def _create(self, conversation: ConversationRef, deadline: TurnDeadline) -> CreateResult:
+        messages = self._conversation_store.get(conversation)
+        if self._token_budget is not None:
+            messages = trim_to_budget(messages, self._token_budget, self._token_counter)
+        return await deadline.run(self._model_client.create(
+            messages=[self._system_message, *messages],
+            tools=self._tool_schema,
+            cancellation_token=deadline.cancellation_token,
+        ))
+
     @message_handler
     async def handle_task(self, message: UserTask, ctx: MessageContext) -> None:
-        # Send the task to the LLM.
-        llm_result = await self._model_client.create(
-            messages=[self._system_message] + message.context,
-            tools=self._tool_schema + self._delegate_tool_schema,
-            cancellation_token=ctx.cancellation_token,
-        )
-        print(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}", flush=True)
-        # Process the LLM result.
-        while isinstance(llm_result.content, list) and all(isinstance(m, FunctionCall) for m in llm_result.content):
-            tool_call_results: List[FunctionExecutionResult] = []
-            delegate_targets: List[Tuple[str, UserTask]] = []
-            # Process each function call.
-            for call in llm_result.content:
-                arguments = json.loads(call.arguments)
-                if call.name in self._tools:
-                    # Execute the tool directly.
-                    result = await self._tools[call.name].run_json(arguments, ctx.cancellation_token)
-                    result_as_str = self._tools[call.name].return_value_as_string(result)
-                    tool_call_results.append(
-                        FunctionExecutionResult(call_id=call.id, content=result_as_str, is_error=False)
-                    )
-                elif call.name in self._delegate_tools:
-                    # Execute the tool to get the delegate agent's topic type.
-                    result = await self._delegate_tools[call.name].run_json(arguments, ctx.cancellation_token)
-                    topic_type = self._delegate_tools[call.name].return_value_as_string(result)
-                    # Create the context for the delegate agent, including the function call and the result.
-                    delegate_messages = list(message.context) + [
-                        AssistantMessage(content=[call], source=self.id.type),
-                        FunctionExecutionResultMessage(
-                            content=[
-                                FunctionExecutionResult(
-                                    call_id=call.id,
-                                    content=f"Transferred to {topic_type}. Adopt persona immediately.",
-                                    is_error=False,
-                                )
-                            ]
-                        ),
-                    ]
-                    delegate_targets.append((topic_type, UserTask(context=delegate_messages)))
-                else:
-                    raise ValueError(f"Unknown tool: {call.name}")
-            if len(delegate_targets) > 0:
-                # Delegate the task to other agents by publishing messages to the corresponding topics.
-                for topic_type, task in delegate_targets:
-                    print(f"{'-'*80}\n{self.id.type}:\nDelegating to {topic_type}", flush=True)
-                    await self.publish_message(task, topic_id=TopicId(topic_type, source=self.id.key))
-            if len(tool_call_results) > 0:
-                print(f"{'-'*80}\n{self.id.type}:\n{tool_call_results}", flush=True)
-                # Make another LLM call with the results.
-                message.context.extend(
-                    [
-                        AssistantMessage(content=llm_result.content, source=self.id.type),
-                        FunctionExecutionResultMessage(content=tool_call_results),
-                    ]
-                )
-                llm_result = await self._model_client.create(
-                    messages=[self._system_message] + message.context,
-                    tools=self._tool_schema + self._delegate_tool_schema,
-                    cancellation_token=ctx.cancellation_token,
-                )
+        conversation = message.conversation
+        error: ToolLoopError | None = None
+        tool_results: List[FunctionExecutionResult] = []  # for the reply if the deadline passes
+        # The number of model/tool round trips, prompt tokens and time for the task are limited, and
+        # model calls and tools are cancelled if the user turn's deadline (or the task's time) runs out.
+        with (self._tool_loop_guard.budget(self.id.type) as budget,
+              TurnDeadline(budget.deadline(message.deadline), ctx.cancellation_token) as deadline):
+            try:
+                # Send the task to the LLM.
+                llm_result = await self._create(conversation, deadline)
+                budget.record(llm_result)
                 print(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}", flush=True)
-            else:
-                # The task has been delegated, so we are done.
-                return
+                # Process the LLM result.
+                while isinstance(llm_result.content, list) and all(isinstance(m, FunctionCall) for m in llm_result.content):
+                    error = budget.check()
+                    if error is not None:
+                        # Stop without running the tools (the calls aren't added to the conversation).
+                        break
+                    tool_calls: List[FunctionCall] = []
+                    delegate_targets: List[Tuple[str, UserTask]] = []
+                    # Process each function call.
+                    for call in llm_result.content:
+                        if call.name in self._tools:
+                            # Tools are executed concurrently below.
+                            tool_calls.append(call)
+                        elif call.name in self._delegate_tools:
+                            arguments = json.loads(call.arguments)
+                            # Execute the tool to get the delegate agent's topic type.
+                            result = await self._delegate_tools[call.name].run_json(arguments, deadline.cancellation_token)
+                            topic_type = self._delegate_tools[call.name].return_value_as_string(result)
+                            # Create the context for the delegate agent, including the function call and the result.
+                            delegate_conversation = self._conversation_store.append(conversation, [
+                                AssistantMessage(content=[call], source=self.id.type),
+                                FunctionExecutionResultMessage(
+                                    content=[
+                                        FunctionExecutionResult(
+                                            call_id=call.id,
+                                            name=call.name,
+                                            content=f"Transferred to {topic_type}. Adopt persona immediately.",
+                                            is_error=False,
+                                        )
+                                    ]
+                                ),
+                            ])
+                            delegate_targets.append((topic_type, UserTask(conversation=delegate_conversation, deadline=message.deadline)))
+                        else:
+                            raise ValueError(f"Unknown tool: {call.name}")
+                    # Execute the tools concurrently (the results keep the call order).
+                    tool_call_results = await self._tool_executor.run(tool_calls, deadline=deadline)
+                    tool_results.extend(tool_call_results)
+                    if len(delegate_targets) > 0:
+                        # Delegate the task to other agents by publishing messages to the corresponding topics.
+                        for topic_type, task in delegate_targets:
+                            print(f"{'-'*80}\n{self.id.type}:\nDelegating to {topic_type}", flush=True)
+                            await self.publish_message(task, topic_id=TopicId(topic_type, source=self.id.key))
+                    if len(tool_call_results) > 0:
+                        print(f"{'-'*80}\n{self.id.type}:\n{tool_call_results}", flush=True)
+                        # Make another LLM call with the results.
+                        conversation = self._conversation_store.append(
+                            conversation,
+                            [
+                                AssistantMessage(content=llm_result.content, source=self.id.type),
+                                FunctionExecutionResultMessage(content=tool_call_results),
+                            ],
+                        )
+                        llm_result = await self._create(conversation, deadline)
+                        budget.record(llm_result)
+                        print(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}", flush=True)
+                    else:
+                        # The task has been delegated, so we are done.
+                        return
+                if error is None:
+                    assert isinstance(llm_result.content, str)
+                    content = llm_result.content
+                else:
+                    content = "Sorry, I wasn't able to complete that - it was taking too many steps. Please try rephrasing the request."
+            except DeadlineExceeded:
+                # The turn's deadline passed - or the task's max_seconds, in which case report the breach
+                error = budget.check()
+                # Reply with what's been done so far (completed tool results are in the conversation).
+                content = partial_results_reply(tool_results)
+                print(f"{'-'*80}\n{self.id.type} (deadline exceeded):\n{content}", flush=True)
         # The task has been completed, publish the final result.
-        assert isinstance(llm_result.content, str)
-        message.context.append(AssistantMessage(content=llm_result.content, source=self.id.type))
+        conversation = self._conversation_store.append(
+            conversation, [AssistantMessage(content=content, source=self.id.type)])
         await self.publish_message(
-            AgentResponse(context=message.context, reply_to_topic_type=self._agent_topic_type),
+            AgentResponse(conversation=conversation, reply_to_topic_type=self._agent_topic_type, error=error),
             topic_id=TopicId(self._user_topic_type, source=self.id.key),
         )
 
 
 class HumanAgent(RoutedAgent):
-    def __init__(self, description: str, agent_topic_type: str, user_topic_type: str) -> None:
+    def __init__(self, description: str, agent_topic_type: str, user_topic_type: str,
+                 conversation_store: ConversationStore, input_provider: HumanInputProvider) -> None:
         super().__init__(description)
         self._agent_topic_type = agent_topic_type
         self._user_topic_type = user_topic_type
+        self._conversation_store = conversation_store
+        self._input_provider = input_provider
 
     @message_handler
     async def handle_user_task(self, message: UserTask, ctx: MessageContext) -> None:
-        human_input = input("Human agent input: ")
+        human_input = await self._input_provider.get_input(self.id.key, "Human agent input: ")
         print(f"{'-'*80}\n{self.id.type}:\n{human_input}", flush=True)
-        message.context.append(AssistantMessage(content=human_input, source=self.id.type))
+        conversation = self._conversation_store.append(
+            message.conversation, [AssistantMessage(content=human_input, source=self.id.type)])
         await self.publish_message(
-            AgentResponse(context=message.context, reply_to_topic_type=self._agent_topic_type),
+            AgentResponse(conversation=conversation, reply_to_topic_type=self._agent_topic_type),
             topic_id=TopicId(self._user_topic_type, source=self.id.key),
         )
 
 
 class UserAgent(RoutedAgent):
-    def __init__(self, description: str, user_topic_type: str, agent_topic_type: str) -> None:
+    def __init__(self, description: str, user_topic_type: str, agent_topic_type: str,
+                 conversation_store: ConversationStore, input_provider: HumanInputProvider) -> None:
         super().__init__(description)
         self._user_topic_type = user_topic_type
         self._agent_topic_type = agent_topic_type
+        self._conversation_store = conversation_store
+        self._input_provider = input_provider
 
     @message_handler
     async def handle_user_login(self, message: UserLogin, ctx: MessageContext) -> None:
         print(f"{'-'*80}\nUser login, session ID: {self.id.key}.", flush=True)
         # Get the user's initial input after login.
-        user_input = input("User: ")
+        user_input = await self._input_provider.get_input(self.id.key, "User: ")
         print(f"{'-'*80}\n{self.id.type}:\n{user_input}")
         await self.publish_message(
-            UserTask(context=[UserMessage(content=user_input, source="User")]),
+            UserTask(conversation=self._conversation_store.start(
+                self.id.key, [UserMessage(content=user_input, source="User")]),
+                deadline=deadline_after(config.turn_deadline_seconds())),
             topic_id=TopicId(self._agent_topic_type, source=self.id.key),
         )
 
     @message_handler
     async def handle_task_result(self, message: AgentResponse, ctx: MessageContext) -> None:
+        if message.error is not None:
+            print(f"{'-'*80}\n{message.error}", flush=True)
         # Get the user's input after receiving a response from an agent.
-        user_input = input("User (type 'exit' to close the session): ")
+        user_input = await self._input_provider.get_input(self.id.key, "User (type 'exit' to close the session): ")
         print(f"{'-'*80}\n{self.id.type}:\n{user_input}", flush=True)
         if user_input.strip().lower() == "exit":
             print(f"{'-'*80}\nUser session ended, session ID: {self.id.key}.")
+            self._conversation_store.end_session(self.id.key)
+            self._input_provider.end_session(self.id.key)
             return
-        message.context.append(UserMessage(content=user_input, source="User"))
+        conversation = self._conversation_store.append(
+            message.conversation, [UserMessage(content=user_input, source="User")])
         await self.publish_message(
-            UserTask(context=message.context), topic_id=TopicId(message.reply_to_topic_type, source=self.id.key)
+            UserTask(conversation=conversation, deadline=deadline_after(config.turn_deadline_seconds())),
+            topic_id=TopicId(message.reply_to_topic_type, source=self.id.key)
         )
 
-def execute_order(product: str, price: int) -> str:
-    print("\n\n=== Order Summary ===")
-    print(f"Product: {product}")
-    print(f"Price: ${price}")
-    print("=================\n")
-    confirm = input("Confirm order? y/n: ").strip().lower()
-    if confirm == "y":
-        print("Order execution successful!")
-        return "Success"
-    else:
-        print("Order cancelled!")
-        return "User cancelled order."
+def create_execute_order_tool(input_provider: HumanInputProvider, session_id: str) -> FunctionTool:
+    """execute_order for a session - the session's user confirms the order through the input provider"""
+
+    # Both print on the console so must not run at the same time (and the user can take as long
+    # as they like to confirm an order, so it has no timeout)
+    @tool_concurrency(group="console", timeout_seconds=0)
+    async def execute_order(product: str, price: int) -> str:
+        print("\n\n=== Order Summary ===")
+        print(f"Product: {product}")
+        print(f"Price: ${price}")
+        print("=================\n")
+        confirm = (await input_provider.get_input(session_id, "Confirm order? y/n: ")).strip().lower()
+        if confirm == "y":
+            print("Order execution successful!")
+            return "Success"
+        else:
+            print("Order cancelled!")
+            return "User cancelled order."
+
+    return FunctionTool(execute_order, description="Price should be in USD.")
 
 
 def look_up_item(search_query: str) -> str:
@@ -222,6 +282,7 @@ def look_up_item(search_query: str) -> str:
     return item_id
 
 
+@tool_concurrency(group="console")
 def execute_refund(item_id: str, reason: str = "not provided") -> str:
     print("\n\n=== Refund Summary ===")
     print(f"Item ID: {item_id}")
@@ -231,7 +292,6 @@ def execute_refund(item_id: str, reason: str = "not provided") -> str:
     return "success"
 
 
-execute_order_tool = FunctionTool(execute_order, description="Price should be in USD.")
 look_up_item_tool = FunctionTool(
     look_up_item, description="Use to find item ID.\nSearch query can be a description or keywords."
 )
@@ -243,6 +303,10 @@ issues_and_repairs_agent_topic_type = "IssuesAndRepairsAgent"
 triage_agent_topic_type = "TriageAgent"
 human_agent_topic_type = "HumanAgent"
 user_topic_type = "User"
+all_agent_types = [triage_agent_topic_type, sales_agent_topic_type, issues_and_repairs_agent_topic_type,
+                   human_agent_topic_type, user_topic_type]
+# The messages the agents publish (serializers are registered for these with the gRPC worker runtime)
+message_types = [UserLogin, UserTask, AgentResponse]
 
 
 def transfer_to_sales_agent() -> str:
@@ -277,120 +341,186 @@ escalate_to_human_tool = FunctionTool(escalate_to_human, description="Only call
 
 # create the team
 
-async def main():
-    runtime = SingleThreadedAgentRuntime()
-
+async def register_agents(runtime: AgentRuntime, agent_types: Sequence[str], conversation_store: ConversationStore,
+                          input_provider: HumanInputProvider | None):
+    """Register the given agent types (and their subscriptions) with the runtime"""
     # Register the triage agent.
-    triage_agent_type = await AIAgent.register(
-        runtime,
-        type=triage_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A triage agent.",
-            system_message=SystemMessage(
-                content="You are a customer service bot for ACME Inc. "
-                "Introduce yourself. Always be very brief. "
-                "Gather information to direct the customer to the right department. "
-                "But make your questions subtle and natural."
+    if triage_agent_topic_type in agent_types:
+        triage_agent_type = await AIAgent.register(
+            runtime,
+            type=triage_agent_topic_type,  # Using the topic type as the agent type.
+            factory=lambda: AIAgent(
+                description="A triage agent.",
+                system_message=SystemMessage(
+                    content="You are a customer service bot for ACME Inc. "
+                    "Introduce yourself. Always be very brief. "
+                    "Gather information to direct the customer to the right department. "
+                    "But make your questions subtle and natural."
+                ),
+                model_client=factory.agent_model_client(triage_agent_topic_type),
+                tools=[],
+                delegate_tools=[
+                    transfer_to_issues_and_repairs_tool,
+                    transfer_to_sales_agent_tool,
+                    escalate_to_human_tool,
+                ],
+                agent_topic_type=triage_agent_topic_type,
+                user_topic_type=user_topic_type,
+                conversation_store=conversation_store,
             ),
-            model_client=model_client,
-            tools=[],
-            delegate_tools=[
-                transfer_to_issues_and_repairs_tool,
-                transfer_to_sales_agent_tool,
-                escalate_to_human_tool,
-            ],
-            agent_topic_type=triage_agent_topic_type,
-            user_topic_type=user_topic_type,
-        ),
-    )
-    # Add subscriptions for the triage agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=triage_agent_topic_type, agent_type=triage_agent_type.type))
+        )
+        # Add subscriptions for the triage agent: it will receive messages published to its own topic only.
+        await runtime.add_subscription(TypeSubscription(topic_type=triage_agent_topic_type, agent_type=triage_agent_type.type))
 
     # Register the sales agent.
-    sales_agent_type = await AIAgent.register(
-        runtime,
-        type=sales_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="A sales agent.",
-            system_message=SystemMessage(
-                content="You are a sales agent for ACME Inc."
-                "Always answer in a sentence or less."
-                "Follow the following routine with the user:"
-                "1. Ask them about any problems in their life related to catching roadrunners.\n"
-                "2. Casually mention one of ACME's crazy made-up products can help.\n"
-                " - Don't mention price.\n"
-                "3. Once the user is bought in, drop a ridiculous price.\n"
-                "4. Only after everything, and if the user says yes, "
-                "tell them a crazy caveat and execute their order.\n"
-                ""
+    if sales_agent_topic_type in agent_types:
+        if input_provider is None:
+            raise ValueError("The sales agent needs an input provider for the user to confirm orders")
+        sales_agent_type = await AIAgent.register(
+            runtime,
+            type=sales_agent_topic_type,  # Using the topic type as the agent type.
+            factory=lambda: AIAgent(
+                description="A sales agent.",
+                system_message=SystemMessage(
+                    content="You are a sales agent for ACME Inc."
+                    "Always answer in a sentence or less."
+                    "Follow the following routine with the user:"
+                    "1. Ask them about any problems in their life related to catching roadrunners.\n"
+                    "2. Casually mention one of ACME's crazy made-up products can help.\n"
+                    " - Don't mention price.\n"
+                    "3. Once the user is bought in, drop a ridiculous price.\n"
+                    "4. Only after everything, and if the user says yes, "
+                    "tell them a crazy caveat and execute their order.\n"
+                    ""
+                ),
+                model_client=model_client,
+                # the agent key is the session id
+                tools=[create_execute_order_tool(input_provider, AgentInstantiationContext.current_agent_id().key)],
+                delegate_tools=[transfer_back_to_triage_tool],
+                agent_topic_type=sales_agent_topic_type,
+                user_topic_type=user_topic_type,
+                conversation_store=conversation_store,
             ),
-            model_client=model_client,
-            tools=[execute_order_tool],
-            delegate_tools=[transfer_back_to_triage_tool],
-            agent_topic_type=sales_agent_topic_type,
-            user_topic_type=user_topic_type,
-        ),
-    )
-    # Add subscriptions for the sales agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=sales_agent_topic_type, agent_type=sales_agent_type.type))
+        )
+        # Add subscriptions for the sales agent: it will receive messages published to its own topic only.
+        await runtime.add_subscription(TypeSubscription(topic_type=sales_agent_topic_type, agent_type=sales_agent_type.type))
 
     # Register the issues and repairs agent.
-    issues_and_repairs_agent_type = await AIAgent.register(
-        runtime,
-        type=issues_and_repairs_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: AIAgent(
-            description="An issues and repairs agent.",
-            system_message=SystemMessage(
-                content="You are a customer support agent for ACME Inc."
-                "Always answer in a sentence or less."
-                "Follow the following routine with the user:"
-                "1. First, ask probing questions and understand the user's problem deeper.\n"
-                " - unless the user has already provided a reason.\n"
-                "2. Propose a fix (make one up).\n"
-                "3. ONLY if not satisfied, offer a refund.\n"
-                "4. If accepted, search for the ID and then execute refund."
+    if issues_and_repairs_agent_topic_type in agent_types:
+        issues_and_repairs_agent_type = await AIAgent.register(
+            runtime,
+            type=issues_and_repairs_agent_topic_type,  # Using the topic type as the agent type.
+            factory=lambda: AIAgent(
+                description="An issues and repairs agent.",
+                system_message=SystemMessage(
+                    content="You are a customer support agent for ACME Inc."
+                    "Always answer in a sentence or less."
+                    "Follow the following routine with the user:"
+                    "1. First, ask probing questions and understand the user's problem deeper.\n"
+                    " - unless the user has already provided a reason.\n"
+                    "2. Propose a fix (make one up).\n"
+                    "3. ONLY if not satisfied, offer a refund.\n"
+                    "4. If accepted, search for the ID and then execute refund."
+                ),
+                model_client=model_client,
+                tools=[
+                    execute_refund_tool,
+                    look_up_item_tool,
+                ],
+                delegate_tools=[transfer_back_to_triage_tool],
+                agent_topic_type=issues_and_repairs_agent_topic_type,
+                user_topic_type=user_topic_type,
+                conversation_store=conversation_store,
             ),
-            model_client=model_client,
-            tools=[
-                execute_refund_tool,
-                look_up_item_tool,
-            ],
-            delegate_tools=[transfer_back_to_triage_tool],
-            agent_topic_type=issues_and_repairs_agent_topic_type,
-            user_topic_type=user_topic_type,
-        ),
-    )
-    # Add subscriptions for the issues and repairs agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(
-        TypeSubscription(topic_type=issues_and_repairs_agent_topic_type, agent_type=issues_and_repairs_agent_type.type)
-    )
+        )
+        # Add subscriptions for the issues and repairs agent: it will receive messages published to its own topic only.
+        await runtime.add_subscription(
+            TypeSubscription(topic_type=issues_and_repairs_agent_topic_type, agent_type=issues_and_repairs_agent_type.type)
+        )
 
     # Register the human agent.
-    human_agent_type = await HumanAgent.register(
-        runtime,
-        type=human_agent_topic_type,  # Using the topic type as the agent type.
-        factory=lambda: HumanAgent(
-            description="A human agent.",
-            agent_topic_type=human_agent_topic_type,
-            user_topic_type=user_topic_type,
-        ),
-    )
-    # Add subscriptions for the human agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=human_agent_topic_type, agent_type=human_agent_type.type))
+    if human_agent_topic_type in agent_types:
+        human_agent_type = await HumanAgent.register(
+            runtime,
+            type=human_agent_topic_type,  # Using the topic type as the agent type.
+            factory=lambda: HumanAgent(
+                description="A human agent.",
+                agent_topic_type=human_agent_topic_type,
+                user_topic_type=user_topic_type,
+                conversation_store=conversation_store,
+                input_provider=input_provider,
+            ),
+        )
+        # Add subscriptions for the human agent: it will receive messages published to its own topic only.
+        await runtime.add_subscription(TypeSubscription(topic_type=human_agent_topic_type, agent_type=human_agent_type.type))
 
     # Register the user agent.
-    user_agent_type = await UserAgent.register(
-        runtime,
-        type=user_topic_type,
-        factory=lambda: UserAgent(
-            description="A user agent.",
-            user_topic_type=user_topic_type,
-            agent_topic_type=triage_agent_topic_type,  # Start with the triage agent.
-        ),
+    if user_topic_type in agent_types:
+        user_agent_type = await UserAgent.register(
+            runtime,
+            type=user_topic_type,
+            factory=lambda: UserAgent(
+                description="A user agent.",
+                user_topic_type=user_topic_type,
+                agent_topic_type=triage_agent_topic_type,  # Start with the triage agent.
+                conversation_store=conversation_store,
+                input_provider=input_provider,
+            ),
+        )
+        # Add subscriptions for the user agent: it will receive messages published to its own topic only.
+        await runtime.add_subscription(TypeSubscription(topic_type=user_topic_type, agent_type=user_agent_type.type))
+
+
+async def create_runtime(input_provider: HumanInputProvider,
+                         profiler: RuntimeProfiler | None = None) -> SingleThreadedAgentRuntime:
+    """Runtime with the agents registered (not started) - sessions are started by publishing UserLogin"""
+    runtime = single_threaded_runtime(profiler)
+    await register_agents(runtime, all_agent_types, ConversationStore(), input_provider)
+    return runtime
+
+
+async def main_distributed():
+    """Run the AI agents in worker processes (one per agent type) behind a local gRPC host
+
+    The user and human agents run in this process as they take the console input - as does the
+    sales agent, as the user confirms orders through the input provider (worker processes have
+    no console).
+    """
+    host_address = config.agent_host_address()
+    store_address = config.conversation_store_address()
+    authkey = os.urandom(16)
+    host = start_agent_host(host_address)
+    serve_conversation_store(store_address, authkey)
+    workers = DistributedAgentWorkers(
+        "app_tool_multi_agent_handoffs",
+        [[triage_agent_topic_type], [issues_and_repairs_agent_topic_type]],
+        host_address, store_address, authkey,
     )
-    # Add subscriptions for the user agent: it will receive messages published to its own topic only.
-    await runtime.add_subscription(TypeSubscription(topic_type=user_topic_type, agent_type=user_agent_type.type))
+    await workers.start()
 
+    input_provider = SessionEndWatcher(factory.human_input_provider())
+    runtime = await start_worker_runtime(host_address, message_types)
+    await register_agents(runtime, [sales_agent_topic_type, human_agent_topic_type, user_topic_type],
+                          RemoteConversationStore(store_address, authkey), input_provider)
+
+    # Create a new session for the user.
+    session_id = str(uuid.uuid4())
+    await runtime.publish_message(UserLogin(), topic_id=TopicId(user_topic_type, source=session_id))
+
+    # Run until the user ends the session.
+    await input_provider.wait_for_session_end(session_id)
+    await runtime.stop()
+    await workers.stop()
+    await host.stop()
+
+
+async def main():
+    if config.handoffs_runtime() == "distributed":
+        await main_distributed()
+        return
+
+    profiler = factory.runtime_profiler()
+    runtime = await create_runtime(factory.human_input_provider(), profiler)
 
     # Start the runtime.
     runtime.start()
@@ -401,7 +531,10 @@ async def main():
 
     # Run until completion.
     await runtime.stop_when_idle()
+    if profiler is not None:
+        profiler.report()
+        profiler.close()
+
 
-    
-    
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,20 +5,27 @@ import uuid
 from typing import List, Tuple
 
 from autogen_core.tools import FunctionTool, Tool
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from pydantic import BaseModel
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.conversation_store import ConversationRef, ConversationStore
+from auto_gen_explore.agents.deadline import DeadlineExceeded, TurnDeadline, deadline_after, partial_results_reply
+from auto_gen_explore.agents.human_input import HumanInputProvider
+from auto_gen_explore.agents.token_budget import MessageTokenCounter, trim_to_budget
+from auto_gen_explore.agents.tool_execution import ToolExecutor
+from auto_gen_explore.agents.tool_loop_budget import ToolLoopError
+from auto_gen_explore.models.prompt_cache import canonical_tool_schemas
+from auto_gen_explore.runtime.profiler import RuntimeProfiler, single_threaded_runtime
 from auto_gen_explore.plugins.lights import LightsPlugin
 from auto_gen_explore.plugins.meals import MealsPlugin
 
 from autogen_core import (FunctionCall, MessageContext, RoutedAgent,
                           SingleThreadedAgentRuntime, TopicId,
                           TypeSubscription, message_handler)
-from autogen_core.models import (AssistantMessage, ChatCompletionClient,
+from autogen_core.models import (AssistantMessage, ChatCompletionClient, CreateResult,
                                  FunctionExecutionResult,
-                                 FunctionExecutionResultMessage, LLMMessage,
+                                 FunctionExecutionResultMessage,
                                  SystemMessage, UserMessage)
 
 ##https://en.wikipedia.org/wiki/ANSI_escape_code#8-bit
@@ -39,20 +46,7 @@ logging.basicConfig(
 logging.getLogger("kernel").setLevel(config.semantic_kernel_log_level())
 logging.getLogger("AIAgent").setLevel(config.agent_log_level())
 
-# Create the token provider
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    # Optional if you choose key-based authentication.
-    azure_ad_token_provider=token_provider,
-    # api_key="sk-...", # For key-based authentication.
-)
+model_client = factory.model_client()
 
 # Messages for agent communication
 
@@ -61,13 +55,16 @@ class UserLogin(BaseModel):
     pass
 
 
+# The conversation is kept in conversation_store - messages only carry a reference to it
 class UserTask(BaseModel):
-    context: List[LLMMessage]
+    conversation: ConversationRef
+    deadline: float | None = None  # time.time() by which the user turn should be completed
 
 
 class AgentResponse(BaseModel):
     reply_to_topic_type: str
-    context: List[LLMMessage]
+    conversation: ConversationRef
+    error: ToolLoopError | None = None  # set if the agent stopped before completing the task
 
 
 # AI Agent
@@ -82,133 +79,174 @@ class AIAgent(RoutedAgent):
         delegate_tools: List[Tool],
         agent_topic_type: str,
         user_topic_type: str,
+        conversation_store: ConversationStore,
     ) -> None:
         super().__init__(description)
         self._logger = logging.getLogger(self.__class__.__name__)
         self._system_message = system_message
         self._model_client = model_client
+        self._conversation_store = conversation_store
+        # The conversation can be long - if there's a budget only the most recent messages that fit it are sent
+        self._token_budget = config.model_context_token_budget()
+        self._token_counter = MessageTokenCounter(model_client)
         self._tools = dict([(tool.name, tool) for tool in tools])
-        self._tool_schema = [tool.schema for tool in tools]
+        self._tool_executor = ToolExecutor(self._tools, timeout_seconds=config.tool_call_timeout_seconds())
+        self._tool_loop_guard = factory.tool_loop_guard()
         self._delegate_tools = dict([(tool.name, tool)
                                     for tool in delegate_tools])
-        self._delegate_tool_schema = [tool.schema for tool in delegate_tools]
+        # Built once in canonical order so the system message + tools prefix is identical on every call
+        self._tool_schema = canonical_tool_schemas(tools + delegate_tools)
         self._agent_topic_type = agent_topic_type
         self._user_topic_type = user_topic_type
 
+    async def _create(self, conversation: ConversationRef, deadline: TurnDeadline) -> CreateResult:
+        messages = self._conversation_store.get(conversation)
+        if self._token_budget is not None:
+            messages = trim_to_budget(messages, self._token_budget, self._token_counter)
+        return await deadline.run(self._model_client.create(
+            messages=[self._system_message, *messages],
+            tools=self._tool_schema,
+            cancellation_token=deadline.cancellation_token,
+        ))
+
     @message_handler
     async def handle_task(self, message: UserTask, ctx: MessageContext) -> None:
-        # Send the task to the LLM.
-        llm_result = await self._model_client.create(
-            messages=[self._system_message] + message.context,
-            tools=self._tool_schema + self._delegate_tool_schema,
-            cancellation_token=ctx.cancellation_token,
-        )
-        self._logger.debug(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}")
-        # Process the LLM result.
-        while isinstance(llm_result.content, list) and all(isinstance(m, FunctionCall) for m in llm_result.content):
-            tool_call_results: List[FunctionExecutionResult] = []
-            delegate_targets: List[Tuple[str, UserTask]] = []
-            # Process each function call.
-            for call in llm_result.content:
-                arguments = json.loads(call.arguments)
-                if call.name in self._tools:
-                    # Execute the tool directly.
-                    result = await self._tools[call.name].run_json(arguments, ctx.cancellation_token)
-                    result_as_str = self._tools[call.name].return_value_as_string(
-                        result)
-                    tool_call_results.append(
-                        FunctionExecutionResult(
-                            call_id=call.id, content=result_as_str, is_error=False)
-                    )
-                elif call.name in self._delegate_tools:
-                    # Execute the tool to get the delegate agent's topic type.
-                    result = await self._delegate_tools[call.name].run_json(arguments, ctx.cancellation_token)
-                    topic_type = self._delegate_tools[call.name].return_value_as_string(
-                        result)
-                    # Create the context for the delegate agent, including the function call and the result.
-                    delegate_messages = list(message.context) + [
-                        AssistantMessage(content=[call], source=self.id.type),
-                        FunctionExecutionResultMessage(
-                            content=[
-                                FunctionExecutionResult(
-                                    call_id=call.id,
-                                    content=f"Transferred to {topic_type}. Adopt persona immediately.",
-                                    is_error=False,
-                                )
-                            ]
-                        ),
-                    ]
-                    delegate_targets.append(
-                        (topic_type, UserTask(context=delegate_messages)))
-                else:
-                    raise ValueError(f"Unknown tool: {call.name}")
-            if len(delegate_targets) > 0:
-                # Delegate the task to other agents by publishing messages to the corresponding topics.
-                for topic_type, task in delegate_targets:
-                    self._logger.debug(
-                        f"{'-'*80}\n{self.id.type}:\nDelegating to {topic_type}")
-                    await self.publish_message(task, topic_id=TopicId(topic_type, source=self.id.key))
-            if len(tool_call_results) > 0:
-                self._logger.debug(f"{'-'*80}\n{self.id.type}:\n{tool_call_results}")
-                # Make another LLM call with the results.
-                message.context.extend(
-                    [
-                        AssistantMessage(
-                            content=llm_result.content, source=self.id.type),
-                        FunctionExecutionResultMessage(
-                            content=tool_call_results),
-                    ]
-                )
-                llm_result = await self._model_client.create(
-                    messages=[self._system_message] + message.context,
-                    tools=self._tool_schema + self._delegate_tool_schema,
-                    cancellation_token=ctx.cancellation_token,
-                )
+        conversation = message.conversation
+        error: ToolLoopError | None = None
+        tool_results: List[FunctionExecutionResult] = []  # for the reply if the deadline passes
+        # The number of model/tool round trips, prompt tokens and time for the task are limited, and
+        # model calls and tools are cancelled if the user turn's deadline (or the task's time) runs out.
+        with (self._tool_loop_guard.budget(self.id.type) as budget,
+              TurnDeadline(budget.deadline(message.deadline), ctx.cancellation_token) as deadline):
+            try:
+                # Send the task to the LLM.
+                llm_result = await self._create(conversation, deadline)
+                budget.record(llm_result)
                 self._logger.debug(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}")
-            else:
-                # The task has been delegated, so we are done.
-                return
+                # Process the LLM result.
+                while isinstance(llm_result.content, list) and all(isinstance(m, FunctionCall) for m in llm_result.content):
+                    error = budget.check()
+                    if error is not None:
+                        # Stop without running the tools (the calls aren't added to the conversation).
+                        break
+                    tool_calls: List[FunctionCall] = []
+                    delegate_targets: List[Tuple[str, UserTask]] = []
+                    # Process each function call.
+                    for call in llm_result.content:
+                        if call.name in self._tools:
+                            # Tools are executed concurrently below.
+                            tool_calls.append(call)
+                        elif call.name in self._delegate_tools:
+                            arguments = json.loads(call.arguments)
+                            # Execute the tool to get the delegate agent's topic type.
+                            result = await self._delegate_tools[call.name].run_json(arguments, deadline.cancellation_token)
+                            topic_type = self._delegate_tools[call.name].return_value_as_string(
+                                result)
+                            # Create the context for the delegate agent, including the function call and the result.
+                            delegate_conversation = self._conversation_store.append(conversation, [
+                                AssistantMessage(content=[call], source=self.id.type),
+                                FunctionExecutionResultMessage(
+                                    content=[
+                                        FunctionExecutionResult(
+                                            call_id=call.id,
+                                            name=call.name,
+                                            content=f"Transferred to {topic_type}. Adopt persona immediately.",
+                                            is_error=False,
+                                        )
+                                    ]
+                                ),
+                            ])
+                            delegate_targets.append((topic_type, UserTask(conversation=delegate_conversation, deadline=message.deadline)))
+                        else:
+                            raise ValueError(f"Unknown tool: {call.name}")
+                    # Execute the tools concurrently (the results keep the call order).
+                    tool_call_results = await self._tool_executor.run(tool_calls, deadline=deadline)
+                    tool_results.extend(tool_call_results)
+                    if len(delegate_targets) > 0:
+                        # Delegate the task to other agents by publishing messages to the corresponding topics.
+                        for topic_type, task in delegate_targets:
+                            self._logger.debug(
+                                f"{'-'*80}\n{self.id.type}:\nDelegating to {topic_type}")
+                            await self.publish_message(task, topic_id=TopicId(topic_type, source=self.id.key))
+                    if len(tool_call_results) > 0:
+                        self._logger.debug(f"{'-'*80}\n{self.id.type}:\n{tool_call_results}")
+                        # Make another LLM call with the results.
+                        conversation = self._conversation_store.append(
+                            conversation,
+                            [
+                                AssistantMessage(
+                                    content=llm_result.content, source=self.id.type),
+                                FunctionExecutionResultMessage(
+                                    content=tool_call_results),
+                            ],
+                        )
+                        llm_result = await self._create(conversation, deadline)
+                        budget.record(llm_result)
+                        self._logger.debug(f"{'-'*80}\n{self.id.type}:\n{llm_result.content}")
+                    else:
+                        # The task has been delegated, so we are done.
+                        return
+                if error is None:
+                    assert isinstance(llm_result.content, str)
+                    content = llm_result.content
+                else:
+                    content = "Sorry, I wasn't able to complete that - it was taking too many steps. Please try rephrasing the request."
+            except DeadlineExceeded:
+                # The turn's deadline passed - or the task's max_seconds, in which case report the breach
+                error = budget.check()
+                # Reply with what's been done so far (completed tool results are in the conversation).
+                self._logger.warning(f"{self.id.type}: deadline exceeded, replying with the results so far")
+                content = partial_results_reply(tool_results)
         # The task has been completed, publish the final result.
-        assert isinstance(llm_result.content, str)
-        message.context.append(AssistantMessage(
-            content=llm_result.content, source=self.id.type))
+        conversation = self._conversation_store.append(
+            conversation, [AssistantMessage(content=content, source=self.id.type)])
         await self.publish_message(
-            AgentResponse(context=message.context,
-                          reply_to_topic_type=self._agent_topic_type),
+            AgentResponse(conversation=conversation, reply_to_topic_type=self._agent_topic_type, error=error),
             topic_id=TopicId(self._user_topic_type, source=self.id.key),
         )
 
 
 class UserAgent(RoutedAgent):
-    def __init__(self, description: str, user_topic_type: str, agent_topic_type: str) -> None:
+    def __init__(self, description: str, user_topic_type: str, agent_topic_type: str,
+                 conversation_store: ConversationStore, input_provider: HumanInputProvider) -> None:
         super().__init__(description)
         self._user_topic_type = user_topic_type
         self._agent_topic_type = agent_topic_type
+        self._conversation_store = conversation_store
+        self._input_provider = input_provider
 
     @message_handler
     async def handle_user_login(self, message: UserLogin, ctx: MessageContext) -> None:
         print(f"{'-'*80}\n{yellow}User login, session ID: {self.id.key}.{reset}", flush=True)
         # Get the user's initial input after login.
-        user_input = input(f"{yellow}User: {reset}")
+        user_input = await self._input_provider.get_input(self.id.key, f"{yellow}User: {reset}")
         # print(f"{'-'*80}\n{self.id.type}:\n{user_input}")
         await self.publish_message(
-            UserTask(context=[UserMessage(content=user_input, source="User")]),
+            UserTask(conversation=self._conversation_store.start(
+                self.id.key, [UserMessage(content=user_input, source="User")]),
+                deadline=deadline_after(config.turn_deadline_seconds())),
             topic_id=TopicId(self._agent_topic_type, source=self.id.key),
         )
 
     @message_handler
     async def handle_task_result(self, message: AgentResponse, ctx: MessageContext) -> None:
         # Get the user's input after receiving a response from an agent.
-        last_agent_message = message.context[-1].content
+        last_agent_message = self._conversation_store.get(message.conversation)[-1].content
         print(f"{dark_yellow}{last_agent_message}{reset}", flush=True)
-        user_input = input(f"{yellow}User (type 'exit' to close the session): {reset}")
+        if message.error is not None:
+            print(f"{grey}{message.error}{reset}", flush=True)
+        user_input = await self._input_provider.get_input(self.id.key, f"{yellow}User (type 'exit' to close the session): {reset}")
         # print(f"{'-'*80}\n{self.id.type}:\n{user_input}", flush=True)
         if user_input.strip().lower() == "exit":
             print(f"{'-'*80}\nUser session ended, session ID: {self.id.key}.")
+            self._conversation_store.end_session(self.id.key)
+            self._input_provider.end_session(self.id.key)
             return
-        message.context.append(UserMessage(content=user_input, source="User"))
+        conversation = self._conversation_store.append(
+            message.conversation, [UserMessage(content=user_input, source="User")])
         await self.publish_message(
-            UserTask(context=message.context), topic_id=TopicId(message.reply_to_topic_type, source=self.id.key)
+            UserTask(conversation=conversation, deadline=deadline_after(config.turn_deadline_seconds())),
+            topic_id=TopicId(message.reply_to_topic_type, source=self.id.key)
         )
 
 
@@ -249,8 +287,11 @@ meals_plugin = MealsPlugin()
 
 # create the team
 
-async def main():
-    runtime = SingleThreadedAgentRuntime()
+async def create_runtime(input_provider: HumanInputProvider,
+                         profiler: RuntimeProfiler | None = None) -> SingleThreadedAgentRuntime:
+    """Runtime with the agents registered (not started) - sessions are started by publishing UserLogin"""
+    runtime = single_threaded_runtime(profiler)
+    conversation_store = ConversationStore()
 
     # Register the triage agent.
     triage_agent_type = await AIAgent.register(
@@ -266,7 +307,7 @@ async def main():
                 "Gather information to direct the customer to the right agent."
                 "But make your questions subtle and natural."
             ),
-            model_client=model_client,
+            model_client=factory.agent_model_client(triage_agent_topic_type),
             tools=[],
             delegate_tools=[
                 transfer_to_meals_tool,
@@ -274,6 +315,7 @@ async def main():
             ],
             agent_topic_type=triage_agent_topic_type,
             user_topic_type=user_topic_type,
+            conversation_store=conversation_store,
         ),
     )
     # Add subscriptions for the triage agent: it will receive messages published to its own topic only.
@@ -296,6 +338,7 @@ async def main():
             delegate_tools=[transfer_back_to_triage_tool],
             agent_topic_type=lights_agent_topic_type,
             user_topic_type=user_topic_type,
+            conversation_store=conversation_store,
         ),
     )
     # Add subscriptions for the lights agent: it will receive messages published to its own topic only.
@@ -318,6 +361,7 @@ async def main():
             delegate_tools=[transfer_back_to_triage_tool],
             agent_topic_type=meals_agent_topic_type,
             user_topic_type=user_topic_type,
+            conversation_store=conversation_store,
         ),
     )
     # Add subscriptions for the issues and repairs agent: it will receive messages published to its own topic only.
@@ -334,11 +378,20 @@ async def main():
             description="A user agent.",
             user_topic_type=user_topic_type,
             agent_topic_type=triage_agent_topic_type,
+            conversation_store=conversation_store,
+            input_provider=input_provider,
         ),
     )
     # Add subscriptions for the user agent: it will receive messages published to its own topic only.
     await runtime.add_subscription(TypeSubscription(topic_type=user_topic_type, agent_type=user_agent_type.type))
 
+    return runtime
+
+
+async def main():
+    profiler = factory.runtime_profiler()
+    runtime = await create_runtime(factory.human_input_provider(), profiler)
+
     # Start the runtime.
     runtime.start()
 
@@ -348,6 +401,10 @@ async def main():
 
     # Run until completion.
     await runtime.stop_when_idle()
+    if profiler is not None:
+        profiler.report()
+        profiler.close()
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
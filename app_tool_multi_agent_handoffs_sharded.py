@@ -0,0 +1,59 @@
+"""Runs handoffs sessions across worker processes (see auto_gen_explore/runtime/sharding.py)
+
+Each shard runs the agents from the app module (app_tool_multi_agent_handoffs2 by default) on its
+own SingleThreadedAgentRuntime. With HUMAN_INPUT_SCRIPT set the sessions run unattended, e.g. to
+compare throughput for different numbers of shards against the fake model server:
+
+    HUMAN_INPUT_SCRIPT=script.txt python app_tool_multi_agent_handoffs_sharded.py --shards 4 --sessions 40
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+
+from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.runtime.sharding import ShardedSessionDispatcher
+
+logging.basicConfig(
+    format="[%(asctime)s - %(name)s:%(lineno)d - %(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+
+async def report_stats(dispatcher: ShardedSessionDispatcher, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        print("Shards: " + ", ".join(
+            f"{s['shard']}: {s['sessions']} sessions, {s['busy']} busy, {s['queued']} queued"
+            for s in dispatcher.stats()), flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Handoffs sessions sharded across worker processes")
+    parser.add_argument("--app", default="app_tool_multi_agent_handoffs2", help="App module providing create_runtime")
+    parser.add_argument("--shards", type=int, default=config.session_shards())
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between shard stats (0 for none)")
+    args = parser.parse_args()
+
+    dispatcher = ShardedSessionDispatcher(args.app, args.shards, factory.human_input_provider())
+    await dispatcher.start()
+    stats_task = asyncio.create_task(report_stats(dispatcher, args.stats_interval)) if args.stats_interval > 0 else None
+
+    start = time.perf_counter()
+    for _ in range(args.sessions):
+        dispatcher.login(str(uuid.uuid4()))
+    await dispatcher.wait_for_sessions()
+    elapsed = time.perf_counter() - start
+
+    if stats_task is not None:
+        stats_task.cancel()
+    await dispatcher.stop()
+    print(f"{args.sessions} sessions on {args.shards} shards in {elapsed:.2f}s "
+          f"({args.sessions / elapsed:.2f} sessions/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,34 +1,33 @@
 import asyncio
 
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
 
 
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from autogen_core.model_context import BufferedChatCompletionContext
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.ui import Console
 
+from auto_gen_explore.agents.token_budget import TokenBudgetedChatCompletionContext
 from auto_gen_explore.plugins.lights import LightsPlugin
 from auto_gen_explore.plugins.meals import MealsPlugin
 
 
-# Create the token provider
-token_provider = get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
+model_client = factory.model_client(model="gpt-4o", api_version="2024-06-01")
 
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-	azure_deployment=config.openai_deployment_name(),
-    model="gpt-4o",
-    api_version="2024-06-01",
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,  # Optional if you choose key-based authentication.
-    # api_key="sk-...", # For key-based authentication.
-)
+# The last 5 messages, or the most recent messages that fit MODEL_CONTEXT_TOKEN_BUDGET if it's set
+token_budget = config.model_context_token_budget()
+if token_budget is None:
+    model_context = BufferedChatCompletionContext(buffer_size=5)
+else:
+    model_context = TokenBudgetedChatCompletionContext(
+        token_budget=token_budget,
+        model_client=model_client,
+        summary_client=model_client if config.model_context_summarize() else None,
+    )
 
 
 lights_plugin = LightsPlugin()
@@ -43,7 +42,7 @@ omni_agent = AssistantAgent(
     system_message="You are a helpful assistant.",
     # system_message="You are a bot. Use tools where possible and communicate tool use to the user.",
     reflect_on_tool_use=True,
-    model_context=BufferedChatCompletionContext(buffer_size=5),
+    model_context=model_context,
     model_client_stream=True,  # Enable streaming tokens from the model client.
 )
 
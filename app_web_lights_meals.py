@@ -1,17 +1,20 @@
 import asyncio
 import logging
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response as HttpResponse
 from fastapi.staticfiles import StaticFiles
 
 from autogen_agentchat.base import Response, TaskResult
 from nanoid import generate
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
 from auto_gen_explore.app_web.session import AgentSession
-# from auto_gen_explore.app_web.session_memory_persistence import load_session, save_session
-from auto_gen_explore.app_web.session_file_persistence import load_session, save_session
+from auto_gen_explore.app_web.session_history import SessionHistoryStore, etag_matches, page_etag
+from auto_gen_explore.models.prompt_cache import prompt_cache_report
+# from auto_gen_explore.app_web.session_memory_persistence import load_session, load_session_messages, save_session
+from auto_gen_explore.app_web.session_file_persistence import load_session, load_session_messages, save_session
 
 
 logging.basicConfig(
@@ -30,6 +33,8 @@ state_folder = os.path.join(os.path.dirname(__file__), "./.app_web_lights_meals_
 
 session_socket_managers: dict[str, "SessionWebSocketManager"] = {}
 
+history_store = SessionHistoryStore()
+
 
 class SessionWebSocketManager:
     def __init__(self, session_id: str):
@@ -43,7 +48,7 @@ class SessionWebSocketManager:
         async with self._websockets_lock:
             # Send the message history
             session = await load_session(self._session_id)
-            for message in session._messages:  # TODO this should be a method/property on AgentSession
+            for message in session.messages:
                 await websocket.send_json(message)
 
             # Add the websocket to the list of websockets
@@ -131,6 +136,7 @@ class SessionWebSocketManager:
                 else:
                     await self._broadcast_json(message.model_dump(mode="json"))
             await save_session(session)
+            await asyncio.to_thread(history_store.sync_messages, session.id, session.messages)
 
 
 app.mount("/css", StaticFiles(directory="app_web_lights_meals/css"), name="css")
@@ -150,6 +156,51 @@ async def create_session():
     return {"id": session.id}
 
 
+@app.get("/api/model-budget")
+async def get_model_budget():
+    return factory.rate_limit_utilization()
+
+
+@app.get("/api/model-deployments")
+async def get_model_deployments():
+    return factory.model_load_balancer_stats()
+
+
+@app.get("/api/model-prompt-cache")
+async def get_model_prompt_cache():
+    return prompt_cache_report()
+
+
+@app.get("/api/sessions/{id}/messages")
+async def get_session_messages(
+    id: str,
+    request: Request,
+    before: int | None = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    # The store is sqlite - run its queries on a worker thread so they don't block the event loop
+    if await asyncio.to_thread(history_store.message_count, id) == 0:
+        # Sessions created before the history store existed (or not yet run) - backfill from the session state
+        messages = await load_session_messages(id)
+        if messages is None:
+            raise HTTPException(status_code=404, detail=f"Session not found: {id}")
+        await asyncio.to_thread(history_store.sync_messages, id, messages)
+
+    # Compute the ETag from the index before reading any message bodies
+    bounds = await asyncio.to_thread(history_store.page_bounds, id, before, limit)
+    etag = page_etag(id, bounds)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return HttpResponse(status_code=304, headers=headers)
+
+    messages = await asyncio.to_thread(history_store.get_messages, id, *bounds) if bounds else []
+    next_before = bounds[0] if bounds and bounds[0] > 0 else None
+    return JSONResponse(
+        {"messages": messages, "first_seq": bounds[0] if bounds else None, "next_before": next_before},
+        headers=headers,
+    )
+
+
 @app.websocket("/api/sessions/{id}")
 async def websocket_endpoint(websocket: WebSocket, id: str):
     session = await load_session(id)
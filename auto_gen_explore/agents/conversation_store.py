@@ -0,0 +1,152 @@
+"""Session-scoped, append-only conversation store for the core runtime handoff examples
+
+The handoff agents used to pass the whole conversation (List[LLMMessage]) in every UserTask and
+AgentResponse, and each delegation copied it (list(message.context) + [...]). Every publish then
+cost time and memory proportional to the length of the conversation - and with a runtime that
+serializes messages, that's the whole history on every hop.
+
+Instead, the messages are kept in a ConversationStore and the published messages carry a
+ConversationRef: the session, a context id and the number of messages in the conversation at
+that point. Since contexts are append-only, the first `length` messages of a context never change,
+so a ref always identifies the same conversation however much is appended afterwards.
+
+Appending to a ref that's at the end of its context extends the context in place. Appending to
+an older ref (e.g. two delegations from the same point) forks a new context whose parent is that
+ref, so the forks share the messages before the fork rather than copying them.
+
+ConversationView is a read-only sequence over a ref's messages (built from the shared segments,
+without copying) so it can be passed to trim_to_budget etc. Messages must not be mutated once
+they've been appended.
+
+The store is in-process - agents in other processes (runtime/distributed.py) use a
+RemoteConversationStore that caches what it has read, so each message crosses the process
+boundary once per process rather than on every hop.
+"""
+import logging
+import uuid
+from typing import Iterator, Sequence, overload
+
+from autogen_core.models import LLMMessage
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class ConversationRef(BaseModel):
+    session_id: str
+    context_id: str
+    length: int
+
+
+class _Context:
+    def __init__(self, context_id: str, parent: ConversationRef | None):
+        self.context_id = context_id
+        self.parent = parent
+        self.base = parent.length if parent is not None else 0  # messages before this context's own segment
+        self.messages: list[LLMMessage] = []
+
+    @property
+    def length(self) -> int:
+        return self.base + len(self.messages)
+
+
+class ConversationView(Sequence[LLMMessage]):
+    """Read-only view of the messages in a conversation (shares the store's message lists)"""
+
+    def __init__(self, segments: list[tuple[list[LLMMessage], int]], length: int):
+        self._segments = segments  # (context messages, number of them in this view), oldest first
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[LLMMessage]:
+        for messages, count in self._segments:
+            for index in range(count):
+                yield messages[index]
+
+    @overload
+    def __getitem__(self, index: int) -> LLMMessage: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[LLMMessage]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("conversation index out of range")
+        for messages, count in self._segments:
+            if index < count:
+                return messages[index]
+            index -= count
+        raise IndexError("conversation index out of range")
+
+    def __repr__(self) -> str:
+        return f"ConversationView({list(self)!r})"
+
+
+class ConversationStore:
+    """Append-only message store for the conversations in each session (see module docstring)"""
+
+    def __init__(self):
+        self._sessions: dict[str, dict[str, _Context]] = {}
+
+    def _context(self, ref: ConversationRef) -> _Context:
+        context = self._sessions.get(ref.session_id, {}).get(ref.context_id)
+        if context is None:
+            raise KeyError(f"Unknown conversation context {ref.context_id} in session {ref.session_id}")
+        if ref.length > context.length:
+            raise ValueError(f"Conversation ref length {ref.length} is beyond the end of context {ref.context_id}")
+        return context
+
+    def _new_context(self, session_id: str, parent: ConversationRef | None) -> _Context:
+        context = _Context(str(uuid.uuid4()), parent)
+        self._sessions.setdefault(session_id, {})[context.context_id] = context
+        return context
+
+    def start(self, session_id: str, messages: Sequence[LLMMessage] = ()) -> ConversationRef:
+        """Start a new conversation in a session"""
+        context = self._new_context(session_id, None)
+        context.messages.extend(messages)
+        return ConversationRef(session_id=session_id, context_id=context.context_id, length=context.length)
+
+    def append(self, ref: ConversationRef, messages: Sequence[LLMMessage]) -> ConversationRef:
+        """Add messages to the conversation identified by `ref` - returns the ref for the extended conversation"""
+        context = self._context(ref)
+        if ref.length < context.length:
+            # something has already been appended to this context after `ref`, so fork from it
+            context = self._new_context(ref.session_id, ref)
+        context.messages.extend(messages)
+        return ConversationRef(session_id=ref.session_id, context_id=context.context_id, length=context.length)
+
+    def get(self, ref: ConversationRef) -> ConversationView:
+        """The messages in the conversation identified by `ref`"""
+        segments = []
+        length = ref.length
+        context = self._context(ref)
+        while True:
+            segments.append((context.messages, length - context.base))
+            if context.parent is None:
+                break
+            length = context.parent.length
+            context = self._context(context.parent)
+        segments.reverse()
+        return ConversationView(segments, ref.length)
+
+    def read_context(self, session_id: str, context_id: str, start: int, end: int
+                     ) -> tuple[ConversationRef | None, list[LLMMessage]]:
+        """A context's parent and its own messages from `start` up to conversation length `end`
+
+        `start` is relative to the context's own messages (i.e. excluding those in its parents) - used
+        by clients that cache contexts (RemoteConversationStore) to fetch just what they don't have.
+        """
+        context = self._context(ConversationRef(session_id=session_id, context_id=context_id, length=end))
+        return context.parent, context.messages[start:end - context.base]
+
+    def end_session(self, session_id: str):
+        """Remove a session's conversations"""
+        contexts = self._sessions.pop(session_id, {})
+        _logger.debug(f"Removed {len(contexts)} conversation contexts for session {session_id}")
@@ -0,0 +1,105 @@
+"""Per-turn deadlines, propagated to model calls, tools and code executors as a cancellation token
+
+A single module-level CancellationToken is shared by everything it's passed to, so it can't be
+used to stop one user turn without stopping the others - and nothing cancels it on a timer. A
+TurnDeadline is created for each user turn (the deadline itself is a time.time() timestamp, so it
+can be carried in the messages the agents publish to each other and used in other processes) and
+has its own CancellationToken that is cancelled when the deadline passes. Passing that token to
+model_client.create, FunctionTool.run_json, execute_code_blocks etc. cancels whatever is still
+outstanding, and TurnDeadline.run turns the resulting cancellation into DeadlineExceeded so the
+agent can return what it has so far (partial_results_reply lists the tool calls that completed).
+
+The deadline's token is also cancelled when the `cancellation_token` it's created with (e.g. the
+MessageContext's) is cancelled - in that case run() lets the CancelledError through.
+
+NOTE: as with ToolExecutor timeouts, a sync tool that's cancelled keeps running on its worker thread.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Sequence, TypeVar
+
+from autogen_core import CancellationToken
+from autogen_core.models import FunctionExecutionResult
+
+_logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The turn's deadline passed before the work completed"""
+
+
+def deadline_after(seconds: float | None) -> float | None:
+    """The deadline (time.time() timestamp) `seconds` from now, or None for no deadline"""
+    return time.time() + seconds if seconds is not None else None
+
+
+class TurnDeadline:
+    """Cancellation token that's cancelled when the deadline passes (see module docstring)"""
+
+    def __init__(self, expires_at: float | None, cancellation_token: CancellationToken | None = None):
+        self.expires_at = expires_at
+        self.cancellation_token = CancellationToken()
+        self._expired = False
+        self._timer: asyncio.TimerHandle | None = None
+        if cancellation_token is not None:
+            cancellation_token.add_callback(self.cancellation_token.cancel)
+        if expires_at is not None:
+            self._timer = asyncio.get_running_loop().call_later(max(0.0, expires_at - time.time()), self._expire)
+
+    @classmethod
+    def after(cls, seconds: float | None, cancellation_token: CancellationToken | None = None) -> "TurnDeadline":
+        return cls(deadline_after(seconds), cancellation_token)
+
+    def _expire(self):
+        self._expired = True
+        self._timer = None
+        _logger.debug("Turn deadline exceeded - cancelling outstanding work")
+        self.cancellation_token.cancel()
+
+    @property
+    def expired(self) -> bool:
+        return self._expired or (self.expires_at is not None and time.time() >= self.expires_at)
+
+    def remaining(self) -> float | None:
+        """Seconds until the deadline (None if there's no deadline)"""
+        return max(0.0, self.expires_at - time.time()) if self.expires_at is not None else None
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable`, raising DeadlineExceeded if the deadline passes first"""
+        if self.expired:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded()
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded() from None
+        except asyncio.CancelledError:
+            # cancelled via the token because the deadline passed (rather than this task being cancelled)
+            if self.expired and asyncio.current_task().cancelling() == 0:
+                raise DeadlineExceeded() from None
+            raise
+
+    def close(self):
+        """Stop the timer (the turn has finished)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def __enter__(self) -> "TurnDeadline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def partial_results_reply(results: Sequence[FunctionExecutionResult]) -> str:
+    """Reply for a turn whose deadline passed, with the results of the tool calls that completed"""
+    completed = [result for result in results if not result.is_error]
+    if len(completed) == 0:
+        return "Sorry, I wasn't able to finish that in time. Please try again or ask for something simpler."
+    lines = "\n".join(f"- {result.name}: {result.content}" for result in completed)
+    return f"Sorry, I wasn't able to finish that in time. This is what I'd done so far:\n{lines}"
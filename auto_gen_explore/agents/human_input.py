@@ -0,0 +1,153 @@
+"""Async human input for agents that wait on a person
+
+The core runtime agents (HumanAgent/UserAgent) and UserProxyAgents with a sync input_func called
+input() inside async handlers, which blocks the event loop - with SingleThreadedAgentRuntime every
+other session stops until that one person types something.
+
+A HumanInputProvider gets input for a session without blocking:
+    - QueueInputProvider: input is put on a per-session asyncio.Queue by whatever receives it and
+      get_input waits on the queue, so any number of sessions can be waiting at once
+    - ScriptedInputProvider: a QueueInputProvider pre-filled with canned input (for demos and
+      running the apps unattended against the fake model server)
+    - WebSocketInputProvider: a QueueInputProvider fed from a websocket for each session, with
+      prompts sent to the websocket
+    - ConsoleInputProvider: reads from stdin on a worker thread (the console is shared, so prompts
+      are taken one at a time)
+
+provider.input_func(session_id) adapts a provider to UserProxyAgent's async input_func.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Mapping, Optional, Sequence
+
+from autogen_core import CancellationToken
+
+_logger = logging.getLogger(__name__)
+
+
+class HumanInputProvider(ABC):
+    @abstractmethod
+    async def get_input(self, session_id: str, prompt: str) -> str:
+        """Wait for the next input for a session (without blocking the event loop)"""
+        ...
+
+    def input_func(self, session_id: str) -> Callable[[str, Optional[CancellationToken]], Awaitable[str]]:
+        """An async input_func for UserProxyAgent that gets input for `session_id`"""
+        async def get_input(prompt: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+            task = asyncio.ensure_future(self.get_input(session_id, prompt))
+            if cancellation_token is not None:
+                cancellation_token.link_future(task)
+            return await task
+        return get_input
+
+    def end_session(self, session_id: str):
+        """Release anything held for a session once it has ended"""
+        pass
+
+
+class QueueInputProvider(HumanInputProvider):
+    """Input for each session is put on a queue (put_input) and taken from it by get_input"""
+
+    def __init__(self):
+        self._queues: dict[str, asyncio.Queue[str]] = {}
+        self._waiting: set[str] = set()
+
+    def _queue(self, session_id: str) -> asyncio.Queue[str]:
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = asyncio.Queue()
+        return queue
+
+    async def prompt(self, session_id: str, prompt: str):
+        """Called when a session starts waiting for input (override to show the prompt)"""
+        pass
+
+    def put_input(self, session_id: str, text: str):
+        self._queue(session_id).put_nowait(text)
+
+    def waiting_sessions(self) -> list[str]:
+        """Ids of the sessions currently waiting for input"""
+        return sorted(self._waiting)
+
+    async def get_input(self, session_id: str, prompt: str) -> str:
+        queue = self._queue(session_id)
+        self._waiting.add(session_id)
+        try:
+            await self.prompt(session_id, prompt)
+            return await queue.get()
+        finally:
+            self._waiting.discard(session_id)
+
+    def end_session(self, session_id: str):
+        self._queues.pop(session_id, None)
+
+
+class ScriptedInputProvider(QueueInputProvider):
+    """Returns canned input in order - `end_input` (e.g. "exit") once a session's script is used up"""
+
+    def __init__(self, inputs: Sequence[str] | Mapping[str, Sequence[str]], end_input: str = "exit"):
+        super().__init__()
+        self._default_inputs = list(inputs) if not isinstance(inputs, Mapping) else []
+        self._session_inputs = dict(inputs) if isinstance(inputs, Mapping) else {}
+        self._end_input = end_input
+
+    def _queue(self, session_id: str) -> asyncio.Queue[str]:
+        if session_id not in self._queues:
+            queue = super()._queue(session_id)
+            for text in self._session_inputs.get(session_id, self._default_inputs):
+                queue.put_nowait(text)
+            return queue
+        return super()._queue(session_id)
+
+    async def get_input(self, session_id: str, prompt: str) -> str:
+        queue = self._queue(session_id)
+        text = queue.get_nowait() if not queue.empty() else self._end_input
+        print(f"{prompt}{text}", flush=True)
+        return text
+
+
+class WebSocketInputProvider(QueueInputProvider):
+    """Input from a websocket per session - messages are {"type": "input", "content": ...}
+
+    `receive` is run for each connected websocket (e.g. from a FastAPI websocket endpoint) and puts
+    the input it receives on the session's queue. Prompts are sent to the session's websockets as
+    {"type": "input_request", "prompt": ...}.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._websockets: dict[str, list[Any]] = {}
+
+    async def receive(self, session_id: str, websocket):
+        """Feed input from `websocket` to the session until it disconnects"""
+        websockets = self._websockets.setdefault(session_id, [])
+        websockets.append(websocket)
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if message.get("type", "input") == "input":
+                    self.put_input(session_id, message["content"])
+        except Exception as e:
+            # starlette raises WebSocketDisconnect - don't depend on it here
+            _logger.debug(f"Stopped receiving input for session {session_id}: {e!r}")
+        finally:
+            websockets.remove(websocket)
+
+    async def prompt(self, session_id: str, prompt: str):
+        for websocket in list(self._websockets.get(session_id, [])):
+            try:
+                await websocket.send_json({"type": "input_request", "prompt": prompt})
+            except Exception as e:
+                _logger.debug(f"Failed to send input request for session {session_id}: {e!r}")
+
+
+class ConsoleInputProvider(HumanInputProvider):
+    """Input from stdin, read on a worker thread so the event loop keeps running"""
+
+    def __init__(self):
+        self._console_lock = asyncio.Lock()
+
+    async def get_input(self, session_id: str, prompt: str) -> str:
+        async with self._console_lock:
+            return await asyncio.to_thread(input, prompt)
@@ -0,0 +1,117 @@
+"""Aho-Corasick matching for a set of phrases
+
+Checking a message for each of several phrases (`any(phrase in text for phrase in phrases)`)
+scans the text once per phrase. PhraseMatcher builds an Aho-Corasick automaton over the phrases
+so the text is scanned once, however many phrases there are: the automaton follows the trie of
+phrases character by character and, on a mismatch, falls back (via the failure links) to the
+longest suffix of what has been read that is still a prefix of some phrase.
+
+Stepping through the automaton is a Python loop per character, so while the automaton is shallow
+(less than `_skip_depth` characters into a possible match) it skips ahead with a regex search for
+the phrases' first `_skip_depth` characters (as a trie, so the regex doesn't backtrack through
+every phrase) - text that can't start a phrase is skipped at C speed, and the automaton only steps
+through the text where a phrase may start. It restarts at the root where the regex finds a prefix
+(the search starts where the shallow state's possible match started, so no match is missed).
+"""
+import re
+from collections import deque
+from typing import Iterable, Iterator
+
+_skip_depth = 32  # length of the phrase prefixes searched for by the regex
+
+
+class PhraseMatcher:
+    """Finds any of a set of phrases in text in a single pass"""
+
+    def __init__(self, phrases: Iterable[str], ignore_case: bool = False):
+        self._ignore_case = ignore_case
+        self.phrases = list(dict.fromkeys(phrases))
+        if len(self.phrases) == 0 or any(len(phrase) == 0 for phrase in self.phrases):
+            raise ValueError("PhraseMatcher needs at least one phrase, and phrases can't be empty")
+        # state 0 is the root; _outputs[state] are the phrases that end at the state (incl. via failure links)
+        goto: list[dict[str, int]] = [{}]
+        self._outputs: list[tuple[str, ...]] = [()]
+        self._depths = [0]
+        for phrase in self.phrases:
+            state = 0
+            for char in self._normalize(phrase):
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto.append({})
+                    self._outputs.append(())
+                    self._depths.append(self._depths[state] + 1)
+                    goto[state][char] = next_state
+                state = next_state
+            self._outputs[state] += (phrase,)
+        self._transitions = self._build_transitions(goto)
+        self._prefixes = re.compile(self._trie_pattern(goto, 0, _skip_depth))
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self._ignore_case else text
+
+    def _trie_pattern(self, goto: list[dict[str, int]], state: int, depth: int) -> str:
+        """Regex for the first `depth` characters of the phrases below `state` (as a trie, so it doesn't backtrack)"""
+        if depth == 0 or len(goto[state]) == 0:
+            return ""
+        alternatives = [re.escape(char) + self._trie_pattern(goto, next_state, depth - 1)
+                        for char, next_state in goto[state].items()]
+        if self._outputs[state] and state != 0:
+            alternatives.append("")  # a phrase ends here (i.e. is shorter than depth)
+        return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+    def _build_transitions(self, goto: list[dict[str, int]]) -> list[dict[str, int]]:
+        """Fold the failure links into the transitions, so matching takes one lookup per character
+
+        Transitions back to the root are left out (a missing transition goes to the root).
+        """
+        fail = [0] * len(goto)
+        transitions: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())  # depth 1 states fail to the root
+        while queue:
+            state = queue.popleft()
+            # a state's failure state is shallower, so its transitions are already complete
+            transitions[state] = {**transitions[fail[state]], **goto[state]}
+            for char, next_state in goto[state].items():
+                fail[next_state] = transitions[fail[state]].get(char, 0)
+                self._outputs[next_state] += self._outputs[fail[next_state]]
+                queue.append(next_state)
+        return transitions
+
+    def _matches(self, text: str) -> Iterator[tuple[int, tuple[str, ...]]]:
+        transitions = self._transitions
+        outputs = self._outputs
+        depths = self._depths
+        prefixes = self._prefixes
+        text = self._normalize(text)
+        state = 0
+        index = 0
+        verified = 0  # end of the last prefix found by the regex
+        reported = 0  # end index of the last output (restarting can step through text again)
+        while index < len(text):
+            depth = depths[state]
+            if depth < _skip_depth and index >= verified:
+                prefix = prefixes.search(text, index - depth)
+                if prefix is None:
+                    return
+                if prefix.start() != index - depth:
+                    state = 0
+                    index = prefix.start()
+                verified = prefix.end()
+            state = transitions[state].get(text[index], 0)
+            index += 1
+            if outputs[state] and index > reported:
+                reported = index
+                yield index, outputs[state]
+
+    def find_all(self, text: str) -> Iterator[tuple[int, str]]:
+        """(end index, phrase) for each occurrence of the phrases in `text`, in order of where they end"""
+        for end, phrases in self._matches(text):
+            for phrase in phrases:
+                yield end, phrase
+
+    def search(self, text: str) -> str | None:
+        """The first phrase found in `text` (the one that ends first), or None"""
+        for _, phrases in self._matches(text):
+            return phrases[0]
+        return None
@@ -0,0 +1,151 @@
+"""AssistantAgent that phrases tool results from templates instead of a reflection LLM call
+
+With reflect_on_tool_use=True, AssistantAgent makes a second model call after every tool call
+just to describe the result. Tools can instead declare a response template with the
+@response_template decorator, e.g.
+
+    @response_template("Turned the {name} {is_on:on/off}.")
+    def change_state(self, id: int, is_on: bool) -> str:
+
+When every tool call in a step has a template (and none failed), TemplatedReflectionAssistantAgent
+renders the templates locally and skips the reflection call. Otherwise it reflects as usual.
+
+Templates are formatted with the tool arguments and `result` (the tool result string). If the
+result is a dict (as JSON or a Python literal) its keys are available too. Booleans can be
+rendered with a "true/false" format spec, e.g. {is_on:on/off}.
+"""
+import ast
+import json
+import logging
+import string
+from typing import Any, AsyncGenerator, Callable
+
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import TextMessage, ToolCallExecutionEvent
+from autogen_core import FunctionCall
+from autogen_core.models import AssistantMessage, FunctionExecutionResult
+from autogen_core.tools import FunctionTool
+
+_logger = logging.getLogger(__name__)
+
+
+def response_template(template: str) -> Callable:
+    """Decorator to declare the response template for a tool function"""
+    def decorator(func):
+        func.response_template = template
+        return func
+    return decorator
+
+
+class _TemplateFormatter(string.Formatter):
+    def format_field(self, value: Any, format_spec: str) -> str:
+        if isinstance(value, bool) and "/" in format_spec:
+            true_text, false_text = format_spec.split("/", 1)
+            return true_text if value else false_text
+        return super().format_field(value, format_spec)
+
+
+_formatter = _TemplateFormatter()
+
+
+def _parse_result(content: str) -> dict:
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(content)
+        except (ValueError, SyntaxError):
+            continue
+        return value if isinstance(value, dict) else {}
+    return {}
+
+
+def render_tool_response(template: str, call: FunctionCall, result: FunctionExecutionResult) -> str:
+    values = {**json.loads(call.arguments), **_parse_result(result.content), "result": result.content}
+    return _formatter.format(template, **values)
+
+
+class TemplatedReflectionAssistantAgent(AssistantAgent):
+    """AssistantAgent that uses tool response templates in place of reflect_on_tool_use where possible"""
+
+    def __init__(self, name: str, model_client, *, tools=None, **kwargs):
+        super().__init__(name, model_client, tools=tools, **kwargs)
+        self._response_templates: dict[str, str] = {}
+        for tool in tools or []:
+            func = tool._func if isinstance(tool, FunctionTool) else tool
+            template = getattr(func, "response_template", None)
+            if template is not None:
+                name = tool.name if isinstance(tool, FunctionTool) else func.__name__
+                self._response_templates[name] = template
+
+    def _render(self, calls: list[FunctionCall], results: list[FunctionExecutionResult]) -> str | None:
+        results_by_id = {result.call_id: result for result in results}
+        responses = []
+        for call in calls:
+            result = results_by_id.get(call.id)
+            if result is None or result.is_error:
+                return None  # let the model explain errors
+            try:
+                responses.append(render_tool_response(self._response_templates[call.name], call, result))
+            except (KeyError, IndexError, ValueError) as e:
+                _logger.debug(f"Template for {call.name} couldn't be rendered ({e!r}) - reflecting instead")
+                return None
+        return " ".join(responses)
+
+    async def _process_model_result(  # type: ignore[override]
+        self,
+        model_result,
+        inner_messages,
+        cancellation_token,
+        agent_name,
+        model_context,
+        tools,
+        handoff_tools,
+        handoffs,
+        model_client,
+        model_client_stream,
+        reflect_on_tool_use,
+        tool_call_summary_format,
+    ) -> AsyncGenerator:
+        calls = model_result.content
+        templated = reflect_on_tool_use and isinstance(calls, list) and all(
+            isinstance(call, FunctionCall) and call.name in self._response_templates for call in calls)
+
+        # Templated steps run without reflection, then the summary response is replaced with the rendered templates
+        results = []
+        async for event in super()._process_model_result(
+            model_result=model_result,
+            inner_messages=inner_messages,
+            cancellation_token=cancellation_token,
+            agent_name=agent_name,
+            model_context=model_context,
+            tools=tools,
+            handoff_tools=handoff_tools,
+            handoffs=handoffs,
+            model_client=model_client,
+            model_client_stream=model_client_stream,
+            reflect_on_tool_use=reflect_on_tool_use and not templated,
+            tool_call_summary_format=tool_call_summary_format,
+        ):
+            if templated and isinstance(event, ToolCallExecutionEvent):
+                results = event.content
+            if templated and isinstance(event, Response):
+                break
+            yield event
+        else:
+            return
+
+        text = self._render(calls, results)
+        if text is None:
+            async for event in AssistantAgent._reflect_on_tool_use_flow(
+                model_client=model_client,
+                model_client_stream=model_client_stream,
+                model_context=model_context,
+                agent_name=agent_name,
+                inner_messages=inner_messages,
+            ):
+                yield event
+            return
+
+        _logger.debug(f"{agent_name} - rendered tool response without reflection: {text}")
+        await model_context.add_message(AssistantMessage(content=text, source=agent_name))
+        yield Response(chat_message=TextMessage(content=text, source=agent_name), inner_messages=inner_messages)
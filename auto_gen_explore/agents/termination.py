@@ -0,0 +1,329 @@
+"""Termination conditions for AgentChat teams: budgets, and incremental text matching
+
+Conditions here examine each message once (IncrementalTermination). The teams in this version of
+AgentChat call the condition with just the new messages after each agent's turn, but a condition
+called with the whole (growing) thread - e.g. by a loop of our own - would otherwise rescan, or
+recount, every message on every call. IncrementalTermination keeps a cursor: if the sequence it's
+called with extends the one it was last called with (the message at the cursor is the same
+object) only the messages after the cursor are examined, otherwise the sequence is taken to be
+new messages.
+
+Budgets - MaxMessageTermination, TextMentionTermination and HandoffTermination stop a run based on
+what the agents say, so a run where the agents keep talking (or keep calling tools) is only
+stopped by the message count, however long it takes or whatever it costs. These conditions stop
+a run when it exceeds a budget:
+    - TokenBudgetTermination: prompt/completion/total tokens (from the messages' models_usage)
+    - CostBudgetTermination: estimated cost of those tokens (ModelPricing, optionally per agent)
+    - WallClockTermination: seconds since the run started
+and combine with the other conditions as usual, e.g. TextMentionTermination("TERMINATE") |
+budget_termination(max_seconds=300, max_cost=0.5). They work with RoundRobinGroupChat,
+SelectorGroupChat, Swarm and MagenticOneGroupChat. Usage is accumulated as the run goes and the
+teams reset the condition when it stops a run; the wall clock starts on the first call after that
+(i.e. with the task messages at the start of the next run) rather than when the condition is
+created, so time waiting for the user between runs isn't counted.
+
+NOTE: only usage reported on messages is counted - model calls made by the team itself (the
+SelectorGroupChat speaker selection, the MagenticOne orchestrator) don't produce messages. And
+a condition can only stop a run between agent turns, so a single long turn can overrun.
+
+Text - PhraseTermination stops when a message's text (text content, or the text parts of a
+MultiModalMessage) contains any of a set of phrases, using an Aho-Corasick PhraseMatcher so each
+message is scanned once however many phrases there are. TextContentTermination stops when the
+text is exactly one of the phrases. AgentTextMessageTermination stops when an agent (rather than
+the user) replies with a TextMessage.
+
+See termination_benchmark.py for the cost of rescanning vs the cursor on long runs.
+"""
+import logging
+import time
+from abc import abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Mapping, Sequence
+
+from autogen_agentchat.base import TerminatedException, TerminationCondition
+from autogen_agentchat.messages import AgentEvent, ChatMessage, MultiModalMessage, StopMessage, TextMessage
+
+from auto_gen_explore.agents.phrase_matcher import PhraseMatcher
+
+_logger = logging.getLogger(__name__)
+
+
+class IncrementalTermination(TerminationCondition):
+    """Condition that examines each message once, however it's called (see module docstring)
+
+    Subclasses implement _check, which is passed just the messages not examined yet and returns
+    the reason to stop (or None to continue). Once a condition has stopped a run, calling it again
+    before reset() raises TerminatedException, unless the subclass sets _latch to False.
+    """
+
+    _latch = True
+
+    def __init__(self) -> None:
+        self._terminated = False
+        self._examined = 0  # messages examined in the sequence last called with
+        self._last: AgentEvent | ChatMessage | None = None  # the last of those
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    def _new_messages(self, messages: Sequence[AgentEvent | ChatMessage]) -> Sequence[AgentEvent | ChatMessage]:
+        examined = self._examined
+        if 0 < examined <= len(messages) and messages[examined - 1] is self._last:
+            new_messages = messages[examined:]  # the same thread, extended
+        else:
+            new_messages = messages  # new messages (as the teams pass them)
+            examined = 0
+        if len(new_messages) > 0:
+            self._last = new_messages[-1]
+        self._examined = examined + len(new_messages)
+        return new_messages
+
+    @abstractmethod
+    def _check(self, messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
+        ...
+
+    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
+        if self._terminated:
+            raise TerminatedException("Termination condition has already been reached")
+        reason = self._check(self._new_messages(messages))
+        if reason is None:
+            return None
+        self._terminated = self._latch
+        return StopMessage(content=reason, source=self.__class__.__name__)
+
+    async def reset(self) -> None:
+        self._terminated = False
+        self._examined = 0
+        self._last = None
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    prompt_per_million: float  # cost per million prompt tokens
+    completion_per_million: float  # cost per million completion tokens
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.prompt_per_million + completion_tokens * self.completion_per_million) / 1_000_000
+
+
+@dataclass
+class RunUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    started: float | None = None  # time.monotonic() of the first call in the run
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.total_tokens} tokens ({self.prompt_tokens} prompt, {self.completion_tokens} completion), "
+                f"estimated cost {self.cost:.4f}, {self.elapsed_seconds:.1f}s")
+
+
+class _BudgetTermination(IncrementalTermination):
+    """Accumulates RunUsage over the messages in a run - subclasses check it against their budget"""
+
+    def __init__(self, pricing: ModelPricing | None = None, agent_pricing: Mapping[str, ModelPricing] | None = None):
+        super().__init__()
+        self._pricing = pricing
+        self._agent_pricing = dict(agent_pricing or {})
+        self._usage = RunUsage()
+
+    @property
+    def usage(self) -> RunUsage:
+        """Usage so far in the current run"""
+        return self._usage
+
+    @abstractmethod
+    def _exceeded(self) -> str | None:
+        ...
+
+    def _check(self, messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
+        usage = self._usage
+        if usage.started is None:
+            usage.started = time.monotonic()
+        for message in messages:
+            if message.models_usage is None:
+                continue
+            usage.prompt_tokens += message.models_usage.prompt_tokens
+            usage.completion_tokens += message.models_usage.completion_tokens
+            pricing = self._agent_pricing.get(message.source, self._pricing)
+            if pricing is not None:
+                usage.cost += pricing.cost(message.models_usage.prompt_tokens, message.models_usage.completion_tokens)
+        reason = self._exceeded()
+        return f"{reason} ({usage})" if reason is not None else None
+
+    async def reset(self) -> None:
+        await super().reset()
+        self._usage = RunUsage()
+
+
+class TokenBudgetTermination(_BudgetTermination):
+    """Terminate the run when its token usage reaches any of the limits"""
+
+    def __init__(self, max_total_tokens: int | None = None, max_prompt_tokens: int | None = None,
+                 max_completion_tokens: int | None = None) -> None:
+        if max_total_tokens is None and max_prompt_tokens is None and max_completion_tokens is None:
+            raise ValueError("At least one of max_total_tokens, max_prompt_tokens or max_completion_tokens is required")
+        super().__init__()
+        self._max_total_tokens = max_total_tokens
+        self._max_prompt_tokens = max_prompt_tokens
+        self._max_completion_tokens = max_completion_tokens
+
+    def _exceeded(self) -> str | None:
+        for name, limit, value in [
+            ("total", self._max_total_tokens, self._usage.total_tokens),
+            ("prompt", self._max_prompt_tokens, self._usage.prompt_tokens),
+            ("completion", self._max_completion_tokens, self._usage.completion_tokens),
+        ]:
+            if limit is not None and value >= limit:
+                return f"Token budget of {limit} {name} tokens reached"
+        return None
+
+
+class CostBudgetTermination(_BudgetTermination):
+    """Terminate the run when its estimated model cost reaches `max_cost`
+
+    Tokens are priced with `agent_pricing` for the agent (message source) if it's there, otherwise `pricing`.
+    """
+
+    def __init__(self, max_cost: float, pricing: ModelPricing,
+                 agent_pricing: Mapping[str, ModelPricing] | None = None) -> None:
+        super().__init__(pricing, agent_pricing)
+        self._max_cost = max_cost
+
+    def _exceeded(self) -> str | None:
+        if self._usage.cost >= self._max_cost:
+            return f"Cost budget of {self._max_cost:.4f} reached"
+        return None
+
+
+class WallClockTermination(_BudgetTermination):
+    """Terminate the run when it has been running for `max_seconds`"""
+
+    def __init__(self, max_seconds: float) -> None:
+        super().__init__()
+        self._max_seconds = max_seconds
+
+    def _exceeded(self) -> str | None:
+        if self._usage.elapsed_seconds >= self._max_seconds:
+            return f"Time budget of {self._max_seconds:g}s reached"
+        return None
+
+
+def message_texts(message: AgentEvent | ChatMessage) -> Iterator[str]:
+    """The text in a message: its content if that's a string, or the text parts of a MultiModalMessage"""
+    if isinstance(message, MultiModalMessage):
+        yield from (item for item in message.content if isinstance(item, str))
+    elif isinstance(message.content, str):
+        yield message.content
+
+
+class PhraseTermination(IncrementalTermination):
+    """Terminate when a message's text contains any of `phrases` (see module docstring)
+
+    Args:
+        phrases: The phrase(s) to look for.
+        sources: Check only messages from these agents.
+        whole_message: The text must be exactly one of the phrases rather than contain it.
+        ignore_case: Match phrases regardless of case.
+    """
+
+    def __init__(self, phrases: str | Sequence[str], sources: Sequence[str] | None = None,
+                 whole_message: bool = False, ignore_case: bool = False) -> None:
+        super().__init__()
+        self._phrases = [phrases] if isinstance(phrases, str) else list(phrases)
+        self._sources = set(sources) if sources is not None else None
+        self._ignore_case = ignore_case
+        if whole_message:
+            self._whole_messages = {self._normalize(phrase): phrase for phrase in self._phrases}
+            self._matcher = None
+        else:
+            self._whole_messages = None
+            self._matcher = PhraseMatcher(self._phrases, ignore_case=ignore_case)
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self._ignore_case else text
+
+    def _match(self, text: str) -> str | None:
+        if self._matcher is not None:
+            return self._matcher.search(text)
+        return self._whole_messages.get(self._normalize(text))
+
+    def _check(self, messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
+        for message in messages:
+            if self._sources is not None and message.source not in self._sources:
+                continue
+            for text in message_texts(message):
+                phrase = self._match(text)
+                if phrase is not None:
+                    return f"Text '{phrase}' mentioned"
+        return None
+
+
+class TextContentTermination(PhraseTermination):
+    """Terminate when a message's text is exactly `text` (or one of them), e.g. an agent replying just "TERMINATE"
+
+    Args:
+        text: The text(s) to compare the message to.
+        sources: Check only messages of the specified agents for the text to look for.
+    """
+
+    def __init__(self, text: str | Sequence[str], sources: Sequence[str] | None = None) -> None:
+        super().__init__(text, sources, whole_message=True)
+
+
+class AgentTextMessageTermination(IncrementalTermination):
+    """Terminate when an agent replies with a TextMessage (e.g. to hand back to the user in a Swarm)
+
+    Unlike the other conditions it doesn't stay terminated, so it can be called again without a reset.
+    """
+
+    _latch = False
+
+    def _check(self, messages: Sequence[AgentEvent | ChatMessage]) -> str | None:
+        if len(messages) == 0:
+            return None
+        if _logger.isEnabledFor(logging.DEBUG):
+            for message in messages:
+                _logger.debug(f"New message: {message}")
+        # Stop on a text message not from the user
+        # May want to change this to stop on the first message that isn't a handoff or function call etc
+        if isinstance(messages[-1], TextMessage) and messages[-1].source != "user":
+            return "TextMessage received"
+        return None
+
+
+def budget_termination(max_seconds: float | None = None, max_total_tokens: int | None = None,
+                       max_cost: float | None = None, pricing: ModelPricing | None = None,
+                       agent_pricing: Mapping[str, ModelPricing] | None = None) -> TerminationCondition | None:
+    """The budget conditions for the limits that are set, combined with | (None if no limits are set)"""
+    conditions: list[TerminationCondition] = []
+    if max_seconds is not None:
+        conditions.append(WallClockTermination(max_seconds))
+    if max_total_tokens is not None:
+        conditions.append(TokenBudgetTermination(max_total_tokens=max_total_tokens))
+    if max_cost is not None:
+        if pricing is None:
+            raise ValueError("pricing is required for a cost budget")
+        conditions.append(CostBudgetTermination(max_cost, pricing, agent_pricing))
+    if len(conditions) == 0:
+        return None
+    termination = conditions[0]
+    for condition in conditions[1:]:
+        termination = termination | condition
+    return termination
+
+
+def with_budget(termination: TerminationCondition | None, budget: TerminationCondition | None) -> TerminationCondition | None:
+    """`termination | budget`, allowing for either being None"""
+    if termination is None or budget is None:
+        return termination if budget is None else budget
+    return termination | budget
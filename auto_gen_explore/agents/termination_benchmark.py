@@ -0,0 +1,155 @@
+"""Benchmark of termination condition checks over long runs
+
+Two comparisons, each over a generated run of text (and MultiModalMessage) messages that ends
+with the termination text:
+    - thread: the condition is called with the whole thread after each message (as a loop of our
+      own would call it) - a condition that rescans every message (as the TextContentTermination
+      in app_code_exec_agent_chat_data used to) vs the IncrementalTermination cursor
+    - phrases: the condition is called with each new message (as the teams call it) with an
+      increasing number of phrases - checking each phrase in turn vs the PhraseMatcher
+
+Usage:
+    python -m auto_gen_explore.agents.termination_benchmark
+    python -m auto_gen_explore.agents.termination_benchmark --messages 2000 --phrases 1 10 100 500
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Sequence
+
+from autogen_agentchat.base import TerminationCondition
+from autogen_agentchat.messages import AgentEvent, ChatMessage, MultiModalMessage, StopMessage, TextMessage
+
+from auto_gen_explore.agents.termination import PhraseTermination, TextContentTermination, message_texts
+
+_words = ("the lights in the kitchen are on batch recipe meal plan dinner tomorrow ingredients "
+          "source time days manufacture result temperature bedroom turn off set brightness "
+          "schedule order shopping list chicken pasta vegetables sauce oven minutes").split()
+
+
+class RescanTextContentTermination(TerminationCondition):
+    """Checks every message it's passed on every call (the baseline for the thread comparison)"""
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
+        for message in messages:
+            if any(text == self._text for text in message_texts(message)):
+                self._terminated = True
+                return StopMessage(content=f"Text '{self._text}' mentioned", source=self.__class__.__name__)
+        return None
+
+    async def reset(self) -> None:
+        self._terminated = False
+
+
+class NaivePhraseTermination(TerminationCondition):
+    """Checks the new messages for each phrase in turn (the baseline for the phrases comparison)"""
+
+    def __init__(self, phrases: Sequence[str]) -> None:
+        self._phrases = list(phrases)
+        self._terminated = False
+
+    @property
+    def terminated(self) -> bool:
+        return self._terminated
+
+    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
+        for message in messages:
+            for text in message_texts(message):
+                for phrase in self._phrases:
+                    if phrase in text:
+                        self._terminated = True
+                        return StopMessage(content=f"Text '{phrase}' mentioned", source=self.__class__.__name__)
+        return None
+
+    async def reset(self) -> None:
+        self._terminated = False
+
+
+def generate_run(messages: int, words_per_message: int, terminate_text: str, seed: int = 0) -> list[ChatMessage]:
+    """`messages` messages of random words (every fifth a MultiModalMessage), the last being `terminate_text`"""
+    rng = random.Random(seed)
+    run: list[ChatMessage] = []
+    for index in range(messages - 1):
+        text = " ".join(rng.choice(_words) for _ in range(words_per_message))
+        source = "user" if index % 2 == 0 else "assistant"
+        if index % 5 == 4:
+            run.append(MultiModalMessage(source=source, content=[text, text]))
+        else:
+            run.append(TextMessage(source=source, content=text))
+    run.append(TextMessage(source="assistant", content=terminate_text))
+    return run
+
+
+def generate_phrases(count: int, seed: int = 0) -> list[str]:
+    """`count` phrases made of the run's words (so they share its characters) that don't occur in it"""
+    rng = random.Random(seed)
+    phrases: list[str] = []
+    while len(phrases) < count:
+        phrase = f"{rng.choice(_words)} {rng.choice(_words)} {rng.randint(100, 999)}"
+        if phrase not in phrases:
+            phrases.append(phrase)
+    return phrases
+
+
+async def time_thread_calls(condition: TerminationCondition, run: list[ChatMessage]) -> float:
+    """Seconds to call the condition with the thread so far after each message"""
+    thread: list[ChatMessage] = []
+    start = time.perf_counter()
+    for message in run:
+        thread.append(message)
+        if await condition(thread) is not None:
+            break
+    elapsed = time.perf_counter() - start
+    assert condition.terminated, "condition didn't stop the run"
+    return elapsed
+
+
+async def time_delta_calls(condition: TerminationCondition, run: list[ChatMessage]) -> float:
+    """Seconds to call the condition with each new message"""
+    start = time.perf_counter()
+    for message in run:
+        if await condition([message]) is not None:
+            break
+    elapsed = time.perf_counter() - start
+    assert condition.terminated, "condition didn't stop the run"
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Termination condition checks over long runs")
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 500, 2000], help="Messages in a run")
+    parser.add_argument("--words", type=int, default=60, help="Words per message")
+    parser.add_argument("--phrases", type=int, nargs="+", default=[1, 10, 100, 500], help="Phrase counts")
+    args = parser.parse_args()
+
+    print("thread: condition called with the whole thread after each message")
+    print(f"{'messages':>8} {'rescan (ms)':>12} {'cursor (ms)':>12}")
+    for messages in args.messages:
+        run = generate_run(messages, args.words, "TERMINATE")
+        rescan = await time_thread_calls(RescanTextContentTermination("TERMINATE"), run)
+        cursor = await time_thread_calls(TextContentTermination("TERMINATE"), run)
+        print(f"{messages:>8} {rescan * 1000:>12.2f} {cursor * 1000:>12.2f}", flush=True)
+
+    print()
+    print("phrases: condition called with each new message")
+    print(f"{'messages':>8} {'phrases':>8} {'naive (ms)':>11} {'matcher (ms)':>13}")
+    for messages in args.messages:
+        for count in args.phrases:
+            phrases = generate_phrases(count)
+            run = generate_run(messages, args.words, f"done - {phrases[-1]}")
+            naive = await time_delta_calls(NaivePhraseTermination(phrases), run)
+            matcher = await time_delta_calls(PhraseTermination(phrases), run)
+            print(f"{messages:>8} {count:>8} {naive * 1000:>11.2f} {matcher * 1000:>13.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
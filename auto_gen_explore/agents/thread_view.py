@@ -0,0 +1,156 @@
+"""Per-agent views of the shared Swarm thread
+
+In a Swarm every agent's model context accumulates everything that happens in the session:
+other agents' text, every "Transferred to ..." handoff and - via HandoffMessage.context - the
+tool calls and results of whichever agent handed off. So lights_agent ends up sending all of
+meals_agent's tool traffic to the model and vice versa, and prompt size grows with total
+session activity rather than with what's relevant to the agent.
+
+ThreadViewContext keeps the full thread (so saved state is unchanged and the view can be
+switched at any time) but only returns the messages allowed by a ThreadViewPolicy:
+    - the agent's own tool calls and results are always included
+    - user messages and agents' text replies (i.e. what the user saw) are always included
+    - other agents' tool traffic is included in full, collapsed to a one-line summary or dropped
+    - handoff messages are all included, only those to/from the agent, or none
+
+The view is extended with just the new messages on each get_messages call rather than re-filtering the thread.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Sequence
+
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import AssistantMessage, FunctionExecutionResultMessage, LLMMessage, UserMessage
+
+# Default HandoffMessage content for AssistantAgent handoffs
+_transfer_pattern = re.compile(r"^Transferred to (\w+), adopting the role of \1 immediately\.$")
+
+
+@dataclass(frozen=True)
+class ThreadViewPolicy:
+    other_tool_calls: str = "full"  # full, summary or drop
+    handoffs: str = "all"  # all, relevant (to/from the agent) or none
+    summary_result_chars: int = 100  # results are truncated to this length in summaries
+
+    def __post_init__(self):
+        if self.other_tool_calls not in ("full", "summary", "drop"):
+            raise ValueError(f"other_tool_calls must be full, summary or drop (got {self.other_tool_calls})")
+        if self.handoffs not in ("all", "relevant", "none"):
+            raise ValueError(f"handoffs must be all, relevant or none (got {self.handoffs})")
+
+    @property
+    def is_full(self) -> bool:
+        return self.other_tool_calls == "full" and self.handoffs == "all"
+
+
+thread_view_policies = {
+    "full": ThreadViewPolicy(),
+    "focused": ThreadViewPolicy(other_tool_calls="summary", handoffs="relevant"),
+    "minimal": ThreadViewPolicy(other_tool_calls="drop", handoffs="none"),
+}
+
+
+def thread_view_policy(name: str) -> ThreadViewPolicy:
+    policy = thread_view_policies.get(name)
+    if policy is None:
+        raise ValueError(f"Unknown thread view: {name} (expected one of {', '.join(thread_view_policies)})")
+    return policy
+
+
+class _ThreadFilter:
+    """Incremental filter state (other agents' tool calls waiting for their results)"""
+
+    def __init__(self, agent_name: str, policy: ThreadViewPolicy):
+        self._agent_name = agent_name
+        self._policy = policy
+        self._pending_calls: dict[str, tuple[str, Any]] = {}  # call id -> (source, FunctionCall)
+
+    def _summarise(self, message: FunctionExecutionResultMessage) -> UserMessage:
+        source = None
+        parts = []
+        for result in message.content:
+            source, call = self._pending_calls.pop(result.call_id)
+            content = result.content
+            if len(content) > self._policy.summary_result_chars:
+                content = content[:self._policy.summary_result_chars] + "..."
+            parts.append(f"{call.name}({call.arguments}) -> {content}")
+        return UserMessage(source=source, content=f"[{source} tool calls] " + "; ".join(parts))
+
+    def apply(self, message: LLMMessage) -> LLMMessage | None:
+        """The message as it appears in the view (None if it's hidden)"""
+        policy = self._policy
+        if isinstance(message, AssistantMessage) and isinstance(message.content, list) \
+                and message.source != self._agent_name and policy.other_tool_calls != "full":
+            for call in message.content:
+                self._pending_calls[call.id] = (message.source, call)
+            return None
+
+        if isinstance(message, FunctionExecutionResultMessage) and len(message.content) > 0 \
+                and all(result.call_id in self._pending_calls for result in message.content):
+            if policy.other_tool_calls == "drop":
+                for result in message.content:
+                    self._pending_calls.pop(result.call_id)
+                return None
+            return self._summarise(message)
+
+        if isinstance(message, UserMessage) and isinstance(message.content, str) and policy.handoffs != "all":
+            transfer = _transfer_pattern.match(message.content)
+            if transfer is not None:
+                if policy.handoffs == "none":
+                    return None
+                if self._agent_name not in (message.source, transfer.group(1)):
+                    return None
+
+        return message
+
+
+def filter_thread(messages: Sequence[LLMMessage], agent_name: str, policy: ThreadViewPolicy) -> list[LLMMessage]:
+    """The messages in `agent_name`'s view of a thread"""
+    if policy.is_full:
+        return list(messages)
+    thread_filter = _ThreadFilter(agent_name, policy)
+    view = []
+    for message in messages:
+        viewed = thread_filter.apply(message)
+        if viewed is not None:
+            view.append(viewed)
+    return view
+
+
+class ThreadViewContext(ChatCompletionContext):
+    """Model context that returns an agent's view of the thread (see ThreadViewPolicy)"""
+
+    def __init__(self, agent_name: str, policy: ThreadViewPolicy | None = None,
+                 initial_messages: List[LLMMessage] | None = None):
+        super().__init__(initial_messages)
+        self._agent_name = agent_name
+        self._policy = policy or ThreadViewPolicy()
+        self._reset_view()
+
+    @property
+    def policy(self) -> ThreadViewPolicy:
+        return self._policy
+
+    def _reset_view(self):
+        self._filter = _ThreadFilter(self._agent_name, self._policy)
+        self._view: list[LLMMessage] = []
+        self._viewed_count = 0
+
+    async def get_messages(self) -> List[LLMMessage]:
+        if self._policy.is_full:
+            return list(self._messages)
+        for message in self._messages[self._viewed_count:]:
+            viewed = self._filter.apply(message)
+            if viewed is not None:
+                self._view.append(viewed)
+        self._viewed_count = len(self._messages)
+        return list(self._view)
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._reset_view()
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state(state)
+        self._reset_view()
+
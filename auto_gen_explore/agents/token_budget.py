@@ -0,0 +1,197 @@
+"""Model context bounded by a token budget rather than a message count
+
+BufferedChatCompletionContext keeps the last N messages, so prompt size still depends on how
+long those messages are (a tool result listing every dish can be bigger than the rest of the
+conversation). TokenBudgetedChatCompletionContext keeps the most recent messages that fit in
+`token_budget` tokens instead.
+
+When the budget is exceeded the context is trimmed to `trim_ratio` x the budget, so it isn't
+trimmed again (and the prompt prefix stays stable) for the next few calls. With a
+`summary_client` the trimmed messages are folded into a running summary (one model call per
+trim) that is sent ahead of the kept messages; otherwise they're dropped.
+
+Token counts are cached per message (MessageTokenCounter) so the budget check doesn't
+re-tokenize the conversation on every call. The core RoutedAgent examples that keep their own
+message lists can use trim_to_budget with a MessageTokenCounter in the same way.
+"""
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, List, Mapping, Sequence
+
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import (ChatCompletionClient, FunctionExecutionResultMessage, LLMMessage, SystemMessage,
+                                 UserMessage)
+
+from auto_gen_explore.models.wrapper import approximate_token_count
+
+_logger = logging.getLogger(__name__)
+
+_summary_source = "conversation_summary"
+_summary_prompt = ("Summarise the conversation so far in a few sentences. Keep any facts, decisions and "
+                   "tool results that later messages may rely on (names, ids, times, quantities).")
+
+
+def _message_key(message: LLMMessage) -> tuple:
+    content = message.content
+    if isinstance(content, list):
+        content = tuple(json.dumps(item.model_dump(mode="json"), sort_keys=True)
+                        if hasattr(item, "model_dump") else str(item) for item in content)
+    return (type(message).__name__, getattr(message, "source", None), content)
+
+
+class MessageTokenCounter:
+    """Token counts for individual messages, cached by message content
+
+    Counts come from the model client's tokenizer (falling back to an approximation if that
+    fails, e.g. when the tokenizer can't be downloaded) or the approximation if there's no client.
+    The cache is keyed on content rather than object identity so it also works for the core
+    agents, whose message lists are copied as they're passed between agents.
+    """
+
+    def __init__(self, model_client: ChatCompletionClient | None = None, max_entries: int = 10000):
+        self._model_client = model_client
+        self._max_entries = max_entries
+        self._counts: OrderedDict[tuple, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _tokenize(self, message: LLMMessage) -> int:
+        if self._model_client is not None:
+            try:
+                return self._model_client.count_tokens([message])
+            except Exception as e:
+                _logger.debug(f"count_tokens failed, using approximation: {e}")
+        return approximate_token_count([message])
+
+    def count(self, message: LLMMessage) -> int:
+        key = _message_key(message)
+        tokens = self._counts.get(key)
+        if tokens is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return tokens
+        self.misses += 1
+        tokens = self._tokenize(message)
+        self._counts[key] = tokens
+        if len(self._counts) > self._max_entries:
+            self._counts.popitem(last=False)
+        return tokens
+
+    def total(self, messages: Sequence[LLMMessage]) -> int:
+        return sum(self.count(message) for message in messages)
+
+
+def _budget_start(counts: Sequence[int], messages: Sequence[LLMMessage], token_budget: int) -> int:
+    """Index of the first of the most recent messages that fit in the budget (always at least one message)"""
+    start = len(messages)
+    total = 0
+    while start > 0 and (start == len(messages) or total + counts[start - 1] <= token_budget):
+        start -= 1
+        total += counts[start]
+    # Tool results can't be sent without the tool calls they answer
+    if start < len(messages) and isinstance(messages[start], FunctionExecutionResultMessage):
+        start = start + 1 if start + 1 < len(messages) else max(0, start - 1)
+    return start
+
+
+def trim_to_budget(messages: Sequence[LLMMessage], token_budget: int, counter: MessageTokenCounter) -> list[LLMMessage]:
+    """The most recent messages that fit in `token_budget` tokens"""
+    counts = [counter.count(message) for message in messages]
+    if sum(counts) <= token_budget:
+        return list(messages)
+    start = _budget_start(counts, messages, token_budget)
+    _logger.debug(f"Trimmed {start} of {len(messages)} messages to fit {token_budget} tokens")
+    return list(messages[start:])
+
+
+def _transcript(messages: Sequence[LLMMessage]) -> str:
+    lines = []
+    for message in messages:
+        source = getattr(message, "source", "tool")
+        content = message.content
+        if isinstance(content, list):
+            content = "; ".join(str(item) for item in content)
+        lines.append(f"{source}: {content}")
+    return "\n".join(lines)
+
+
+class TokenBudgetedChatCompletionContext(ChatCompletionContext):
+    """Model context that keeps the most recent messages within a token budget (see module docstring)
+
+    `model_client` is used to count tokens (pass the agent's client so counts match its tokenizer).
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        model_client: ChatCompletionClient | None = None,
+        summary_client: ChatCompletionClient | None = None,
+        trim_ratio: float = 0.75,
+        initial_messages: List[LLMMessage] | None = None,
+    ):
+        super().__init__(initial_messages)
+        if token_budget <= 0:
+            raise ValueError("token_budget must be greater than 0")
+        self._token_budget = token_budget
+        self._counter = MessageTokenCounter(model_client)
+        self._summary_client = summary_client
+        self._trim_ratio = trim_ratio
+        self._start = 0  # index of the first message still in the context
+        self._summary: str | None = None
+
+    @property
+    def counter(self) -> MessageTokenCounter:
+        return self._counter
+
+    def _summary_message(self) -> UserMessage | None:
+        if self._summary is None:
+            return None
+        return UserMessage(source=_summary_source, content=f"Summary of the earlier conversation: {self._summary}")
+
+    async def _summarise(self, trimmed: Sequence[LLMMessage]):
+        previous = f"Previous summary: {self._summary}\n\n" if self._summary else ""
+        try:
+            result = await self._summary_client.create([
+                SystemMessage(content=_summary_prompt),
+                UserMessage(source="user", content=previous + _transcript(trimmed)),
+            ])
+        except Exception as e:
+            # the context still works without the summary - keep the previous one
+            _logger.warning(f"Failed to summarise {len(trimmed)} trimmed messages: {e}")
+            return
+        if isinstance(result.content, str):
+            self._summary = result.content
+
+    async def get_messages(self) -> List[LLMMessage]:
+        messages = self._messages[self._start:]
+        counts = [self._counter.count(message) for message in messages]
+        summary = self._summary_message()
+        summary_tokens = self._counter.count(summary) if summary is not None else 0
+        if summary_tokens + sum(counts) > self._token_budget:
+            # trim below the budget so that the next few calls don't need trimming
+            target = int(self._token_budget * self._trim_ratio) - summary_tokens
+            trimmed = _budget_start(counts, messages, max(0, target))
+            if self._summary_client is not None and trimmed > 0:
+                await self._summarise(messages[:trimmed])
+            self._start += trimmed
+            messages = messages[trimmed:]
+            summary = self._summary_message()
+            _logger.debug(f"Trimmed {trimmed} messages ({self._start} in total) to fit {self._token_budget} tokens")
+        return ([summary] if summary is not None else []) + list(messages)
+
+    async def clear(self) -> None:
+        await super().clear()
+        self._start = 0
+        self._summary = None
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(await super().save_state())
+        state["start"] = self._start
+        state["summary"] = self._summary
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state(state)
+        self._start = state.get("start", 0)
+        self._summary = state.get("summary")
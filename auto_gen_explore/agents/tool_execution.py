@@ -0,0 +1,138 @@
+"""Concurrent execution of the tool calls from a single model response
+
+When the model asks for several tools at once they're usually independent lookups, so running
+them one after another makes the turn take the sum of their durations. ToolExecutor runs them
+concurrently (sync tools already run on worker threads via FunctionTool) and returns the
+results in the original call order.
+
+Tools can declare constraints with the @tool_concurrency decorator:
+    - group: calls to tools in the same group run one at a time, in call order (e.g. tools that
+      mutate the same plugin state, or that prompt on the console)
+    - limit: maximum number of concurrent calls to the tool
+    - timeout_seconds: the tool's own timeout in place of the executor's (0 for no timeout, e.g. for
+      tools that wait on a person)
+
+Each call can have a timeout (not counting time spent waiting for its group or limit) - a call
+that fails or times out is recorded as an error result for the model rather than failing (or
+stalling) the whole turn. NOTE: a sync tool that times out keeps running on its worker thread, so
+a tool that changes state can still make the change after the model was told it failed (and the
+model may well call it again) - there's no timeout unless one is set.
+
+With a TurnDeadline (agents/deadline.py) the calls are cancelled when the turn's deadline passes:
+calls that completed keep their results and the others get error results, so the agent can
+return the partial results.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Mapping, Sequence
+
+from autogen_core import CancellationToken, FunctionCall
+from autogen_core.models import FunctionExecutionResult
+from autogen_core.tools import FunctionTool, Tool
+
+from auto_gen_explore.agents.deadline import DeadlineExceeded, TurnDeadline
+
+_logger = logging.getLogger(__name__)
+
+
+def tool_concurrency(group: str | None = None, limit: int | None = None,
+                     timeout_seconds: float | None = None) -> Callable:
+    """Decorator to declare the concurrency constraints (and timeout) for a tool function"""
+    def decorator(func):
+        func.concurrency_group = group
+        func.concurrency_limit = limit
+        func.timeout_seconds = timeout_seconds
+        return func
+    return decorator
+
+
+def _tool_func(tool: Tool):
+    return tool._func if isinstance(tool, FunctionTool) else tool
+
+
+class ToolExecutor:
+    """Runs tool calls concurrently, respecting the tools' concurrency groups and limits"""
+
+    def __init__(self, tools: Mapping[str, Tool], timeout_seconds: float | None = None):
+        self._tools = dict(tools)
+        self._timeout_seconds = timeout_seconds
+        self._group_locks: dict[str, asyncio.Lock] = {}
+        self._tool_groups: dict[str, str] = {}
+        self._tool_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._tool_timeouts: dict[str, float | None] = {}
+        for name, tool in self._tools.items():
+            func = _tool_func(tool)
+            group = getattr(func, "concurrency_group", None)
+            if group is not None:
+                self._tool_groups[name] = group
+                self._group_locks.setdefault(group, asyncio.Lock())
+            limit = getattr(func, "concurrency_limit", None)
+            if limit is not None:
+                self._tool_semaphores[name] = asyncio.Semaphore(limit)
+            timeout_seconds = getattr(func, "timeout_seconds", None)
+            if timeout_seconds is not None:
+                self._tool_timeouts[name] = timeout_seconds if timeout_seconds > 0 else None
+
+    def _timeout(self, call: FunctionCall) -> float | None:
+        return self._tool_timeouts.get(call.name, self._timeout_seconds)
+
+    async def _run_tool(self, call: FunctionCall, cancellation_token: CancellationToken,
+                        deadline: TurnDeadline | None) -> str:
+        tool = self._tools[call.name]
+        arguments = json.loads(call.arguments)
+        group_lock = self._group_locks.get(self._tool_groups.get(call.name))
+        semaphore = self._tool_semaphores.get(call.name)
+        # Locks are acquired in call order (asyncio locks are FIFO and gather starts the calls in order)
+        if group_lock is not None:
+            await group_lock.acquire()
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                # the timeout doesn't include waiting for the group/limit
+                run = tool.run_json(arguments, cancellation_token)
+                if deadline is not None:
+                    run = deadline.run(run)
+                result = await asyncio.wait_for(run, self._timeout(call))
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+        finally:
+            if group_lock is not None:
+                group_lock.release()
+        return tool.return_value_as_string(result)
+
+    async def _run_call(self, call: FunctionCall, cancellation_token: CancellationToken,
+                        deadline: TurnDeadline | None) -> FunctionExecutionResult:
+        start = time.perf_counter()
+        try:
+            content = await self._run_tool(call, cancellation_token, deadline)
+        except DeadlineExceeded:
+            _logger.warning(f"Tool call {call.name} ({call.id}) cancelled - the turn's deadline was exceeded")
+            return FunctionExecutionResult(
+                call_id=call.id, name=call.name, is_error=True,
+                content=f"Error: {call.name} was cancelled as the deadline for this request was exceeded")
+        except asyncio.TimeoutError:
+            _logger.warning(f"Tool call {call.name} ({call.id}) timed out after {self._timeout(call)}s")
+            return FunctionExecutionResult(
+                call_id=call.id, name=call.name, is_error=True,
+                content=f"Error: {call.name} timed out after {self._timeout(call)}s")
+        except Exception as e:
+            _logger.warning(f"Tool call {call.name} ({call.id}) failed: {e!r}")
+            return FunctionExecutionResult(call_id=call.id, name=call.name, is_error=True, content=f"Error: {e}")
+        _logger.debug(f"Tool call {call.name} ({call.id}) took {time.perf_counter() - start:.3f}s")
+        return FunctionExecutionResult(call_id=call.id, name=call.name, is_error=False, content=content)
+
+    async def run(self, calls: Sequence[FunctionCall], cancellation_token: CancellationToken | None = None,
+                  deadline: TurnDeadline | None = None) -> list[FunctionExecutionResult]:
+        """Run the calls concurrently - results are in the same order as the calls
+
+        With a deadline, the calls are run with the deadline's cancellation token (rather than
+        `cancellation_token`) and those still outstanding when it passes get error results.
+        """
+        if deadline is not None:
+            cancellation_token = deadline.cancellation_token
+        cancellation_token = cancellation_token or CancellationToken()
+        return list(await asyncio.gather(*(self._run_call(call, cancellation_token, deadline) for call in calls)))
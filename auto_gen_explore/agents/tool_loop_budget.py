@@ -0,0 +1,155 @@
+"""Limits on the model -> tool calls -> model loop an agent runs for each task
+
+The handoff AIAgents call the model again with the tool results for as long as it keeps asking
+for tools, so a confused model can make dozens of round trips for one user message. A
+ToolLoopGuard sets per-task limits on:
+    - max_rounds: model responses with tool calls (i.e. rounds of tool calls)
+    - max_prompt_tokens: prompt tokens used by the task's model calls (from models_usage)
+    - max_seconds: wall clock time since the task started
+Each task gets a ToolLoopBudget from the guard; the agent records each model result and checks
+the budget before running the tools it asks for. On a breach the loop stops and the agent replies
+with a ToolLoopError (rather than running the tools and calling the model again). As a model call
+or tool can take a while on its own, max_seconds is also enforced as a deadline for the task
+(budget.deadline() - the agent's TurnDeadline cancels whatever is outstanding when it passes).
+
+The guard keeps ToolLoopStats (tasks, rounds, prompt tokens and breaches by limit) for all the
+tasks it has budgeted - the guard from factory.tool_loop_guard() is shared by the agents in a process.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from autogen_core import FunctionCall
+from autogen_core.models import CreateResult
+from pydantic import BaseModel
+
+_logger = logging.getLogger(__name__)
+
+
+class ToolLoopError(BaseModel):
+    """Why an agent stopped its tool loop (sent in place of a completed result)"""
+    agent_type: str
+    limit: str  # max_rounds, max_prompt_tokens or max_seconds
+    threshold: float
+    value: float
+    rounds: int
+    prompt_tokens: int
+    elapsed_seconds: float
+
+    def __str__(self) -> str:
+        return (f"{self.agent_type} stopped its tool loop: {self.limit} {self.value:g} exceeded the limit of "
+                f"{self.threshold:g} ({self.rounds} tool rounds requested, {self.prompt_tokens} prompt tokens, "
+                f"{self.elapsed_seconds:.1f}s)")
+
+
+@dataclass
+class ToolLoopStats:
+    tasks: int = 0
+    rounds: int = 0
+    prompt_tokens: int = 0
+    max_rounds_in_task: int = 0
+    breaches: Counter = field(default_factory=Counter)  # limit name -> tasks stopped by it
+
+    def to_dict(self) -> dict:
+        return {
+            "tasks": self.tasks,
+            "rounds": self.rounds,
+            "prompt_tokens": self.prompt_tokens,
+            "max_rounds_in_task": self.max_rounds_in_task,
+            "breaches": dict(self.breaches),
+        }
+
+    def __str__(self) -> str:
+        breaches = ", ".join(f"{limit}={count}" for limit, count in self.breaches.items()) or "none"
+        return (f"{self.tasks} tasks, {self.rounds} tool rounds (max {self.max_rounds_in_task} in a task), "
+                f"{self.prompt_tokens} prompt tokens, breaches: {breaches}")
+
+
+class ToolLoopBudget:
+    """One task's usage against the guard's limits"""
+
+    def __init__(self, guard: "ToolLoopGuard", agent_type: str):
+        self._guard = guard
+        self._agent_type = agent_type
+        self._start = time.monotonic()
+        self.rounds = 0
+        self.prompt_tokens = 0
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return time.monotonic() - self._start
+
+    def deadline(self, turn_deadline: float | None = None) -> float | None:
+        """time.time() when max_seconds runs out - or `turn_deadline`, if that's earlier (None for neither)"""
+        if self._guard.max_seconds is None:
+            return turn_deadline
+        expires_at = time.time() + self._guard.max_seconds - self.elapsed_seconds
+        return expires_at if turn_deadline is None else min(expires_at, turn_deadline)
+
+    def record(self, result: CreateResult):
+        """Record a model result (a round if it asks for tools)"""
+        prompt_tokens = result.usage.prompt_tokens if result.usage is not None else 0
+        self.prompt_tokens += prompt_tokens
+        is_round = isinstance(result.content, list) and all(isinstance(m, FunctionCall) for m in result.content)
+        if is_round:
+            self.rounds += 1
+        self._guard._record(prompt_tokens, is_round)
+
+    def check(self) -> ToolLoopError | None:
+        """The first limit that has been exceeded (None if the loop can continue)"""
+        guard = self._guard
+        for limit, threshold, value in [
+            ("max_rounds", guard.max_rounds, self.rounds),
+            ("max_prompt_tokens", guard.max_prompt_tokens, self.prompt_tokens),
+            ("max_seconds", guard.max_seconds, self.elapsed_seconds),
+        ]:
+            if threshold is not None and value > threshold:
+                error = ToolLoopError(agent_type=self._agent_type, limit=limit, threshold=threshold, value=value,
+                                      rounds=self.rounds, prompt_tokens=self.prompt_tokens,
+                                      elapsed_seconds=self.elapsed_seconds)
+                guard._record_breach(error)
+                return error
+        return None
+
+    def finish(self):
+        self._guard._record_finish(self.rounds)
+
+    def __enter__(self) -> "ToolLoopBudget":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finish()
+
+
+class ToolLoopGuard:
+    """Per-task tool loop limits, and stats for the tasks budgeted (see module docstring)"""
+
+    def __init__(self, max_rounds: int | None = None, max_prompt_tokens: int | None = None,
+                 max_seconds: float | None = None):
+        self.max_rounds = max_rounds
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_seconds = max_seconds
+        self.stats = ToolLoopStats()
+        self._lock = threading.Lock()  # agents may be on different threads' loops (e.g. app_web sessions)
+
+    def budget(self, agent_type: str) -> ToolLoopBudget:
+        """Start budgeting a task"""
+        with self._lock:
+            self.stats.tasks += 1
+        return ToolLoopBudget(self, agent_type)
+
+    def _record(self, prompt_tokens: int, is_round: bool):
+        with self._lock:
+            self.stats.prompt_tokens += prompt_tokens
+            self.stats.rounds += 1 if is_round else 0
+
+    def _record_breach(self, error: ToolLoopError):
+        with self._lock:
+            self.stats.breaches[error.limit] += 1
+        _logger.warning(f"Tool loop stopped: {error} - {self.stats}")
+
+    def _record_finish(self, rounds: int):
+        with self._lock:
+            self.stats.max_rounds_in_task = max(self.stats.max_rounds_in_task, rounds)
@@ -1,86 +1,72 @@
 import json
 import logging
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-
-from typing import Sequence
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import HandoffTermination
-from autogen_agentchat.base import Response, TaskResult, TerminationCondition, TerminatedException
-from autogen_agentchat.messages import HandoffMessage, AgentEvent, ChatMessage, StopMessage, TextMessage
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import (HandoffMessage, TextMessage,
+                                        ToolCallExecutionEvent, ToolCallRequestEvent)
 from autogen_agentchat.teams import Swarm
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from autogen_core import FunctionCall
+from autogen_core.models import AssistantMessage, FunctionExecutionResult, UserMessage
 
 from auto_gen_explore import config
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.templated_reflection import TemplatedReflectionAssistantAgent
+from auto_gen_explore.agents.thread_view import ThreadViewContext, thread_view_policy
+from auto_gen_explore.app_web.triage_router import TriageRouter
+from auto_gen_explore.plugins.intents import CommandResult, IntentGrammar
 from auto_gen_explore.plugins.lights import LightsPlugin
 from auto_gen_explore.plugins.meals2 import MealsPlugin
 
 _logger = logging.getLogger(__name__)
 
-# Create the token provider
-api_key = config.openai_key_if_set()
-if api_key:
-    token_provider = None
-else:
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,
-    api_key=api_key,
-)
-
-
-class AgentTextMessageTermination(TerminationCondition):
-    """Class that attempts to inject a handoff to the user agent when a text message is received from the agent"""
-
-    def __init__(self) -> None:
-        self._terminated = False
-
-    @property
-    def terminated(self) -> bool:
-        return self._terminated
-
-    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
-        if self.terminated:
-            raise TerminatedException(
-                "Termination condition has already been reached")
-        if len(messages) == 0:
-            return None
+_triage_keywords = {
+    "lights_agent": ["light", "lamp", "porch", "bulb", "bright", "dark"],
+    "meals_agent": ["meal", "dish", "food", "cook", "recipe", "dinner", "lunch", "breakfast", "frozen",
+                    "pasta", "lasagne", "curry", "pizza", "ingredient", "step"],
+}
+_triage_router = None
+
+
+def triage_router() -> TriageRouter | None:
+    """Process-wide triage router (None if TRIAGE_ROUTER_MODE is off)"""
+    global _triage_router
+    if config.triage_router_mode() == "off":
+        return None
+    if _triage_router is None:
+        _triage_router = TriageRouter(
+            _triage_keywords,
+            history_path=config.triage_router_history_path(),
+            threshold=config.triage_router_threshold(),
+        )
+    return _triage_router
 
-        # Stop on first text message not from user
-        # May want to change this to stop on first message that isn't handoff or function call etc
-        if isinstance(messages[-1], TextMessage) and messages[-1].source != "user":
-            # self._terminated = True
-            # raise TerminatedException("Got TextMessage")
-            return StopMessage(content="TextMessage received", source=self.__class__.__name__)
-            # return HandoffMessage(target="user", source=self.__class__.__name__, content="TextMessage received from agent - ask user for input")
 
-    async def reset(self) -> None:
-        self._terminated = False
+def _thread_view_context(agent_name: str) -> ThreadViewContext:
+    return ThreadViewContext(agent_name, thread_view_policy(config.swarm_thread_view(agent_name)))
 
 
 class AgentSession:
 
     def __init__(self, id):
         self.id = id
+        model_client = factory.model_client()
 
         lights_plugin = LightsPlugin()
         self._lights_plugin = lights_plugin
         meals_plugin = MealsPlugin()
         self._meals_plugin = meals_plugin
         self._messages = [] # TODO - is there a way to access this from the agents without storing separately?
+        # Simple commands handled without the agents, and the exchanges to pass to the agents on the next turn
+        self._commands = IntentGrammar(lights_plugin.intents() + meals_plugin.intents()) \
+            if config.command_fast_path_enabled() else None
+        self._command_context = []
 
         triage_agent = AssistantAgent(
             "triage_agent",
-            model_client=model_client,
+            model_client=factory.agent_model_client("triage_agent"),
+            model_context=_thread_view_context("triage_agent"),
             system_message="You are a bot to help users. "
             "Introduce yourself. Always be very brief. "
             "For food related questions, transfer to the meals agent. "
@@ -95,9 +81,10 @@ class AgentSession:
             reflect_on_tool_use=False,
         )
 
-        lights_agent = AssistantAgent(
+        lights_agent = TemplatedReflectionAssistantAgent(
             "lights_agent",
             model_client=model_client,
+            model_context=_thread_view_context("lights_agent"),
             tools=[lights_plugin.get_state, lights_plugin.change_state],
             system_message="You are a an agent that can provide information on the status of lights and turn lights on and off."
             "Always answer in a sentence or less."
@@ -107,9 +94,10 @@ class AgentSession:
             reflect_on_tool_use=True,
         )
 
-        meals_agent = AssistantAgent(
+        meals_agent = TemplatedReflectionAssistantAgent(
             "meals_agent",
             model_client=model_client,
+            model_context=_thread_view_context("meals_agent"),
             tools=[meals_plugin.add_meal, meals_plugin.get_dish_options,
                    meals_plugin.get_dishes, meals_plugin.get_meal_steps, meals_plugin.remove_dish],
             system_message="You are a an agent that can provide information about dishes for meals."
@@ -134,6 +122,11 @@ class AgentSession:
             termination_condition=termination,
         )
 
+    @property
+    def messages(self) -> list[dict]:
+        """The message history for the session (as JSON-serializable dicts)"""
+        return self._messages
+
     def _get_last_message(self):
         """Return the last message that isn't a TaskResult"""
         if len(self._messages) == 0:
@@ -143,23 +136,79 @@ class AgentSession:
         if len(self._messages) >= 2:
             return self._messages[-2]
 
+    def _command_messages(self, text: str, command: CommandResult) -> list:
+        call_id = f"command_{len(self._messages)}"
+        return [
+            TextMessage(source="user", content=text),
+            ToolCallRequestEvent(source=command.agent, content=[
+                FunctionCall(id=call_id, name=command.tool_name, arguments=json.dumps(command.arguments))]),
+            ToolCallExecutionEvent(source=command.agent, content=[
+                FunctionExecutionResult(call_id=call_id, name=command.tool_name, content=str(command.result))]),
+            TextMessage(source=command.agent, content=command.response),
+        ]
+
+    def _take_command_context(self) -> list:
+        """The command exchanges since the agents last ran (so that the agents know about them)"""
+        context = []
+        for exchange in self._command_context:
+            context.append(UserMessage(source="user", content=exchange["user"]))
+            context.append(AssistantMessage(source=exchange["agent"], content=exchange["response"]))
+        self._command_context = []
+        return context
+
     async def run(self, user_input: str):
+        text = user_input
+
+        command = self._commands.execute(text) if self._commands is not None else None
+        if command is not None:
+            _logger.debug(f"Session {self.id} - Handled as a command by {command.tool_name}")
+            messages = self._command_messages(text, command)
+            self._command_context.append({"user": text, "agent": command.agent, "response": command.response})
+            for message in messages:
+                self._messages.append(message.model_dump(mode="json"))
+                yield message
+            self._messages.append({"type": "TaskResult"})
+            yield TaskResult(messages=messages, stop_reason="Handled by command fast path")
+            return
+
         last_message = self._get_last_message()
-        if last_message is not None and "source" in last_message:
-            target = last_message["source"]
+        target = last_message["source"] if last_message is not None and "source" in last_message else None
+
+        # Turns that would start with the triage agent can be routed locally (see triage_router.py)
+        router = triage_router()
+        decision = None
+        routed = False
+        if router is not None and target in (None, "triage_agent"):
+            decision = router.classify(text)
+            if config.triage_router_mode() == "active" and decision.confident:
+                target = decision.target
+                routed = True
+                router.routed(decision)
+
+        if target is not None:
             user_input = HandoffMessage(
-                source="user", target=target, content=user_input)
-            _logger.debug(f"Session {self.id} - Got last message, hand off to {target}")
+                source="user", target=target, content=user_input, context=self._take_command_context())
+            _logger.debug(f"Session {self.id} - Hand off to {target}")
         else:
             _logger.debug(f"Session {self.id} - No last message, using user input")
 
+        first_handoff = None
         async for message in self._team.run_stream(task=user_input):
             if isinstance(message, TaskResult) or isinstance(message, Response):
                 self._messages.append({"type": "TaskResult"})
             else:
                 self._messages.append(message.model_dump(mode="json"))
+                if first_handoff is None and isinstance(message, HandoffMessage) and message.source != "user":
+                    first_handoff = message
             yield message
 
+        if routed:
+            if first_handoff is not None and first_handoff.source == target and first_handoff.target == "triage_agent":
+                router.bounced(decision)
+        elif decision is not None:
+            triage_handoff = first_handoff is not None and first_handoff.source == "triage_agent"
+            router.observe(text, decision, first_handoff.target if triage_handoff else None)
+
     async def save_state(self):
         team_state = await self._team.save_state() if self._team._initialized else None
         lights_state = self._lights_plugin.save_state()
@@ -167,6 +216,7 @@ class AgentSession:
         return {
             "team": team_state,
             "messages": self._messages,
+            "command_context": self._command_context,
             "lights": lights_state,
             "meals": meals_state,
         }
@@ -176,5 +226,6 @@ class AgentSession:
             await self._team.load_state(state["team"])
 
         self._messages = state["messages"]
+        self._command_context = state.get("command_context", [])
         self._lights_plugin.load_state(state["lights"])
         self._meals_plugin.load_state(state["meals"])
@@ -0,0 +1,138 @@
+"""Bulk export/import of persisted sessions
+
+Streams the raw session state from session_file_persistence to/from a single gzipped JSONL
+archive (one `{"id": ..., "state": ...}` line per session) without constructing any
+AgentSession instances. File reads/writes are spread over a pool of worker threads with a
+bounded number of sessions in flight so memory use doesn't grow with the number of sessions.
+
+Usage:
+    python -m auto_gen_explore.app_web.session_archive export sessions.jsonl.gz
+    python -m auto_gen_explore.app_web.session_archive import sessions.jsonl.gz --overwrite
+"""
+import argparse
+import gzip
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from auto_gen_explore.app_web.session_file_persistence import read_session_state, session_ids, write_session_state
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveStats:
+    sessions: int
+    skipped: int
+    elapsed_seconds: float
+
+    @property
+    def sessions_per_second(self) -> float:
+        return self.sessions / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.sessions} sessions ({self.skipped} skipped) in {self.elapsed_seconds:.2f}s ({self.sessions_per_second:.1f} sessions/s)"
+
+
+def _archive_line(id: str) -> str | None:
+    state = read_session_state(id)
+    if state is None:
+        return None  # removed since it was listed
+    state = state.strip()
+    if "\n" in state:
+        # the archive is line-delimited so re-serialize anything that was written with formatting
+        state = json.dumps(json.loads(state))
+    return f'{{"id": {json.dumps(id)}, "state": {state}}}\n'
+
+
+def export_sessions(archive_path: str, workers: int = 8, max_in_flight: int = 256) -> ArchiveStats:
+    """Export all persisted sessions to a gzipped JSONL archive"""
+    start = time.perf_counter()
+    count = 0
+    skipped = 0
+    with gzip.open(archive_path, "wt", encoding="utf-8") as archive, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque()
+
+        def write_next():
+            nonlocal count, skipped
+            line = pending.popleft().result()
+            if line is None:
+                skipped += 1
+            else:
+                archive.write(line)
+                count += 1
+
+        for id in session_ids():
+            pending.append(pool.submit(_archive_line, id))
+            if len(pending) >= max_in_flight:
+                write_next()
+        while pending:
+            write_next()
+
+    stats = ArchiveStats(sessions=count, skipped=skipped, elapsed_seconds=time.perf_counter() - start)
+    _logger.info(f"Exported {stats}")
+    return stats
+
+
+def _import_line(line: str, overwrite: bool) -> bool:
+    entry = json.loads(line)
+    id = entry["id"]
+    if not overwrite and read_session_state(id) is not None:
+        return False
+    write_session_state(id, json.dumps(entry["state"]))
+    return True
+
+
+def import_sessions(archive_path: str, workers: int = 8, max_in_flight: int = 256, overwrite: bool = False) -> ArchiveStats:
+    """Import sessions from a gzipped JSONL archive created by export_sessions"""
+    start = time.perf_counter()
+    count = 0
+    skipped = 0
+    with gzip.open(archive_path, "rt", encoding="utf-8") as archive, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque[Future] = deque()
+
+        def complete_next():
+            nonlocal count, skipped
+            if pending.popleft().result():
+                count += 1
+            else:
+                skipped += 1
+
+        for line in archive:
+            if not line.strip():
+                continue
+            pending.append(pool.submit(_import_line, line, overwrite))
+            if len(pending) >= max_in_flight:
+                complete_next()
+        while pending:
+            complete_next()
+
+    stats = ArchiveStats(sessions=count, skipped=skipped, elapsed_seconds=time.perf_counter() - start)
+    _logger.info(f"Imported {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk export/import of app_web sessions")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("archive", help="Path to the .jsonl.gz archive")
+    parser.add_argument("--workers", type=int, default=8, help="Number of worker threads for file I/O")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="Maximum number of sessions held in memory at once")
+    parser.add_argument("--overwrite", action="store_true", help="(import) Replace sessions that already exist")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        stats = export_sessions(args.archive, workers=args.workers, max_in_flight=args.max_in_flight)
+        print(f"Exported {stats}")
+    else:
+        stats = import_sessions(args.archive, workers=args.workers,
+                                max_in_flight=args.max_in_flight, overwrite=args.overwrite)
+        print(f"Imported {stats}")
+
+
+if __name__ == "__main__":
+    main()
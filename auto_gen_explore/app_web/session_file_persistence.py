@@ -3,28 +3,63 @@ import os
 from auto_gen_explore.app_web.session import AgentSession
 
 _base_path = "./.app_web_state"
+_file_prefix = "session_"
+_file_suffix = ".json"
 
 
 def _filename_for_session(session_id):
-    file_name = os.path.join(_base_path, f"session_{session_id}.json")
+    file_name = os.path.join(_base_path, f"{_file_prefix}{session_id}{_file_suffix}")
     return file_name
 
 
 async def save_session(session: AgentSession):
-    if not os.path.exists(_base_path):
-        os.makedirs(_base_path)
-    file_name = _filename_for_session(session.id)
-    with open(file_name, "w") as f:
-        state = await session.save_state()
-        f.write(json.dumps(state))
+    state = await session.save_state()
+    write_session_state(session.id, json.dumps(state))
 
 
 async def load_session(id) -> AgentSession:
+    state = read_session_state(id)
+    if state is None:
+        return None
+    session = AgentSession(id)
+    await session.load_state(json.loads(state))
+    return session
+
+
+async def load_session_messages(id) -> list[dict] | None:
+    """Load the message history for a session without constructing the session (or its agents)"""
+    state = read_session_state(id)
+    if state is None:
+        return None
+    return json.loads(state)["messages"]
+
+
+def session_ids():
+    """Iterate the ids of all persisted sessions"""
+    if not os.path.exists(_base_path):
+        return
+    with os.scandir(_base_path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.startswith(_file_prefix) and entry.name.endswith(_file_suffix):
+                yield entry.name[len(_file_prefix):-len(_file_suffix)]
+
+
+def read_session_state(id) -> str | None:
+    """Read the raw (JSON) state for a session"""
     file_name = _filename_for_session(id)
     if not os.path.exists(file_name):
         return None
     with open(file_name, "r") as f:
-        state = json.loads(f.read())
-        session = AgentSession(id)
-        await session.load_state(state)
-        return session
+        return f.read()
+
+
+def write_session_state(id, state: str):
+    """Write the raw (JSON) state for a session"""
+    if not os.path.exists(_base_path):
+        os.makedirs(_base_path, exist_ok=True)
+    file_name = _filename_for_session(id)
+    # write to a temp file and rename so that readers never see a partially written session
+    temp_file_name = f"{file_name}.tmp"
+    with open(temp_file_name, "w") as f:
+        f.write(state)
+    os.replace(temp_file_name, file_name)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+_default_path = "./.app_web_state/history.db"
+
+
+class SessionHistoryStore:
+    """Append-only store of session messages indexed by (session_id, seq)
+
+    Messages never change once they have been added to a session, so a page of history
+    is identified by the session id and the range of sequence numbers it covers.
+    This lets callers page through history (and validate ETags) without loading the
+    session or constructing any agents.
+    """
+
+    def __init__(self, path: str = _default_path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._lock = threading.Lock()  # sqlite connections aren't safe to share across threads without a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "session_id TEXT NOT NULL, "
+                "seq INTEGER NOT NULL, "
+                "message TEXT NOT NULL, "
+                "PRIMARY KEY (session_id, seq)"
+                ") WITHOUT ROWID"
+            )
+
+    def message_count(self, session_id: str) -> int:
+        with self._lock:
+            return self._message_count(session_id)
+
+    def _message_count(self, session_id: str) -> int:
+        row = self._conn.execute(
+            "SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def sync_messages(self, session_id: str, messages: list[dict]):
+        """Append any messages beyond those already stored for the session"""
+        with self._lock, self._conn:
+            count = self._message_count(session_id)
+            if len(messages) <= count:
+                return
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)",
+                [(session_id, seq, json.dumps(messages[seq]))
+                 for seq in range(count, len(messages))],
+            )
+
+    def page_bounds(self, session_id: str, before: int | None, limit: int) -> tuple[int, int] | None:
+        """Return the (first, last) sequence numbers of the page of up to `limit` messages
+        before `before` (or the latest messages if `before` is None), or None if the page is empty.
+        This only reads the index, not the message bodies."""
+        if before is None:
+            query = "SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?"
+            args = (session_id, limit)
+        else:
+            query = "SELECT seq FROM messages WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?"
+            args = (session_id, before, limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        if len(rows) == 0:
+            return None
+        return rows[-1][0], rows[0][0]
+
+    def get_messages(self, session_id: str, first: int, last: int) -> list[dict]:
+        """Return the messages with sequence numbers in [first, last], in order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? AND seq BETWEEN ? AND ? ORDER BY seq",
+                (session_id, first, last),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+def page_etag(session_id: str, bounds: tuple[int, int] | None) -> str:
+    """Compute the ETag for a page of history - stable for as long as the page covers the same messages"""
+    key = f"{session_id}:{bounds[0]}:{bounds[1]}" if bounds else f"{session_id}:empty"
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag`
+
+    The header can list several ETags (comma separated) or be "*". The comparison is weak (as
+    If-None-Match requires), so a W/ prefix on either side is ignored.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in (_opaque_tag(tag) for tag in tags)
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
@@ -10,3 +10,8 @@ async def save_session(session):
 
 async def load_session(id):
     return sessions.get(id)
+
+
+async def load_session_messages(id):
+    session = sessions.get(id)
+    return None if session is None else session.messages
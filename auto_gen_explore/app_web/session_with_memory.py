@@ -1,77 +1,25 @@
 import json
 import logging
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-
-from typing import Sequence
 
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.conditions import HandoffTermination
-from autogen_agentchat.base import Response, TaskResult, TerminationCondition, TerminatedException
-from autogen_agentchat.messages import HandoffMessage, AgentEvent, ChatMessage, StopMessage, TextMessage
+from autogen_agentchat.base import Response, TaskResult
+from autogen_agentchat.messages import HandoffMessage, TextMessage
 from autogen_agentchat.teams import Swarm
 from autogen_core.memory import ListMemory
-from autogen_ext.models.openai import (AzureOpenAIChatCompletionClient)
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
-from auto_gen_explore import config
+from auto_gen_explore.models import factory
 from auto_gen_explore.plugins.lights import LightsPlugin
 from auto_gen_explore.plugins.meals2 import MealsPlugin
 
 _logger = logging.getLogger(__name__)
 
-# Create the token provider
-api_key = config.openai_key_if_set()
-if api_key:
-    token_provider = None
-else:
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default")
-
-# https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
-model_client = AzureOpenAIChatCompletionClient(
-    azure_deployment=config.openai_deployment_name(),
-    model=config.openai_model_name(),
-    api_version=config.openai_api_version(),
-    azure_endpoint=config.openai_endpoint(),
-    azure_ad_token_provider=token_provider,
-    api_key=api_key,
-)
-
-
-class AgentTextMessageTermination(TerminationCondition):
-    """Class that attempts to inject a handoff to the user agent when a text message is received from the agent"""
-
-    def __init__(self) -> None:
-        self._terminated = False
-
-    @property
-    def terminated(self) -> bool:
-        return self._terminated
-
-    async def __call__(self, messages: Sequence[AgentEvent | ChatMessage]) -> StopMessage | None:
-        if self.terminated:
-            raise TerminatedException(
-                "Termination condition has already been reached")
-        if len(messages) == 0:
-            return None
-
-        # Stop on first text message not from user
-        # May want to change this to stop on first message that isn't handoff or function call etc
-        if isinstance(messages[-1], TextMessage) and messages[-1].source != "user":
-            # self._terminated = True
-            # raise TerminatedException("Got TextMessage")
-            return StopMessage(content="TextMessage received", source=self.__class__.__name__)
-            # return HandoffMessage(target="user", source=self.__class__.__name__, content="TextMessage received from agent - ask user for input")
-
-    async def reset(self) -> None:
-        self._terminated = False
-
 
 class AgentSession:
 
     def __init__(self, id):
         self.id = id
+        model_client = factory.model_client()
 
         lights_plugin = LightsPlugin()
         self._lights_plugin = lights_plugin
@@ -81,7 +29,7 @@ class AgentSession:
 
         triage_agent = AssistantAgent(
             "triage_agent",
-            model_client=model_client,
+            model_client=factory.agent_model_client("triage_agent"),
             system_message="You are a bot to help users. "
             "Introduce yourself. Always be very brief. "
             "For food related questions, transfer to the meals agent. "
@@ -0,0 +1,125 @@
+"""Benchmark of prompt token reduction from Swarm thread views
+
+Replays the model contexts saved with each session (persisted sessions, or an archive from
+session_archive) through each thread view policy. Every assistant message an agent added to its
+context marks a model call, so the prompt for that call is the context up to that point - the
+benchmark compares its size under the full thread with its size under each view.
+
+Token counts use models.wrapper.approximate_token_count (the system message and tools are the
+same for every view so are left out).
+
+Usage:
+    python -m auto_gen_explore.app_web.thread_view_benchmark
+    python -m auto_gen_explore.app_web.thread_view_benchmark --archive sessions.jsonl.gz --per-agent
+"""
+import argparse
+import gzip
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterator
+
+from autogen_core.model_context._chat_completion_context import ChatCompletionContextState
+from autogen_core.models import AssistantMessage, LLMMessage
+
+from auto_gen_explore.agents.thread_view import filter_thread, thread_view_policies
+from auto_gen_explore.app_web.session_file_persistence import read_session_state, session_ids
+from auto_gen_explore.models.wrapper import approximate_token_count
+
+
+@dataclass
+class ViewTokens:
+    calls: int = 0
+    full_tokens: int = 0
+    view_tokens: int = 0
+
+    @property
+    def reduction(self) -> float:
+        return 1 - self.view_tokens / self.full_tokens if self.full_tokens > 0 else 0.0
+
+    def add(self, other: "ViewTokens"):
+        self.calls += other.calls
+        self.full_tokens += other.full_tokens
+        self.view_tokens += other.view_tokens
+
+    def __str__(self) -> str:
+        return (f"{self.calls} calls, {self.full_tokens} -> {self.view_tokens} prompt tokens "
+                f"({self.reduction:.1%} reduction)")
+
+
+def _session_states(archive_path: str | None) -> Iterator[dict]:
+    if archive_path is not None:
+        with gzip.open(archive_path, "rt", encoding="utf-8") as archive:
+            for line in archive:
+                if line.strip():
+                    yield json.loads(line)["state"]
+        return
+    for id in session_ids():
+        state = read_session_state(id)
+        if state is not None:
+            yield json.loads(state)
+
+
+def agent_contexts(session_state: dict) -> Iterator[tuple[str, list[LLMMessage]]]:
+    """(agent name, model context messages) for each agent in a saved session"""
+    team_state = session_state.get("team")
+    if not team_state:
+        return  # the team never ran
+    for key, agent_state in team_state["agent_states"].items():
+        if agent_state.get("type") != "ChatAgentContainerState":
+            continue  # e.g. the group chat manager
+        llm_context = agent_state["agent_state"].get("llm_context")
+        if llm_context is None:
+            continue
+        # keys are "<agent name>/<team id>"
+        agent_name = key.split("/")[0]
+        yield agent_name, ChatCompletionContextState.model_validate(llm_context).messages
+
+
+def benchmark_context(agent_name: str, messages: list[LLMMessage]) -> dict[str, ViewTokens]:
+    """Prompt tokens for the model calls in an agent's context, keyed by view"""
+    results = defaultdict(ViewTokens)
+    for index, message in enumerate(messages):
+        if not isinstance(message, AssistantMessage) or message.source != agent_name:
+            continue
+        prompt = messages[:index]
+        full_tokens = approximate_token_count(prompt)
+        for view, policy in thread_view_policies.items():
+            tokens = results[view]
+            tokens.calls += 1
+            tokens.full_tokens += full_tokens
+            tokens.view_tokens += full_tokens if policy.is_full else approximate_token_count(
+                filter_thread(prompt, agent_name, policy))
+    return results
+
+
+def run_benchmark(archive_path: str | None = None) -> tuple[int, dict[str, dict[str, ViewTokens]]]:
+    """Returns the number of sessions and the token counts for each view, keyed by agent ("*" for all agents)"""
+    sessions = 0
+    results: dict[str, dict[str, ViewTokens]] = defaultdict(lambda: defaultdict(ViewTokens))
+    for state in _session_states(archive_path):
+        sessions += 1
+        for agent_name, messages in agent_contexts(state):
+            for view, tokens in benchmark_context(agent_name, messages).items():
+                results[agent_name][view].add(tokens)
+                results["*"][view].add(tokens)
+    return sessions, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt token reduction from Swarm thread views")
+    parser.add_argument("--archive", help="Session archive (from session_archive export) - defaults to the persisted sessions")
+    parser.add_argument("--per-agent", action="store_true", help="Also show the results for each agent")
+    args = parser.parse_args()
+
+    sessions, results = run_benchmark(args.archive)
+    print(f"{sessions} sessions")
+    agents = sorted(results) if args.per_agent else ["*"]
+    for agent_name in agents:
+        print("all agents" if agent_name == "*" else agent_name)
+        for view, tokens in results[agent_name].items():
+            print(f"    {view:<8} {tokens}")
+
+
+if __name__ == "__main__":
+    main()
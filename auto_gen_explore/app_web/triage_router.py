@@ -0,0 +1,184 @@
+"""Local pre-router that can skip the triage_agent LLM call
+
+Most turns that start at triage_agent only produce a handoff to one of the specialist agents.
+TriageRouter classifies the user input locally using keyword matches plus a nearest-neighbour
+vote over past routing decisions (the LLM's handoffs, saved to a JSONL history file). When it's
+confident, the session hands off straight to the chosen agent.
+
+In shadow mode the router classifies every triage turn but doesn't act - its decision is
+compared with the handoff the triage LLM made and the hit rate (how often it was confident)
+and accuracy (how often a confident decision matched the LLM) are logged.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+
+_logger = logging.getLogger(__name__)
+
+_word_pattern = re.compile(r"[a-z0-9']+")
+_stop_words = {"a", "an", "the", "i", "me", "my", "to", "of", "and", "or", "is", "it", "in", "on", "for",
+               "please", "can", "you", "could", "would", "do", "what", "with", "want", "like", "some"}
+
+
+def _tokens(text: str) -> list[str]:
+    return [word for word in _word_pattern.findall(text.lower()) if word not in _stop_words]
+
+
+@dataclass
+class RoutingDecision:
+    target: str | None
+    confidence: float
+    confident: bool
+
+
+@dataclass
+class RouterStats:
+    decisions: int = 0  # triage turns classified
+    confident: int = 0  # ... where the router was confident
+    agreed: int = 0  # confident and matched the LLM (shadow mode)
+    disagreed: int = 0  # confident and didn't match the LLM (shadow mode)
+    routed: int = 0  # triage LLM calls skipped (active mode)
+    bounced: int = 0  # routed agent handed straight back to triage (active mode)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.confident / self.decisions if self.decisions > 0 else 0.0
+
+    @property
+    def accuracy(self) -> float:
+        compared = self.agreed + self.disagreed
+        return self.agreed / compared if compared > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"hit rate {self.hit_rate:.1%} ({self.confident}/{self.decisions}), "
+                f"accuracy {self.accuracy:.1%} ({self.agreed} agreed, {self.disagreed} disagreed), "
+                f"{self.routed} routed, {self.bounced} bounced")
+
+
+class TriageRouter:
+    """Keyword + nearest-neighbour classifier over past routing decisions
+
+    `keywords` maps each target agent to keyword prefixes (e.g. "light" matches "lights").
+    The keyword and neighbour scores are averaged (or whichever is available) and the decision
+    is confident when the top target's share is at least `threshold`.
+    """
+
+    def __init__(
+        self,
+        keywords: dict[str, list[str]],
+        history_path: str | None = None,
+        threshold: float = 0.75,
+        neighbours: int = 5,
+        max_examples: int = 5000,
+    ):
+        self._keywords = {target: [keyword.lower() for keyword in words] for target, words in keywords.items()}
+        self._history_path = history_path
+        self._threshold = threshold
+        self._neighbours = neighbours
+        self._examples: deque[tuple[Counter, float, str]] = deque(maxlen=max_examples)
+        self._lock = threading.Lock()
+        self.stats = RouterStats()
+
+        if history_path is not None and os.path.exists(history_path):
+            with open(history_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add_example(entry["text"], entry["target"])
+
+    @property
+    def targets(self) -> list[str]:
+        return list(self._keywords)
+
+    def _add_example(self, text: str, target: str):
+        counts = Counter(_tokens(text))
+        if len(counts) == 0:
+            return
+        norm = math.sqrt(sum(count * count for count in counts.values()))
+        self._examples.append((counts, norm, target))
+
+    def _keyword_scores(self, tokens: list[str]) -> Counter:
+        scores = Counter()
+        for target, keywords in self._keywords.items():
+            for token in tokens:
+                if any(token.startswith(keyword) for keyword in keywords):
+                    scores[target] += 1
+        return scores
+
+    def _neighbour_scores(self, tokens: list[str]) -> Counter:
+        counts = Counter(tokens)
+        norm = math.sqrt(sum(count * count for count in counts.values()))
+        if norm == 0:
+            return Counter()
+        with self._lock:
+            examples = list(self._examples)
+        similarities = []
+        for example_counts, example_norm, target in examples:
+            dot = sum(count * example_counts[token] for token, count in counts.items() if token in example_counts)
+            if dot > 0:
+                similarities.append((dot / (norm * example_norm), target))
+        similarities.sort(reverse=True)
+        scores = Counter()
+        for similarity, target in similarities[:self._neighbours]:
+            scores[target] += similarity
+        return scores
+
+    def classify(self, text: str) -> RoutingDecision:
+        tokens = _tokens(text)
+        combined = Counter()
+        sources = 0
+        for scores in (self._keyword_scores(tokens), self._neighbour_scores(tokens)):
+            total = sum(scores.values())
+            if total > 0:
+                sources += 1
+                for target, score in scores.items():
+                    combined[target] += score / total
+        if sources == 0:
+            return RoutingDecision(target=None, confidence=0.0, confident=False)
+        target, score = combined.most_common(1)[0]
+        confidence = score / sources
+        return RoutingDecision(target=target, confidence=confidence, confident=confidence >= self._threshold)
+
+    def record(self, text: str, target: str):
+        """Add a routing decision (e.g. the LLM's handoff) to the neighbour index and history file"""
+        if target not in self._keywords:
+            return
+        with self._lock:
+            self._add_example(text, target)
+            if self._history_path is not None:
+                folder = os.path.dirname(self._history_path)
+                if folder and not os.path.exists(folder):
+                    os.makedirs(folder)
+                with open(self._history_path, "a") as f:
+                    f.write(json.dumps({"text": text, "target": target}) + "\n")
+
+    def observe(self, text: str, decision: RoutingDecision, llm_target: str | None):
+        """Compare a decision with the triage LLM's handoff (None if it didn't hand off to a known agent)"""
+        self.stats.decisions += 1
+        if decision.confident:
+            self.stats.confident += 1
+            if decision.target == llm_target:
+                self.stats.agreed += 1
+            else:
+                self.stats.disagreed += 1
+                _logger.info(f"Triage router disagreed: {decision.target} ({decision.confidence:.2f}) vs LLM {llm_target}: {text!r}")
+        if llm_target is not None:
+            self.record(text, llm_target)
+        _logger.info(f"Triage router: {self.stats}")
+
+    def routed(self, decision: RoutingDecision):
+        """Count a turn that was handed off without calling the triage LLM"""
+        self.stats.decisions += 1
+        self.stats.confident += 1
+        self.stats.routed += 1
+        _logger.debug(f"Triage router routed to {decision.target} ({decision.confidence:.2f}): {self.stats}")
+
+    def bounced(self, decision: RoutingDecision):
+        """Count a routed turn where the agent handed straight back to triage (i.e. a likely misroute)"""
+        self.stats.bounced += 1
+        _logger.info(f"Triage router: {decision.target} handed back to triage - {self.stats}")
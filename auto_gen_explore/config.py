@@ -1,10 +1,40 @@
-
 import os
+
 from dotenv import load_dotenv
+
 load_dotenv()
 
 def service_type():
-    return _get_required_env("SERVICE_TYPE")
+    """Backend for agents in the default model tier: AzureOpenAI (default) or Ollama"""
+    return _get_service_type_env("SERVICE_TYPE", "AzureOpenAI")
+
+def routing_service_type():
+    """Backend for agents in the routing model tier (defaults to SERVICE_TYPE)"""
+    return _get_service_type_env("ROUTING_SERVICE_TYPE", service_type())
+
+def routing_deployment_name():
+    """Azure OpenAI deployment for the routing tier, e.g. a gpt-4o-mini deployment (defaults to AZURE_OPENAI_DEPLOYMENT_NAME)"""
+    return os.getenv("AZURE_OPENAI_ROUTING_DEPLOYMENT_NAME", None)
+
+def routing_model_name():
+    return os.getenv("AZURE_OPENAI_ROUTING_MODEL_NAME", None)
+
+# Agents that only route (handoffs/speaker selection) don't need the larger model
+_default_agent_model_tiers = {
+    "triage_agent": "routing",
+    "TriageAgent": "routing",
+    "PlanningAgent": "routing",
+    "selector": "routing",  # SelectorGroupChat speaker selection
+}
+
+def agent_model_tiers():
+    """Model tier for each agent name: defaults overridden by AGENT_MODEL_TIERS (e.g. "triage_agent=default,writer=routing")"""
+    tiers = dict(_default_agent_model_tiers)
+    for entry in os.getenv("AGENT_MODEL_TIERS", "").split(","):
+        if entry.strip():
+            agent_name, _, tier = entry.partition("=")
+            tiers[agent_name.strip()] = tier.strip()
+    return tiers
 
 def openai_endpoint():
     return _get_required_env("AZURE_OPENAI_ENDPOINT")
@@ -20,6 +50,24 @@ def openai_model_name():
 def openai_deployment_name():
     return _get_required_env("AZURE_OPENAI_DEPLOYMENT_NAME")
 
+def openai_deployments():
+    """Deployments to load balance across (AZURE_OPENAI_DEPLOYMENTS, or None if not set)
+
+    Comma separated entries of either `deployment` (using AZURE_OPENAI_ENDPOINT) or
+    `deployment@endpoint` for deployments in other resources/regions.
+    Returns a list of (name, deployment, endpoint) where name is the entry as given.
+    """
+    value = os.getenv("AZURE_OPENAI_DEPLOYMENTS", None)
+    if not value:
+        return None
+    deployments = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if entry:
+            deployment, _, endpoint = entry.partition("@")
+            deployments.append((entry, deployment, endpoint or None))
+    return deployments
+
 def openai_api_version():
     return os.getenv("AZURE_OPENAI_API_VERSION", None)
 
@@ -41,12 +89,206 @@ def semantic_kernel_log_level():
 def agent_log_level():
     return os.getenv("AGENT_LOG_LEVEL", "DEBUG")
 
+def http_max_connections():
+    return _get_int_env("HTTP_MAX_CONNECTIONS", 100)
+
+def http_max_keepalive_connections():
+    return _get_int_env("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+
+def http_keepalive_expiry_seconds():
+    return _get_int_env("HTTP_KEEPALIVE_EXPIRY_SECONDS", 120)
+
+def model_response_cache_path():
+    return os.getenv("MODEL_RESPONSE_CACHE_PATH", None)
+
+def model_response_cache_max_mb():
+    return int(os.getenv("MODEL_RESPONSE_CACHE_MAX_MB", "256"))
+
+def model_response_cache_ttl_seconds():
+    return int(os.getenv("MODEL_RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+def model_client_mode():
+    """live (default), record or replay"""
+    mode = os.getenv("MODEL_CLIENT_MODE", "live").lower()
+    if mode not in ("live", "record", "replay"):
+        raise ValueError(f"$MODEL_CLIENT_MODE must be live, record or replay (got {mode})")
+    return mode
+
+def model_cassette_path():
+    return os.getenv("MODEL_CASSETTE_PATH", "./.model_cassettes/default.jsonl")
+
+def model_replay_latency_seconds():
+    return float(os.getenv("MODEL_REPLAY_LATENCY_SECONDS", "0"))
+
+def model_replay_latency_scale():
+    return float(os.getenv("MODEL_REPLAY_LATENCY_SCALE", "0"))
+
+def model_replay_latency_jitter_seconds():
+    return float(os.getenv("MODEL_REPLAY_LATENCY_JITTER_SECONDS", "0"))
+
+def model_replay_seed():
+    return int(os.getenv("MODEL_REPLAY_SEED", "0"))
+
+def model_load_balancing_strategy():
+    """least_outstanding (default) or ewma"""
+    return os.getenv("MODEL_LOAD_BALANCING_STRATEGY", "least_outstanding")
+
+def model_p95_latency_budget_seconds():
+    value = os.getenv("MODEL_P95_LATENCY_BUDGET_SECONDS", None)
+    return None if value is None else float(value)
+
+def model_rate_limit_tpm():
+    """Tokens-per-minute quota for each deployment (client-side rate limiting is off if neither TPM nor RPM is set)"""
+    value = os.getenv("MODEL_RATE_LIMIT_TPM", None)
+    return None if value is None else int(value)
+
+def model_rate_limit_rpm():
+    value = os.getenv("MODEL_RATE_LIMIT_RPM", None)
+    return None if value is None else int(value)
+
+def triage_router_mode():
+    """off (default), shadow (classify and log against the triage LLM) or active (skip the triage LLM when confident)"""
+    mode = os.getenv("TRIAGE_ROUTER_MODE", "off").lower()
+    if mode not in ("off", "shadow", "active"):
+        raise ValueError(f"$TRIAGE_ROUTER_MODE must be off, shadow or active (got {mode})")
+    return mode
+
+def triage_router_threshold():
+    return float(os.getenv("TRIAGE_ROUTER_THRESHOLD", "0.75"))
+
+def triage_router_history_path():
+    return os.getenv("TRIAGE_ROUTER_HISTORY_PATH", "./.app_web_state/triage_routes.jsonl")
+
+def command_fast_path_enabled():
+    """Handle simple commands (e.g. "turn on the porch light") directly from the plugin intents, without the LLM"""
+    return os.getenv("COMMAND_FAST_PATH", "false").lower() in ("1", "true", "yes")
+
+def swarm_thread_view(agent_name: str):
+    """Thread view (see agents/thread_view.py) for a Swarm agent: SWARM_THREAD_VIEW (default full),
+    overridden per agent by SWARM_THREAD_VIEWS (e.g. "lights_agent=minimal,meals_agent=focused")"""
+    views = {}
+    for entry in os.getenv("SWARM_THREAD_VIEWS", "").split(","):
+        if entry.strip():
+            name, _, view = entry.partition("=")
+            views[name.strip()] = view.strip()
+    return views.get(agent_name, os.getenv("SWARM_THREAD_VIEW", "full"))
+
+def model_stable_prompt_prefix():
+    """Send tools in canonical order so prompts share a byte-identical prefix for prompt caching (default true)"""
+    return os.getenv("MODEL_STABLE_PROMPT_PREFIX", "true").lower() in ("1", "true", "yes")
+
+def model_context_token_budget():
+    """Token budget for the model context of agents that support one (see agents/token_budget.py) (0 for no limit)"""
+    value = _get_int_env("MODEL_CONTEXT_TOKEN_BUDGET", 0)
+    return value if value > 0 else None
+
+def model_context_summarize():
+    """Summarise messages trimmed from token-budgeted contexts (an extra model call per trim) rather than dropping them"""
+    return os.getenv("MODEL_CONTEXT_SUMMARIZE", "false").lower() in ("1", "true", "yes")
+
+def tool_call_timeout_seconds():
+    """Timeout for each tool call run by agents/tool_execution.ToolExecutor (0 for no timeout)"""
+    value = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "0"))
+    return value if value > 0 else None
+
+def turn_deadline_seconds():
+    """Deadline for each user turn - outstanding model calls, tools and code execution are cancelled when it passes (0 for no deadline)"""
+    value = float(os.getenv("TURN_DEADLINE_SECONDS", "0"))
+    return value if value > 0 else None
+
+def tool_loop_max_rounds():
+    """Rounds of tool calls an agent can make for one task (0 for no limit)"""
+    value = _get_int_env("TOOL_LOOP_MAX_ROUNDS", 0)
+    return value if value > 0 else None
+
+def tool_loop_max_prompt_tokens():
+    """Prompt tokens an agent's model calls can use for one task (0 for no limit)"""
+    value = _get_int_env("TOOL_LOOP_MAX_PROMPT_TOKENS", 0)
+    return value if value > 0 else None
+
+def tool_loop_max_seconds():
+    """Wall clock seconds an agent's tool loop can run for one task (0 for no limit)"""
+    value = float(os.getenv("TOOL_LOOP_MAX_SECONDS", "0"))
+    return value if value > 0 else None
+
+def team_max_seconds():
+    """Wall clock budget for each AgentChat team run (0 for no limit)"""
+    value = float(os.getenv("TEAM_MAX_SECONDS", "0"))
+    return value if value > 0 else None
+
+def team_max_tokens():
+    """Model token budget (prompt + completion) for each AgentChat team run (0 for no limit)"""
+    value = _get_int_env("TEAM_MAX_TOKENS", 0)
+    return value if value > 0 else None
+
+def team_max_cost():
+    """Estimated model cost budget for each AgentChat team run (0 for no limit)"""
+    value = float(os.getenv("TEAM_MAX_COST", "0"))
+    return value if value > 0 else None
+
+def model_pricing():
+    """(prompt, completion) cost per million tokens for the default model tier, e.g. "2.5,10" (gpt-4o)"""
+    return _get_pricing_env("MODEL_COST_PER_MILLION", "2.5,10")
+
+def routing_model_pricing():
+    """(prompt, completion) cost per million tokens for the routing model tier (defaults to MODEL_COST_PER_MILLION)"""
+    return _get_pricing_env("ROUTING_MODEL_COST_PER_MILLION", os.getenv("MODEL_COST_PER_MILLION", "2.5,10"))
+
+def human_input_script():
+    """File with one line of user input per line - console apps use it instead of prompting (e.g. to run against the fake model server)"""
+    return os.getenv("HUMAN_INPUT_SCRIPT", None)
+
+def session_shards():
+    """Worker processes for the sharded handoffs launcher (defaults to the number of CPUs)"""
+    return _get_int_env("SESSION_SHARDS", os.cpu_count() or 1)
+
+def handoffs_runtime():
+    """Runtime for app_tool_multi_agent_handoffs: inprocess (default) or distributed (agents in gRPC worker processes)"""
+    value = os.getenv("HANDOFFS_RUNTIME", "inprocess").lower()
+    if value not in ("inprocess", "distributed"):
+        raise ValueError(f"HANDOFFS_RUNTIME must be inprocess or distributed (got {value})")
+    return value
+
+def agent_host_address():
+    """Address for the gRPC agent host in distributed mode"""
+    return os.getenv("AGENT_HOST_ADDRESS", "localhost:50060")
+
+def conversation_store_address():
+    """Address the conversation store is served on in distributed mode"""
+    return os.getenv("CONVERSATION_STORE_ADDRESS", "localhost:50061")
+
+def runtime_profile_enabled():
+    """Profile message handling in SingleThreadedAgentRuntime apps (see runtime/profiler.py)"""
+    return os.getenv("RUNTIME_PROFILE", "false").lower() in ("1", "true", "yes")
+
+def runtime_profile_interval_seconds():
+    """Seconds between logged runtime profile summaries (0 for none)"""
+    return float(os.getenv("RUNTIME_PROFILE_INTERVAL_SECONDS", "30"))
+
+def runtime_profile_trace_path():
+    """JSONL file the runtime profile trace is appended to (no trace if not set)"""
+    return os.getenv("RUNTIME_PROFILE_TRACE_PATH", None)
+
 def aca_dynamic_sessions_pool_endpoint():
     return _get_required_env("ACA_DS_POOL_ENDPOINT")
 
+def _get_service_type_env(env_var, default):
+    value = os.getenv(env_var, default)
+    if value not in ("AzureOpenAI", "Ollama"):
+        raise ValueError(f"${env_var} must be AzureOpenAI or Ollama (got {value})")
+    return value
+
 def _get_required_env(env_var):
     value = os.getenv(env_var)
     if value is None:
         raise ValueError(
             f"${env_var} is not set in the environment variables.")
-    return value
\ No newline at end of file
+    return value
+
+def _get_pricing_env(env_var, default: str) -> tuple[float, float]:
+    prompt, _, completion = os.getenv(env_var, default).partition(",")
+    return float(prompt), float(completion or prompt)
+
+def _get_int_env(env_var, default: int) -> int:
+    value = os.getenv(env_var)
+    return default if value is None else int(value)
@@ -0,0 +1,273 @@
+"""Local fake Azure OpenAI chat-completions server for load testing without cloud access
+
+Speaks enough of the Azure OpenAI protocol (tool calls and streaming included) for
+AzureOpenAIChatCompletionClient, so the real network path (connection pooling, retries,
+streaming) can be exercised. Responses, latency and failures are driven by a scenario file:
+
+    {
+        "latency": {"distribution": "lognormal", "median_ms": 400, "sigma": 0.5},
+        "stream_chunk_delay_ms": 30,
+        "error_rates": {"429": 0.05},
+        "retry_after_seconds": 1,
+        "seed": 0,
+        "responses": [
+            {"match": "porch light", "tool": "change_state", "arguments": {"id": 2, "is_on": true}},
+            {"last_role": "tool", "content": "Done."},
+            {"content": "OK"}
+        ]
+    }
+
+Response rules are checked in order:
+    - match: regex searched (case insensitive) in the most recent user message (ignoring
+      handoff messages from other agents)
+    - last_role: role of the final message in the request
+    - tool: the rule calls this tool - it only applies if the tool is in the request and hasn't
+      already been called since the most recent user message (so scenarios converge)
+Latency distributions: fixed (ms), uniform (min_ms, max_ms), lognormal (median_ms, sigma).
+
+Prompt caching is simulated like Azure OpenAI: once a prompt (tools then messages) is at least
+1024 tokens, the leading 128-token blocks that match an earlier request are reported as
+usage.prompt_tokens_details.cached_tokens.
+
+Usage:
+    python -m auto_gen_explore.fake_model_server --scenario fake_model_scenarios/lights_meals.json --port 8001
+    AZURE_OPENAI_ENDPOINT=http://localhost:8001 AZURE_OPENAI_KEY=fake python app_web_lights_meals.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+_default_scenario = {
+    "latency": {"distribution": "fixed", "ms": 0},
+    "stream_chunk_delay_ms": 0,
+    "error_rates": {},
+    "retry_after_seconds": 1,
+    "responses": [],
+}
+
+_scenario = dict(_default_scenario)
+_random = random.Random(0)
+_stats = {"requests": 0, "errors": {}, "streamed": 0, "tool_calls": 0}
+_prompt_blocks: set[int] = set()  # hashes of the prompt prefixes seen so far (for simulated prompt caching)
+
+
+def load_scenario(scenario: dict):
+    global _scenario, _random
+    _scenario = {**_default_scenario, **scenario}
+    _random = random.Random(_scenario.get("seed", 0))
+    _stats.update({"requests": 0, "errors": {}, "streamed": 0, "tool_calls": 0})
+    _prompt_blocks.clear()
+
+
+def _sample_latency_seconds() -> float:
+    latency = _scenario["latency"]
+    distribution = latency.get("distribution", "fixed")
+    if distribution == "fixed":
+        ms = latency.get("ms", 0)
+    elif distribution == "uniform":
+        ms = _random.uniform(latency["min_ms"], latency["max_ms"])
+    elif distribution == "lognormal":
+        ms = _random.lognormvariate(math.log(latency["median_ms"]), latency.get("sigma", 0.5))
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    return ms / 1000
+
+
+def _sample_error() -> int | None:
+    roll = _random.random()
+    for status, rate in _scenario["error_rates"].items():
+        if roll < rate:
+            return int(status)
+        roll -= rate
+    return None
+
+
+def _content_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _is_user_input(message: dict) -> bool:
+    # autogen sends handoffs from other agents as user messages named after the agent
+    return message["role"] == "user" and message.get("name", "user") == "user"
+
+
+def _tools_called_since_user(messages: list[dict]) -> set[str]:
+    called = set()
+    for message in reversed(messages):
+        if _is_user_input(message):
+            break
+        for tool_call in message.get("tool_calls") or []:
+            called.add(tool_call["function"]["name"])
+    return called
+
+
+def _choose_response(body: dict) -> dict:
+    messages = body.get("messages", [])
+    available_tools = {tool["function"]["name"] for tool in body.get("tools") or []}
+    last_user = next((_content_text(m) for m in reversed(messages) if _is_user_input(m)), "")
+    last_role = messages[-1]["role"] if messages else None
+    called = _tools_called_since_user(messages)
+
+    for rule in _scenario["responses"]:
+        if "match" in rule and not re.search(rule["match"], last_user, re.IGNORECASE):
+            continue
+        if "last_role" in rule and rule["last_role"] != last_role:
+            continue
+        if "tool" in rule and (rule["tool"] not in available_tools or rule["tool"] in called):
+            continue
+        return rule
+    return {"content": f"You said: {last_user}"}
+
+
+def _estimate_tokens(value) -> int:
+    return max(1, len(json.dumps(value)) // 4)
+
+
+def _tool_calls(rule: dict) -> list[dict]:
+    return [{
+        "id": f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": rule["tool"], "arguments": json.dumps(rule.get("arguments", {}))},
+    }]
+
+
+def _cached_prompt_tokens(body: dict) -> int:
+    # ~4 characters per token (as _estimate_tokens), cached in 128-token blocks once there are 1024+ tokens
+    prompt = json.dumps(body.get("tools") or []) + json.dumps(body.get("messages", []))
+    block_chars = 128 * 4
+    if len(prompt) < 1024 * 4:
+        return 0
+    cached_blocks = 0
+    matching = True
+    for end in range(block_chars, len(prompt) + 1, block_chars):
+        prefix_hash = hash(prompt[:end])
+        if matching and prefix_hash in _prompt_blocks:
+            cached_blocks += 1
+        else:
+            matching = False
+            _prompt_blocks.add(prefix_hash)
+    return cached_blocks * 128
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    _stats["requests"] += 1
+
+    await asyncio.sleep(_sample_latency_seconds())
+
+    error = _sample_error()
+    if error is not None:
+        _stats["errors"][error] = _stats["errors"].get(error, 0) + 1
+        headers = {"retry-after": str(_scenario["retry_after_seconds"])} if error == 429 else {}
+        return JSONResponse(
+            {"error": {"code": str(error), "message": f"Injected {error} from fake model server"}},
+            status_code=error,
+            headers=headers,
+        )
+
+    rule = _choose_response(body)
+    model = body.get("model", deployment)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    prompt_tokens = _estimate_tokens(body.get("messages", [])) + _estimate_tokens(body.get("tools") or [])
+    tool_calls = _tool_calls(rule) if "tool" in rule else None
+    content = None if tool_calls else rule.get("content", "")
+    completion_tokens = _estimate_tokens(tool_calls if tool_calls else content)
+    finish_reason = "tool_calls" if tool_calls else "stop"
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+             "total_tokens": prompt_tokens + completion_tokens,
+             "prompt_tokens_details": {"cached_tokens": min(prompt_tokens, _cached_prompt_tokens(body))}}
+    if tool_calls:
+        _stats["tool_calls"] += 1
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls},
+                "finish_reason": finish_reason,
+            }],
+            "usage": usage,
+        }
+
+    _stats["streamed"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    def chunk(delta: dict, finish: str | None = None, chunk_usage: dict | None = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        if chunk_usage is not None:
+            payload["usage"] = chunk_usage
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream():
+        chunk_delay = _scenario["stream_chunk_delay_ms"] / 1000
+        yield chunk({"role": "assistant", "content": ""})
+        if tool_calls:
+            for index, tool_call in enumerate(tool_calls):
+                yield chunk({"tool_calls": [{"index": index, **tool_call}]})
+        else:
+            words = re.findall(r"\S+\s*", content)
+            for word in words:
+                if chunk_delay > 0:
+                    await asyncio.sleep(chunk_delay)
+                yield chunk({"content": word})
+        yield chunk({}, finish=finish_reason)
+        if include_usage:
+            yield chunk(None, chunk_usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post("/admin/scenario")
+async def set_scenario(request: Request):
+    load_scenario(await request.json())
+    return {"status": "ok"}
+
+
+@app.get("/admin/stats")
+async def get_stats():
+    return _stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI chat-completions server")
+    parser.add_argument("--scenario", help="Path to a scenario JSON file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    if args.scenario:
+        with open(args.scenario, "r") as f:
+            load_scenario(json.load(f))
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from auto_gen_explore.models.wrapper import ChatCompletionClientWrapper, model_name
+
+_logger = logging.getLogger(__name__)
+
+
+def request_key(
+    model: str,
+    messages: Sequence[LLMMessage],
+    tools: Sequence[Tool | ToolSchema],
+    json_output: Optional[bool],
+    extra_create_args: Mapping[str, Any],
+) -> str:
+    """Hash a normalized create request - identical requests give identical keys"""
+    data = {
+        "model": model,
+        "messages": [message.model_dump(mode="json") for message in messages],
+        "tools": [(tool.schema if isinstance(tool, Tool) else tool) for tool in tools],
+        "json_output": json_output,
+        "extra_create_args": extra_create_args,
+    }
+    serialized_data = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized_data.encode("utf-8")).hexdigest()
+
+
+class DiskLRUStore:
+    """sqlite-backed key/value store with a size limit (least recently used entries are evicted first) and TTL"""
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float | None = 7 * 24 * 60 * 60):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._max_bytes = max_bytes
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created REAL NOT NULL, "
+                "last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, size, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, size, created = row
+            if self._ttl_seconds is not None and now - created > self._ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self._max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._total_bytes -= row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self._max_bytes:
+            return
+        # Expired entries go first, then least recently used
+        if self._ttl_seconds is not None:
+            cutoff = time.time() - self._ttl_seconds
+            freed = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries WHERE created < ?", (cutoff,)).fetchone()[0]
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+            self._total_bytes -= freed
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        evict = []
+        for key, size in rows:
+            if self._total_bytes <= self._max_bytes:
+                break
+            evict.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evict)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    saved_prompt_tokens: int = 0
+    saved_completion_tokens: int = 0
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.misses + self.coalesced
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.coalesced) / self.requests if self.requests > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"hit rate {self.hit_rate:.1%} ({self.hits} hits, {self.coalesced} coalesced, {self.misses} misses), "
+                f"saved {self.saved_prompt_tokens} prompt + {self.saved_completion_tokens} completion tokens")
+
+
+class CachedChatCompletionClient(ChatCompletionClientWrapper):
+    """ChatCompletionClient wrapper that serves repeated requests from a disk-backed LRU cache
+
+    Requests are keyed on the normalized messages, tools, model and create args. Concurrent
+    identical requests are coalesced so only one call is made to the wrapped client (if that call
+    is cancelled, the requests waiting on it make the call again rather than failing). Cache hits
+return the original result with `cached=True` and don't count towards usage.
+
+    The store is sqlite, so its reads and writes run on a worker thread rather than blocking the
+    event loop.
+
+    NOTE: cancellation_token is ignored for cached (and coalesced) results.
+    """
+
+    def __init__(self, client: ChatCompletionClient, store: DiskLRUStore):
+        super().__init__(client)
+        self._store = store
+        self._model = model_name(client)
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.stats = CacheStats()
+
+    def _record_hit(self, result: CreateResult):
+        self.stats.saved_prompt_tokens += result.usage.prompt_tokens
+        self.stats.saved_completion_tokens += result.usage.completion_tokens
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = request_key(self._model, messages, tools, json_output, extra_create_args)
+
+        while True:
+            cached = await asyncio.to_thread(self._store.get, key)
+            if cached is not None:
+                result = CreateResult.model_validate_json(cached)
+                result.cached = True
+                self.stats.hits += 1
+                self._record_hit(result)
+                _logger.debug(f"Cache hit {key[:12]} - {self.stats}")
+                return result
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            # wait doesn't cancel the shared request if this call is cancelled
+            await asyncio.wait([in_flight])
+            if in_flight.cancelled():
+                # the request was cancelled by its caller's token/deadline, not ours - make it again
+                _logger.debug(f"Coalesced request {key[:12]} was cancelled, retrying")
+                continue
+            result = in_flight.result().model_copy()
+            result.cached = True
+            self.stats.coalesced += 1
+            self._record_hit(result)
+            _logger.debug(f"Coalesced {key[:12]} - {self.stats}")
+            return result
+
+        self.stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._client.create(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+            await asyncio.to_thread(self._store.set, key, result.model_dump_json())
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # don't fail the requests coalesced with this one - they retry (see above)
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved so there is no warning when nobody else was waiting
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        # Streamed results are cached under a separate key as the chunks are stored too
+        key = request_key(self._model, messages, tools, json_output, {**extra_create_args, "__stream__": True})
+
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            cached = await asyncio.to_thread(self._store.get, key)
+            if cached is not None:
+                chunks = json.loads(cached)
+                result = CreateResult.model_validate(chunks[-1])
+                result.cached = True
+                self.stats.hits += 1
+                self._record_hit(result)
+                for chunk in chunks[:-1]:
+                    yield chunk
+                yield result
+                return
+
+            self.stats.misses += 1
+            chunks: list[str | dict] = []
+            async for chunk in self._client.create_stream(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            ):
+                if isinstance(chunk, CreateResult):
+                    chunks.append(chunk.model_dump(mode="json"))
+                else:
+                    chunks.append(chunk)
+                yield chunk
+            # Only cache streams that completed
+            if len(chunks) > 0 and isinstance(chunks[-1], dict):
+                await asyncio.to_thread(self._store.set, key, json.dumps(chunks))
+
+        return _generator()
@@ -0,0 +1,384 @@
+"""Process-wide model clients and the other shared objects the apps build from config
+
+config.py only reads the environment; this module creates (once per process) what the apps share:
+the Azure credential and cached token provider, the HTTP connection pool, model clients (load
+balanced, rate limited, recorded/replayed and cached as configured), rate limiters, the response
+cache store, and the tool loop guard - along with the human input provider, runtime profiler and
+team budget termination for an app.
+"""
+import logging
+import threading
+import time
+
+import httpx
+from autogen_agentchat.base import TerminationCondition
+from autogen_core.models import ChatCompletionClient, ModelFamily
+from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from azure.identity import DefaultAzureCredential
+from openai import DefaultAsyncHttpxClient
+
+from auto_gen_explore import config
+from auto_gen_explore.agents.human_input import ConsoleInputProvider, HumanInputProvider, ScriptedInputProvider
+from auto_gen_explore.agents.termination import ModelPricing, budget_termination
+from auto_gen_explore.agents.tool_loop_budget import ToolLoopGuard
+from auto_gen_explore.models.cache import CachedChatCompletionClient, DiskLRUStore
+from auto_gen_explore.models.load_balancer import LoadBalancedChatCompletionClient
+from auto_gen_explore.models.prompt_cache import StablePrefixChatCompletionClient, record_response_usage
+from auto_gen_explore.models.rate_limit import RateLimitedChatCompletionClient, RateLimiter
+from auto_gen_explore.models.record_replay import RecordingChatCompletionClient, ReplayingChatCompletionClient
+from auto_gen_explore.models.wrapper import ChatCompletionClientWrapper, deployment_model_name
+from auto_gen_explore.runtime.profiler import RuntimeProfiler
+
+_logger = logging.getLogger(__name__)
+
+_cognitive_services_scope = "https://cognitiveservices.azure.com/.default"
+
+_shared_lock = threading.Lock()
+_azure_credential = None
+_token_provider = None
+_http_client = None
+_response_cache_store = None
+_rate_limiters: dict[str, RateLimiter] = {}
+_tool_loop_guard = None
+_model_clients: dict[tuple[str, str, str | None], ChatCompletionClient] = {}
+
+
+class CachedTokenProvider:
+    """Bearer token provider that caches the token and refreshes it in the background
+
+    The token is fetched on a background thread as soon as the provider is created and
+    refreshed `refresh_margin_seconds` before it expires, so callers only pay for token
+    acquisition if they race the very first fetch.
+    """
+
+    def __init__(self, credential, scope: str, refresh_margin_seconds: int = 300, retry_seconds: int = 30):
+        self._credential = credential
+        self._scope = scope
+        self._refresh_margin_seconds = refresh_margin_seconds
+        self._retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        self._token = None
+        self._timer: threading.Timer | None = None  # the one pending refresh
+        with self._lock:
+            self._schedule_refresh(0)
+
+    def __call__(self) -> str:
+        token = self._token
+        if token is None or token.expires_on - time.time() < self._retry_seconds:
+            # No usable token (first call raced the initial fetch, or background refresh failed)
+            token = self._refresh(force=False)
+        return token.token
+
+    def _refresh(self, force: bool):
+        with self._lock:
+            token = self._token
+            if force or token is None or token.expires_on - time.time() < self._retry_seconds:
+                token = self._credential.get_token(self._scope)
+                self._token = token
+                self._schedule_refresh(token.expires_on - time.time() - self._refresh_margin_seconds)
+            return token
+
+    def _background_refresh(self):
+        try:
+            self._refresh(force=True)
+        except Exception as e:
+            _logger.warning(f"Token refresh failed, retrying in {self._retry_seconds}s: {e}")
+            with self._lock:
+                self._schedule_refresh(self._retry_seconds)
+
+    def _schedule_refresh(self, delay_seconds: float):
+        """Replace the pending refresh (called with _lock held, so there's only ever one refresh chain)"""
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(delay_seconds, 0), self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+def azure_credential():
+    """Process-wide DefaultAzureCredential"""
+    global _azure_credential
+    with _shared_lock:
+        if _azure_credential is None:
+            _azure_credential = DefaultAzureCredential()
+        return _azure_credential
+
+
+def token_provider():
+    """Process-wide cached token provider for Azure OpenAI"""
+    global _token_provider
+    credential = azure_credential()
+    with _shared_lock:
+        if _token_provider is None:
+            _token_provider = CachedTokenProvider(credential, _cognitive_services_scope)
+        return _token_provider
+
+
+def http_client() -> httpx.AsyncClient:
+    """Process-wide HTTP client so that all model clients share one keep-alive connection pool
+
+    NOTE: the pool is bound to the event loop that first uses it, so this assumes a single
+    event loop per process (which is the case for the apps in this repo).
+    """
+    global _http_client
+    with _shared_lock:
+        if _http_client is None:
+            _http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=config.http_max_connections(),
+                    max_keepalive_connections=config.http_max_keepalive_connections(),
+                    keepalive_expiry=config.http_keepalive_expiry_seconds(),
+                ),
+                # the model clients don't surface cached prompt tokens (see models/prompt_cache.py)
+                event_hooks={"response": [record_response_usage]},
+            )
+        return _http_client
+
+
+def response_cache_store():
+    """Process-wide response cache store (or None if MODEL_RESPONSE_CACHE_PATH isn't set)"""
+    global _response_cache_store
+    path = config.model_response_cache_path()
+    if path is None:
+        return None
+    with _shared_lock:
+        if _response_cache_store is None:
+            _response_cache_store = DiskLRUStore(
+                path,
+                max_bytes=config.model_response_cache_max_mb() * 1024 * 1024,
+                ttl_seconds=config.model_response_cache_ttl_seconds(),
+            )
+        return _response_cache_store
+
+
+def rate_limiter(deployment: str) -> RateLimiter | None:
+    """Process-wide rate limiter for a deployment (or None if MODEL_RATE_LIMIT_TPM/RPM aren't set)"""
+    tpm = config.model_rate_limit_tpm()
+    rpm = config.model_rate_limit_rpm()
+    if tpm is None and rpm is None:
+        return None
+    with _shared_lock:
+        if deployment not in _rate_limiters:
+            _rate_limiters[deployment] = RateLimiter(tokens_per_minute=tpm, requests_per_minute=rpm)
+        return _rate_limiters[deployment]
+
+
+def rate_limit_utilization() -> dict[str, dict[str, float]]:
+    """Current budget utilization for each rate limited deployment"""
+    with _shared_lock:
+        limiters = dict(_rate_limiters)
+    return {deployment: limiter.utilization() for deployment, limiter in limiters.items()}
+
+
+def model_client(deployment: str | None = None, model: str | None = None, api_version: str | None = None) -> ChatCompletionClient:
+    """Get the process-wide model client for a deployment/model/api version
+
+    Values not specified are taken from the environment (AZURE_OPENAI_DEPLOYMENT_NAME etc).
+    Clients are created on first use and then shared, along with the HTTP connection pool
+    and token provider. Don't close the returned client as that closes the shared pool.
+
+    If no deployment is specified and AZURE_OPENAI_DEPLOYMENTS is set, requests are load
+    balanced across those deployments (see models/load_balancer.py).
+    MODEL_CLIENT_MODE=record|replay records responses to/replays them from MODEL_CASSETTE_PATH
+    (see models/record_replay.py). If MODEL_RATE_LIMIT_TPM/RPM are set, requests are budgeted
+    against a limiter shared per deployment (see models/rate_limit.py). If
+    MODEL_RESPONSE_CACHE_PATH is set, responses are cached on disk (see models/cache.py).
+    Unless MODEL_STABLE_PROMPT_PREFIX is false, tools are sent in canonical order to make the
+    most of provider prompt caching (see models/prompt_cache.py).
+    """
+    deployments = config.openai_deployments() if deployment is None else None
+    if deployments is None:
+        deployment = deployment or config.openai_deployment_name()
+        deployments = [(deployment, deployment, None)]
+    model = model or config.openai_model_name()
+    api_version = api_version or config.openai_api_version()
+    deployments_name = ",".join(name for name, _, _ in deployments)
+    key = (deployments_name, model, api_version)
+
+    client = _model_clients.get(key)
+    if client is not None:
+        return client
+
+    mode = config.model_client_mode()
+    if mode == "replay":
+        client = ReplayingChatCompletionClient(
+            config.model_cassette_path(),
+            model=deployment_model_name(deployments_name, model),
+            latency_seconds=config.model_replay_latency_seconds(),
+            latency_scale=config.model_replay_latency_scale(),
+            latency_jitter_seconds=config.model_replay_latency_jitter_seconds(),
+            seed=config.model_replay_seed(),
+        )
+    else:
+        load_balanced = len(deployments) > 1
+        clients = {
+            name: _deployment_client(name, deployment, endpoint, model, api_version, fail_fast=load_balanced)
+            for name, deployment, endpoint in deployments
+        }
+        if load_balanced:
+            client = LoadBalancedChatCompletionClient(
+                clients,
+                model_name=deployment_model_name(deployments_name, model),
+                strategy=config.model_load_balancing_strategy(),
+                p95_budget_seconds=config.model_p95_latency_budget_seconds(),
+            )
+        else:
+            client = next(iter(clients.values()))
+        if mode == "record":
+            client = RecordingChatCompletionClient(client, config.model_cassette_path())
+
+    cache_store = response_cache_store()
+    if cache_store is not None:
+        client = CachedChatCompletionClient(client, cache_store)
+
+    if config.model_stable_prompt_prefix():
+        # outermost so that the cache/cassette keys use the canonical tool order too
+        client = StablePrefixChatCompletionClient(client)
+
+    with _shared_lock:
+        # another thread may have created the client in the meantime - keep the first one
+        return _model_clients.setdefault(key, client)
+
+
+def ollama_model_client() -> ChatCompletionClient:
+    """Get the process-wide model client for the Ollama model (OLLAMA_MODEL_ID on OLLAMA_HOST)"""
+    model = config.ollama_model_id()
+    host = config.ollama_host()
+    key = (f"ollama@{host}", model, None)
+
+    client = _model_clients.get(key)
+    if client is not None:
+        return client
+
+    mode = config.model_client_mode()
+    if mode == "replay":
+        client = ReplayingChatCompletionClient(
+            config.model_cassette_path(),
+            model=model,
+            latency_seconds=config.model_replay_latency_seconds(),
+            latency_scale=config.model_replay_latency_scale(),
+            latency_jitter_seconds=config.model_replay_latency_jitter_seconds(),
+            seed=config.model_replay_seed(),
+        )
+    else:
+        # imported here so that the ollama package is only needed when an Ollama model is used
+        from autogen_ext.models.ollama import OllamaChatCompletionClient
+        client = OllamaChatCompletionClient(
+            model=model,
+            host=host,
+            # local models aren't in autogen's model list - assume tool calling support (needed for handoffs)
+            model_info={"vision": False, "function_calling": True, "json_output": True, "family": ModelFamily.UNKNOWN},
+        )
+        if mode == "record":
+            client = RecordingChatCompletionClient(client, config.model_cassette_path())
+
+    cache_store = response_cache_store()
+    if cache_store is not None:
+        client = CachedChatCompletionClient(client, cache_store)
+
+    with _shared_lock:
+        return _model_clients.setdefault(key, client)
+
+
+def agent_model_client(agent_name: str, deployment: str | None = None, model: str | None = None,
+                       api_version: str | None = None) -> ChatCompletionClient:
+    """Get the model client for an agent based on its model tier (see config.agent_model_tiers)
+
+    Agents in the routing tier (triage agents, SelectorGroupChat selection etc) use
+    ROUTING_SERVICE_TYPE with AZURE_OPENAI_ROUTING_DEPLOYMENT_NAME/MODEL_NAME (or Ollama).
+    Other agents use SERVICE_TYPE with the deployment/model/api version passed in (as for model_client).
+    """
+    tier = config.agent_model_tiers().get(agent_name, "default")
+    if tier == "routing":
+        if config.routing_service_type() == "Ollama":
+            return ollama_model_client()
+        routing_deployment = config.routing_deployment_name()
+        if routing_deployment is None:
+            return model_client(deployment, model, api_version)
+        return model_client(routing_deployment, config.routing_model_name() or routing_deployment, api_version)
+    if tier != "default":
+        raise ValueError(f"Unknown model tier for {agent_name}: {tier}")
+    if config.service_type() == "Ollama":
+        return ollama_model_client()
+    return model_client(deployment, model, api_version)
+
+
+def _deployment_client(name: str, deployment: str, endpoint: str | None, model: str, api_version: str | None,
+                       fail_fast: bool) -> ChatCompletionClient:
+    """Client for a single deployment (rate limited if configured)
+
+    With fail_fast, 429s aren't retried so that the load balancer can fail over instead.
+    """
+    limiter = rate_limiter(name)
+    api_key = config.openai_key_if_set()
+    # https://microsoft.github.io/autogen/stable/user-guide/agentchat-user-guide/tutorial/models.html#azure-openai
+    client = AzureOpenAIChatCompletionClient(
+        azure_deployment=deployment,
+        model=model,
+        api_version=api_version,
+        azure_endpoint=endpoint or config.openai_endpoint(),
+        azure_ad_token_provider=None if api_key else token_provider(),
+        api_key=api_key,
+        http_client=http_client(),
+        # the rate limiter/load balancer handle 429s themselves
+        **({"max_retries": 0} if limiter is not None or fail_fast else {}),
+    )
+    if limiter is not None:
+        client = RateLimitedChatCompletionClient(client, limiter, max_retries=0 if fail_fast else 5)
+    return client
+
+
+def model_load_balancer_stats() -> dict[str, dict[str, dict]]:
+    """Per-deployment stats for each load balanced model client"""
+    with _shared_lock:
+        clients = dict(_model_clients)
+    stats = {}
+    for (deployments_name, model, _), client in clients.items():
+        while isinstance(client, ChatCompletionClientWrapper):
+            client = client.client
+        if isinstance(client, LoadBalancedChatCompletionClient):
+            stats[deployment_model_name(deployments_name, model)] = client.stats()
+    return stats
+
+
+def human_input_provider() -> HumanInputProvider:
+    """Human input for the console apps: HUMAN_INPUT_SCRIPT if set, otherwise the console"""
+    script = config.human_input_script()
+    if script is None:
+        return ConsoleInputProvider()
+    with open(script, encoding="utf-8") as f:
+        return ScriptedInputProvider([line.rstrip("\n") for line in f if line.strip()])
+
+
+def runtime_profiler() -> RuntimeProfiler | None:
+    """Profiler for SingleThreadedAgentRuntime apps if RUNTIME_PROFILE is set"""
+    if not config.runtime_profile_enabled():
+        return None
+    logging.getLogger("auto_gen_explore.runtime.profiler").setLevel(logging.INFO)
+    return RuntimeProfiler(interval_seconds=config.runtime_profile_interval_seconds(), trace_path=config.runtime_profile_trace_path())
+
+
+def tool_loop_guard() -> ToolLoopGuard:
+    """Process-wide tool loop limits (TOOL_LOOP_MAX_*) - its stats cover all the agents using it"""
+    global _tool_loop_guard
+    with _shared_lock:
+        if _tool_loop_guard is None:
+            _tool_loop_guard = ToolLoopGuard(max_rounds=config.tool_loop_max_rounds(),
+                                             max_prompt_tokens=config.tool_loop_max_prompt_tokens(),
+                                             max_seconds=config.tool_loop_max_seconds())
+        return _tool_loop_guard
+
+
+def team_budget_termination() -> TerminationCondition | None:
+    """Termination for AgentChat teams when a run exceeds TEAM_MAX_SECONDS/TOKENS/COST (None if none are set)
+
+    Messages from agents in the routing tier are priced with routing_model_pricing.
+    """
+    routing_pricing = ModelPricing(*config.routing_model_pricing())
+    return budget_termination(
+        max_seconds=config.team_max_seconds(),
+        max_total_tokens=config.team_max_tokens(),
+        max_cost=config.team_max_cost(),
+        pricing=ModelPricing(*config.model_pricing()),
+        agent_pricing={agent_name: routing_pricing for agent_name, tier in config.agent_model_tiers().items() if tier == "routing"},
+    )
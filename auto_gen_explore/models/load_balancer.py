@@ -0,0 +1,268 @@
+"""Load balancing across multiple Azure OpenAI deployments
+
+LoadBalancedChatCompletionClient spreads requests over a set of clients (one per deployment,
+e.g. in different regions) and fails over to another deployment when a request fails with a
+connection error, 429 or 5xx. Deployments that fail, or whose p95 latency exceeds the budget,
+are ejected for a while (doubling for repeated failures) and then given traffic again.
+
+Routing strategies:
+    - least_outstanding: the deployment with the fewest requests in flight (ties broken by latency)
+    - ewma: the deployment with the lowest EWMA latency x (requests in flight + 1)
+"""
+import logging
+import random
+import time
+import warnings
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import (ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo,
+                                 RequestUsage)
+from autogen_core.tools import Tool, ToolSchema
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeploymentStats:
+    requests: int = 0
+    errors: int = 0
+    outstanding: int = 0
+    ejections: int = 0
+    consecutive_errors: int = 0
+    ewma_latency_seconds: float | None = None
+    ejected_until: float = 0.0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    @property
+    def p95_latency_seconds(self) -> float | None:
+        if len(self.latencies) == 0:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "outstanding": self.outstanding,
+            "ejections": self.ejections,
+            "ejected": self.ejected,
+            "ewma_latency_seconds": self.ewma_latency_seconds,
+            "p95_latency_seconds": self.p95_latency_seconds,
+        }
+
+
+def _is_failover_error(error: BaseException) -> bool:
+    # 4xx errors (other than 429) would fail on every deployment so aren't worth retrying elsewhere
+    if isinstance(error, (APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+class LoadBalancedChatCompletionClient(ChatCompletionClient):
+    """Routes requests across clients for several deployments of the same model
+
+    Latency is the full request duration for create and the time to first chunk for create_stream.
+    A deployment is ejected when a request fails, or when its p95 latency (over the last 100
+    requests, once there are at least `min_latency_samples`) exceeds `p95_budget_seconds`.
+    If every deployment is ejected, requests are routed across all of them regardless.
+    Streams only fail over if the error arrives before the first chunk.
+    """
+
+    def __init__(
+        self,
+        clients: Mapping[str, ChatCompletionClient],
+        model_name: str | None = None,
+        strategy: str = "least_outstanding",
+        p95_budget_seconds: float | None = None,
+        ejection_seconds: float = 30.0,
+        max_ejection_seconds: float = 300.0,
+        min_latency_samples: int = 20,
+        ewma_alpha: float = 0.3,
+    ):
+        if len(clients) == 0:
+            raise ValueError("At least one client is required")
+        if strategy not in ("least_outstanding", "ewma"):
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self._clients = dict(clients)
+        self.model_name = model_name
+        self._strategy = strategy
+        self._p95_budget_seconds = p95_budget_seconds
+        self._ejection_seconds = ejection_seconds
+        self._max_ejection_seconds = max_ejection_seconds
+        self._min_latency_samples = min_latency_samples
+        self._ewma_alpha = ewma_alpha
+        self._stats = {name: DeploymentStats() for name in self._clients}
+        self._last_client = next(iter(self._clients.values()))
+
+    def stats(self) -> dict[str, dict]:
+        """Per-deployment latency/error stats"""
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def _choose(self, exclude: set[str]) -> str | None:
+        candidates = [name for name in self._clients if name not in exclude]
+        if len(candidates) == 0:
+            return None
+        available = [name for name in candidates if not self._stats[name].ejected]
+        if len(available) == 0:
+            available = candidates
+
+        def cost(name: str):
+            stats = self._stats[name]
+            # no latency data yet - treat as fast so that new (or returning) deployments get traffic
+            latency = stats.ewma_latency_seconds or 0.0
+            if self._strategy == "ewma":
+                return (latency * (stats.outstanding + 1), stats.outstanding, random.random())
+            return (stats.outstanding, latency, random.random())
+
+        return min(available, key=cost)
+
+    def _eject(self, name: str, reason: str):
+        stats = self._stats[name]
+        stats.ejections += 1
+        duration = min(self._max_ejection_seconds, self._ejection_seconds * 2 ** max(0, stats.consecutive_errors - 1))
+        stats.ejected_until = time.monotonic() + duration
+        _logger.warning(f"Ejecting deployment {name} for {duration:.0f}s: {reason}")
+
+    def _record_success(self, name: str, latency: float):
+        stats = self._stats[name]
+        stats.consecutive_errors = 0
+        stats.latencies.append(latency)
+        if stats.ewma_latency_seconds is None:
+            stats.ewma_latency_seconds = latency
+        else:
+            stats.ewma_latency_seconds += self._ewma_alpha * (latency - stats.ewma_latency_seconds)
+        if self._p95_budget_seconds is not None and len(stats.latencies) >= self._min_latency_samples:
+            p95 = stats.p95_latency_seconds
+            if p95 > self._p95_budget_seconds:
+                self._eject(name, f"p95 latency {p95:.2f}s exceeds budget {self._p95_budget_seconds:.2f}s")
+                # start afresh when the deployment comes back
+                stats.latencies.clear()
+
+    def _record_error(self, name: str, error: BaseException):
+        stats = self._stats[name]
+        stats.errors += 1
+        stats.consecutive_errors += 1
+        self._eject(name, f"{type(error).__name__}: {error}")
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        tried: set[str] = set()
+        while True:
+            name = self._choose(tried)
+            tried.add(name)
+            stats = self._stats[name]
+            client = self._clients[name]
+            stats.requests += 1
+            stats.outstanding += 1
+            start = time.perf_counter()
+            try:
+                result = await client.create(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except Exception as e:
+                if not _is_failover_error(e):
+                    raise
+                self._record_error(name, e)
+                if len(tried) == len(self._clients):
+                    raise
+                continue
+            finally:
+                stats.outstanding -= 1
+            self._record_success(name, time.perf_counter() - start)
+            self._last_client = client
+            return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            tried: set[str] = set()
+            while True:
+                name = self._choose(tried)
+                tried.add(name)
+                stats = self._stats[name]
+                client = self._clients[name]
+                stats.requests += 1
+                stats.outstanding += 1
+                start = time.perf_counter()
+                started = False
+                try:
+                    async for chunk in client.create_stream(
+                        messages,
+                        tools=tools,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    ):
+                        if not started:
+                            started = True
+                            self._record_success(name, time.perf_counter() - start)
+                            self._last_client = client
+                        yield chunk
+                except Exception as e:
+                    if not _is_failover_error(e):
+                        raise
+                    self._record_error(name, e)
+                    if started or len(tried) == len(self._clients):
+                        raise
+                    continue
+                finally:
+                    stats.outstanding -= 1
+                return
+
+        return _generator()
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._last_client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        usages = [client.total_usage() for client in self._clients.values()]
+        return RequestUsage(
+            prompt_tokens=sum(usage.prompt_tokens for usage in usages),
+            completion_tokens=sum(usage.completion_tokens for usage in usages),
+        )
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._last_client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._last_client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        warnings.warn("capabilities is deprecated, use model_info instead", DeprecationWarning, stacklevel=2)
+        return self._last_client.model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._last_client.model_info
@@ -0,0 +1,187 @@
+"""Stable prompt prefixes for provider-side prompt caching, and cached token reporting
+
+Azure OpenAI (like OpenAI) caches prompt prefixes of 1024+ tokens: when a request starts with
+the same bytes as a recent one, the cached part is billed at a discount and processed faster.
+The static parts of our agent prompts (system message and tool schemas) are long, so they should
+form a byte-identical prefix across calls, agents and sessions.
+
+The agents already send the system message first followed by the conversation (which is only
+appended to). The tools are the other large static part: StablePrefixChatCompletionClient sends
+them in canonical order (sorted by name, with the schema keys sorted) so the same tool set always
+serializes the same way however the caller assembled the list (e.g. an agent's own tools plus
+its handoff/delegate tools).
+
+The chat completions client doesn't surface cached token counts, so they're read from the raw
+responses by record_response_usage (an httpx response hook on factory.http_client) and reported
+per deployment by prompt_cache_report().
+"""
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+import httpx
+from autogen_core import CancellationToken
+from autogen_core.models import CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from auto_gen_explore.models.wrapper import ChatCompletionClientWrapper
+
+_logger = logging.getLogger(__name__)
+
+_deployment_pattern = re.compile(r"/deployments/([^/]+)/chat/completions")
+
+
+def _sorted_keys(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _sorted_keys(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sorted_keys(item) for item in value]
+    return value
+
+
+def canonical_tool_schemas(tools: Sequence[Tool | ToolSchema]) -> list[ToolSchema]:
+    """Tool schemas sorted by name with their keys sorted (so equal tool sets serialize identically)"""
+    schemas = [(tool.schema if isinstance(tool, Tool) else tool) for tool in tools]
+    return [_sorted_keys(schema) for schema in sorted(schemas, key=lambda schema: schema["name"])]
+
+
+class StablePrefixChatCompletionClient(ChatCompletionClientWrapper):
+    """Sends tools in canonical order so the static part of each prompt is byte-identical across calls"""
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await self._client.create(
+            messages,
+            tools=canonical_tool_schemas(tools),
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._client.create_stream(
+            messages,
+            tools=canonical_tool_schemas(tools),
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+
+@dataclass
+class PromptCacheStats:
+    requests: int = 0
+    cached_requests: int = 0  # requests with any cached prompt tokens
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def uncached_tokens(self) -> int:
+        return self.prompt_tokens - self.cached_tokens
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "cached_requests": self.cached_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_tokens": self.uncached_tokens,
+            "cached_ratio": self.cached_ratio,
+        }
+
+    def __str__(self) -> str:
+        return (f"{self.cached_tokens}/{self.prompt_tokens} prompt tokens cached ({self.cached_ratio:.1%}) "
+                f"over {self.requests} requests ({self.cached_requests} with cache hits)")
+
+
+_stats: dict[str, PromptCacheStats] = {}
+_stats_lock = threading.Lock()
+
+
+def record_usage(deployment: str, usage: Mapping[str, Any]):
+    """Add the usage from a chat completions response to the stats for a deployment"""
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    with _stats_lock:
+        stats = _stats.setdefault(deployment, PromptCacheStats())
+        stats.requests += 1
+        stats.cached_requests += 1 if cached_tokens > 0 else 0
+        stats.prompt_tokens += prompt_tokens
+        stats.cached_tokens += cached_tokens
+    _logger.debug(f"Prompt cache ({deployment}): {stats}")
+
+
+def prompt_cache_report() -> dict[str, dict]:
+    """Cached vs uncached prompt tokens for each deployment"""
+    with _stats_lock:
+        return {deployment: stats.to_dict() for deployment, stats in _stats.items()}
+
+
+class _UsageScanningStream(httpx.AsyncByteStream):
+    """Passes a streamed (SSE) response through unchanged, recording the usage chunk if there is one"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, deployment: str):
+        self._stream = stream
+        self._deployment = deployment
+        self._buffer = b""
+
+    def _scan(self, data: bytes):
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            # the usage chunk is only sent when stream_options.include_usage is set
+            if line.startswith(b"data: {") and b'"usage"' in line:
+                usage = json.loads(line[len(b"data: "):]).get("usage")
+                if usage:
+                    record_usage(self._deployment, usage)
+
+    async def __aiter__(self):
+        async for data in self._stream:
+            try:
+                self._scan(data)
+            except ValueError as e:
+                _logger.debug(f"Couldn't parse streamed usage: {e}")
+            yield data
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+async def record_response_usage(response: httpx.Response):
+    """httpx response hook that records prompt cache usage from chat completions responses"""
+    match = _deployment_pattern.search(response.request.url.path)
+    if match is None or response.status_code != 200:
+        return
+    deployment = match.group(1)
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        response.stream = _UsageScanningStream(response.stream, deployment)
+        return
+    await response.aread()
+    try:
+        usage = response.json().get("usage")
+    except ValueError:
+        return
+    if usage:
+        record_usage(deployment, usage)
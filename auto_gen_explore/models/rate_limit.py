@@ -0,0 +1,285 @@
+"""Client-side TPM/RPM budgeting for Azure OpenAI deployments
+
+Azure OpenAI deployments have tokens-per-minute and requests-per-minute quotas. Rather than
+sending every request and having all sessions retry together when the deployment throttles,
+RateLimitedChatCompletionClient estimates the tokens for a request and reserves them from a
+RateLimiter (shared by all clients for the deployment) before sending. Reservations are
+corrected with the actual usage once the response arrives.
+
+When the service still returns a 429 the limiter is paused for the retry-after period (plus
+jitter) so that all callers back off together rather than each retrying independently.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+from openai import RateLimitError
+
+from auto_gen_explore.models.wrapper import ChatCompletionClientWrapper, approximate_token_count
+
+_logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Bucket holding up to `capacity` units, refilled continuously at `capacity` per minute
+
+    The level can go negative when a reservation is corrected upwards - the debt is paid off
+    by the refill before new reservations are granted.
+    """
+
+    def __init__(self, capacity: float):
+        self._capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self._capacity, self._level + (now - self._updated) * self._capacity / 60)
+        self._updated = now
+
+    def level(self) -> float:
+        self._refill()
+        return self._level
+
+    def wait_seconds(self, amount: float) -> float:
+        """Seconds until `amount` is available (amounts above capacity wait for a full bucket)"""
+        amount = min(amount, self._capacity)
+        shortfall = amount - self.level()
+        return max(0.0, shortfall * 60 / self._capacity)
+
+    def take(self, amount: float):
+        self._refill()
+        self._level -= amount
+
+    def give(self, amount: float):
+        self._refill()
+        self._level = min(self._capacity, self._level + amount)
+
+
+@dataclass
+class RateLimitStats:
+    requests: int = 0
+    throttled: int = 0  # 429s returned by the service
+    wait_seconds: float = 0.0  # total time requests spent waiting for budget
+    reserved_tokens: int = 0
+    used_tokens: int = 0
+
+    def __str__(self) -> str:
+        return (f"{self.requests} requests, {self.throttled} throttled, waited {self.wait_seconds:.1f}s, "
+                f"reserved {self.reserved_tokens} / used {self.used_tokens} tokens")
+
+
+class RateLimiter:
+    """Shared TPM/RPM budget for a deployment
+
+    Requests are granted in arrival order (a large request isn't starved by a stream of small ones).
+    NOTE: this assumes a single event loop per process (as with factory.http_client).
+    """
+
+    def __init__(self, tokens_per_minute: int | None = None, requests_per_minute: int | None = None):
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.stats = RateLimitStats()
+
+    async def reserve(self, tokens: int):
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if self._tokens is not None:
+                    wait = max(wait, self._tokens.wait_seconds(tokens))
+                if self._requests is not None:
+                    wait = max(wait, self._requests.wait_seconds(1))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+            if self._requests is not None:
+                self._requests.take(1)
+        self.stats.requests += 1
+        self.stats.reserved_tokens += tokens
+        self.stats.wait_seconds += time.monotonic() - start
+
+    def reconcile(self, reserved_tokens: int, used_tokens: int):
+        """Correct a reservation once the actual usage is known"""
+        self.stats.used_tokens += used_tokens
+        if self._tokens is None:
+            return
+        if used_tokens < reserved_tokens:
+            self._tokens.give(reserved_tokens - used_tokens)
+        else:
+            self._tokens.take(used_tokens - reserved_tokens)
+
+    def pause(self, seconds: float):
+        """Hold all reservations for `seconds` (e.g. after a 429)"""
+        self.stats.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def utilization(self) -> dict[str, float]:
+        """Fraction of each budget currently in use (1.0 = exhausted)"""
+        utilization = {}
+        if self._tokens is not None:
+            utilization["tokens"] = 1 - max(0.0, self._tokens.level()) / self._tokens.capacity
+        if self._requests is not None:
+            utilization["requests"] = 1 - max(0.0, self._requests.level()) / self._requests.capacity
+        return utilization
+
+
+def _retry_after_seconds(error: RateLimitError) -> float | None:
+    headers = error.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # retry-after can also be an HTTP date - fall back to exponential backoff
+    return None
+
+
+class RateLimitedChatCompletionClient(ChatCompletionClientWrapper):
+    """Reserves estimated tokens from a RateLimiter before each request and retries 429s
+
+    The estimate is the prompt tokens (from the wrapped client's count_tokens, or an approximation
+    if that fails) plus `max_tokens` if set in extra_create_args, otherwise `completion_tokens_estimate`.
+
+    429s are retried up to `max_retries` times, waiting for retry-after (or exponential backoff
+    from `base_backoff_seconds` if there's no header) plus up to `jitter` x that delay.
+    The limiter is paused even when the 429 isn't retried, so max_retries=0 suits callers that
+    prefer to go elsewhere (e.g. the load balancer failing over to another deployment).
+    The wrapped client should be created with max_retries=0 so that it doesn't also retry.
+    Streams are only retried if the 429 arrives before the first chunk.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        limiter: RateLimiter,
+        completion_tokens_estimate: int = 500,
+        max_retries: int = 5,
+        base_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+        jitter: float = 0.5,
+    ):
+        super().__init__(client)
+        self._limiter = limiter
+        self._completion_tokens_estimate = completion_tokens_estimate
+        self._max_retries = max_retries
+        self._base_backoff_seconds = base_backoff_seconds
+        self._max_backoff_seconds = max_backoff_seconds
+        self._jitter = jitter
+
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter
+
+    def _estimate_tokens(self, messages, tools, extra_create_args) -> int:
+        completion_tokens = extra_create_args.get("max_tokens", self._completion_tokens_estimate)
+        try:
+            prompt_tokens = self._client.count_tokens(messages, tools=tools)
+        except Exception as e:
+            # e.g. the tokenizer couldn't be downloaded - an approximation is good enough for budgeting
+            _logger.debug(f"count_tokens failed, using approximation: {e}")
+            prompt_tokens = approximate_token_count(messages, tools)
+        return prompt_tokens + completion_tokens
+
+    def _backoff(self, error: RateLimitError, attempt: int) -> float:
+        delay = _retry_after_seconds(error)
+        if delay is None:
+            delay = min(self._max_backoff_seconds, self._base_backoff_seconds * 2 ** attempt)
+        delay += random.uniform(0, self._jitter * delay)
+        self._limiter.pause(delay)
+        _logger.info(f"Throttled (attempt {attempt + 1}), pausing requests for {delay:.1f}s - {self._limiter.stats}")
+        return delay
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        estimate = self._estimate_tokens(messages, tools, extra_create_args)
+        attempt = 0
+        while True:
+            await self._limiter.reserve(estimate)
+            try:
+                result = await self._client.create(
+                    messages,
+                    tools=tools,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except RateLimitError as e:
+                # a rejected request still counts against the request budget but not the token budget
+                self._limiter.reconcile(estimate, 0)
+                self._backoff(e, attempt)
+                if attempt >= self._max_retries:
+                    raise
+                attempt += 1
+                continue
+            except BaseException:
+                self._limiter.reconcile(estimate, 0)
+                raise
+            self._limiter.reconcile(estimate, result.usage.prompt_tokens + result.usage.completion_tokens)
+            return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            estimate = self._estimate_tokens(messages, tools, extra_create_args)
+            attempt = 0
+            while True:
+                await self._limiter.reserve(estimate)
+                used_tokens = 0
+                started = False
+                try:
+                    async for chunk in self._client.create_stream(
+                        messages,
+                        tools=tools,
+                        json_output=json_output,
+                        extra_create_args=extra_create_args,
+                        cancellation_token=cancellation_token,
+                    ):
+                        started = True
+                        if isinstance(chunk, CreateResult):
+                            used_tokens = chunk.usage.prompt_tokens + chunk.usage.completion_tokens
+                        yield chunk
+                except RateLimitError as e:
+                    self._limiter.reconcile(estimate, 0)
+                    self._backoff(e, attempt)
+                    if started or attempt >= self._max_retries:
+                        raise
+                    attempt += 1
+                    continue
+                except BaseException:
+                    self._limiter.reconcile(estimate, used_tokens)
+                    raise
+                # streams only report usage if stream_options.include_usage is set - keep the estimate otherwise
+                self._limiter.reconcile(estimate, used_tokens or estimate)
+                return
+
+        return _generator()
@@ -0,0 +1,254 @@
+"""Record/replay model clients for offline, deterministic runs
+
+RecordingChatCompletionClient wraps a real client and appends every create/create_stream
+request and response to a cassette (JSONL) file. ReplayingChatCompletionClient serves those
+responses back, matching on the same normalized request key as the response cache, with
+optional injected latency - so scenarios can be re-run (and benchmarked) without an endpoint.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import warnings
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import (ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelFamily,
+                                 ModelInfo, RequestUsage)
+from autogen_core.tools import Tool, ToolSchema
+
+from auto_gen_explore.models.cache import request_key
+from auto_gen_explore.models.wrapper import ChatCompletionClientWrapper, approximate_token_count, model_name
+
+_logger = logging.getLogger(__name__)
+
+
+class CassetteMissError(Exception):
+    """Raised when replaying a request that isn't in the cassette"""
+
+
+class RecordingChatCompletionClient(ChatCompletionClientWrapper):
+    """Records requests/responses from the wrapped client to a cassette file"""
+
+    def __init__(self, client: ChatCompletionClient, cassette_path: str):
+        super().__init__(client)
+        folder = os.path.dirname(cassette_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._cassette_path = cassette_path
+        self._model = model_name(client)
+
+    def _append(self, entry: dict):
+        with open(self._cassette_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _entry(self, kind: str, key: str, messages, tools, json_output, extra_create_args, duration: float) -> dict:
+        return {
+            "kind": kind,
+            "key": key,
+            "model": self._model,
+            "model_info": dict(self._client.model_info),
+            "request": {
+                "messages": [message.model_dump(mode="json") for message in messages],
+                "tools": [(tool.schema if isinstance(tool, Tool) else tool) for tool in tools],
+                "json_output": json_output,
+                "extra_create_args": dict(extra_create_args),
+            },
+            "duration_seconds": duration,
+        }
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        start = time.perf_counter()
+        result = await self._client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        key = request_key(self._model, messages, tools, json_output, extra_create_args)
+        entry = self._entry("create", key, messages, tools, json_output,
+                            extra_create_args, time.perf_counter() - start)
+        entry["response"] = result.model_dump(mode="json")
+        self._append(entry)
+        return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            start = time.perf_counter()
+            chunks = []
+            async for chunk in self._client.create_stream(
+                messages,
+                tools=tools,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            ):
+                offset = time.perf_counter() - start
+                if isinstance(chunk, CreateResult):
+                    chunks.append({"offset_seconds": offset, "result": chunk.model_dump(mode="json")})
+                else:
+                    chunks.append({"offset_seconds": offset, "text": chunk})
+                yield chunk
+            key = request_key(self._model, messages, tools, json_output, extra_create_args)
+            entry = self._entry("stream", key, messages, tools, json_output,
+                                extra_create_args, time.perf_counter() - start)
+            entry["chunks"] = chunks
+            self._append(entry)
+
+        return _generator()
+
+
+class ReplayingChatCompletionClient(ChatCompletionClient):
+    """Serves responses recorded by RecordingChatCompletionClient
+
+    Requests are matched on their normalized key (so the replay is deterministic regardless of
+    timing). If the same request was recorded more than once, the responses are served in
+    recorded order (the last one is repeated once they run out).
+
+    Latency: each response is delayed by `latency_scale` x the recorded duration plus
+    `latency_seconds` plus uniform jitter in [0, `latency_jitter_seconds`] (seeded so runs repeat).
+    Streamed chunks keep their recorded spacing (scaled).
+    """
+
+    def __init__(
+        self,
+        cassette_path: str,
+        model: str,
+        latency_seconds: float = 0.0,
+        latency_scale: float = 0.0,
+        latency_jitter_seconds: float = 0.0,
+        seed: int = 0,
+        model_info: ModelInfo | None = None,
+    ):
+        self._model = model
+        self._latency_seconds = latency_seconds
+        self._latency_scale = latency_scale
+        self._latency_jitter_seconds = latency_jitter_seconds
+        self._random = random.Random(seed)
+        self._entries: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self._served: dict[tuple[str, str], int] = defaultdict(int)
+        self._model_info = model_info
+        with open(cassette_path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["model"] != model:
+                    continue
+                self._entries[(entry["kind"], entry["key"])].append(entry)
+                if self._model_info is None:
+                    self._model_info = entry["model_info"]
+        if self._model_info is None:
+            self._model_info = {"vision": False, "function_calling": True,
+                                "json_output": True, "family": ModelFamily.UNKNOWN}
+        self._cur_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def _next_entry(self, kind: str, messages, tools, json_output, extra_create_args) -> dict:
+        key = request_key(self._model, messages, tools, json_output, extra_create_args)
+        entries = self._entries.get((kind, key))
+        if not entries:
+            raise CassetteMissError(f"No recorded {kind} response for request {key[:12]} (model {self._model})")
+        index = self._served[(kind, key)]
+        self._served[(kind, key)] = index + 1
+        return entries[min(index, len(entries) - 1)]
+
+    def _delay(self, recorded_seconds: float) -> float:
+        jitter = self._random.uniform(0, self._latency_jitter_seconds) if self._latency_jitter_seconds > 0 else 0.0
+        return self._latency_seconds + self._latency_scale * recorded_seconds + jitter
+
+    def _update_usage(self, result: CreateResult):
+        self._cur_usage = result.usage
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + result.usage.prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + result.usage.completion_tokens,
+        )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        entry = self._next_entry("create", messages, tools, json_output, extra_create_args)
+        delay = self._delay(entry["duration_seconds"])
+        if delay > 0:
+            await asyncio.sleep(delay)
+        result = CreateResult.model_validate(entry["response"])
+        self._update_usage(result)
+        return result
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        async def _generator() -> AsyncGenerator[Union[str, CreateResult], None]:
+            entry = self._next_entry("stream", messages, tools, json_output, extra_create_args)
+            start_delay = self._delay(0.0)
+            if start_delay > 0:
+                await asyncio.sleep(start_delay)
+            previous_offset = 0.0
+            for chunk in entry["chunks"]:
+                if self._latency_scale > 0:
+                    await asyncio.sleep(self._latency_scale * (chunk["offset_seconds"] - previous_offset))
+                previous_offset = chunk["offset_seconds"]
+                if "result" in chunk:
+                    result = CreateResult.model_validate(chunk["result"])
+                    self._update_usage(result)
+                    yield result
+                else:
+                    yield chunk["text"]
+
+        return _generator()
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._cur_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return approximate_token_count(messages, tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return max(0, 128000 - self.count_tokens(messages, tools=tools))
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        warnings.warn("capabilities is deprecated, use model_info instead", DeprecationWarning, stacklevel=2)
+        return self._model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._model_info
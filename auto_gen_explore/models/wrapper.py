@@ -0,0 +1,108 @@
+import json
+import warnings
+from typing import Any, AsyncGenerator, Mapping, Optional, Sequence, Union
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelCapabilities, ModelInfo, RequestUsage
+from autogen_core.tools import Tool, ToolSchema
+
+
+class ChatCompletionClientWrapper(ChatCompletionClient):
+    """Base class for clients that wrap another ChatCompletionClient
+
+    Everything is delegated to the wrapped client - subclasses override the parts they need.
+    Wrappers can be stacked (e.g. a cache around a rate limiter around the Azure OpenAI client).
+    """
+
+    def __init__(self, client: ChatCompletionClient):
+        self._client = client
+
+    @property
+    def client(self) -> ChatCompletionClient:
+        return self._client
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await self._client.create(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        json_output: Optional[bool] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return self._client.create_stream(
+            messages,
+            tools=tools,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self._client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        warnings.warn("capabilities is deprecated, use model_info instead", DeprecationWarning, stacklevel=2)
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+def model_name(client: ChatCompletionClient) -> str:
+    """Best-effort name for the model behind a client (unwrapping any wrappers)
+
+    Clients that aren't Azure OpenAI clients (e.g. the load balancer) can set a `model_name` attribute.
+    """
+    while isinstance(client, ChatCompletionClientWrapper):
+        client = client.client
+    name = getattr(client, "model_name", None)
+    if isinstance(name, str):
+        return name
+    raw_config = getattr(client, "_raw_config", {})
+    create_args = getattr(client, "_create_args", {})
+    return deployment_model_name(raw_config.get("azure_deployment"), create_args.get("model")) or client.__class__.__name__
+
+
+def deployment_model_name(deployment: str | None, model: str | None) -> str | None:
+    if deployment and model and deployment != model:
+        return f"{deployment}/{model}"
+    return deployment or model
+
+
+def approximate_token_count(messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema] = []) -> int:
+    """Rough token count (~4 characters per token) - avoids needing tokenizer downloads on air-gapped machines"""
+    text = json.dumps([message.model_dump(mode="json") for message in messages])
+    text += json.dumps([(tool.schema if isinstance(tool, Tool) else tool) for tool in tools])
+    return len(text) // 4
@@ -0,0 +1,86 @@
+"""Intent grammar for handling simple commands without the LLM
+
+Plugins can opt in by providing an `intents()` method returning Intent instances. An intent
+is a regex that must match the whole (normalised) user input, a resolver that turns the match
+into tool arguments (returning None if it can't do so unambiguously) and a response template.
+
+Anything that doesn't match an intent exactly falls back to the agents, so the grammars should
+only cover commands that are unambiguous.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable
+
+_logger = logging.getLogger(__name__)
+
+_filler_pattern = re.compile(r"^(?:please\s+|can you\s+|could you\s+)|(?:\s+please)$")
+
+
+def normalise_command(text: str) -> str:
+    text = re.sub(r"\s+", " ", text.strip().lower()).rstrip(".!")
+    return _filler_pattern.sub("", text).strip()
+
+
+@dataclass
+class Intent:
+    """A simple command that maps directly onto a tool call
+
+    `resolve` is called with the regex match and returns the tool arguments (or None to fall back
+    to the agents). `response` is formatted with the named groups from the match, the tool
+    arguments (which take precedence over groups with the same name) and `result` (the tool's
+    return value).
+    """
+    agent: str  # the agent that owns the tool (so follow-up messages go to it)
+    pattern: str
+    tool: Callable[..., Any]
+    resolve: Callable[[re.Match], dict | None]
+    response: str
+
+    def __post_init__(self):
+        self._regex = re.compile(self.pattern)
+
+
+@dataclass
+class CommandResult:
+    agent: str
+    tool_name: str
+    arguments: dict
+    result: Any
+    response: str
+
+
+class IntentGrammar:
+    def __init__(self, intents: list[Intent] | None = None):
+        self._intents = list(intents or [])
+
+    def register(self, intents: list[Intent]):
+        self._intents.extend(intents)
+
+    def match(self, text: str) -> tuple[Intent, re.Match, dict] | None:
+        command = normalise_command(text)
+        for intent in self._intents:
+            match = intent._regex.fullmatch(command)
+            if match is None:
+                continue
+            arguments = intent.resolve(match)
+            if arguments is not None:
+                return intent, match, arguments
+        return None
+
+    def execute(self, text: str) -> CommandResult | None:
+        """Run the tool for a matching command (None if there's no unambiguous match)"""
+        matched = self.match(text)
+        if matched is None:
+            return None
+        intent, match, arguments = matched
+        result = intent.tool(**arguments)
+        response = intent.response.format(**{**match.groupdict(), **arguments, "result": result})
+        _logger.debug(f"Command {text!r} handled by {intent.tool.__name__}({arguments}): {response}")
+        return CommandResult(
+            agent=intent.agent,
+            tool_name=intent.tool.__name__,
+            arguments=arguments,
+            result=result,
+            response=response,
+        )
@@ -1,5 +1,9 @@
 import logging
 
+from auto_gen_explore.agents.templated_reflection import response_template
+from auto_gen_explore.agents.tool_execution import tool_concurrency
+from auto_gen_explore.plugins.intents import Intent
+
 _logger = logging.getLogger(__name__)
 
 class LightsPlugin:
@@ -16,6 +20,8 @@ class LightsPlugin:
         _logger.debug(f"Getting lights: {self._lights}")
         return self._lights
 
+    @response_template("Turned the {name} {is_on:on/off}.")
+    @tool_concurrency(group="lights_state")
     def change_state(
         self,
         id: int,
@@ -33,6 +39,35 @@ class LightsPlugin:
                 return light
         return None
     
+    def intents(self) -> list[Intent]:
+        """Simple commands that can be handled without the LLM (e.g. "turn on the porch light")"""
+        return [
+            Intent(
+                agent="lights_agent",
+                pattern=r"(?:turn|switch) (?P<state>on|off) (?:the )?(?P<light>[a-z ]+?)",
+                tool=self.change_state,
+                resolve=self._resolve_change_state,
+                response="Turned the {result[name]} {state}.",
+            ),
+            Intent(
+                agent="lights_agent",
+                pattern=r"(?:turn|switch) (?:the )?(?P<light>[a-z ]+?) (?P<state>on|off)",
+                tool=self.change_state,
+                resolve=self._resolve_change_state,
+                response="Turned the {result[name]} {state}.",
+            ),
+        ]
+
+    def _resolve_change_state(self, match) -> dict | None:
+        # the name has to identify exactly one light (e.g. "porch" or "porch light")
+        words = set(match["light"].split()) - {"light", "lights"}
+        if len(words) == 0:
+            return None
+        lights = [light for light in self._lights if words <= set(light["name"].lower().split())]
+        if len(lights) != 1:
+            return None
+        return {"id": lights[0]["id"], "is_on": match["state"] == "on"}
+
     def save_state(self):
         return self._lights
     
@@ -3,6 +3,8 @@ import logging
 from dataclasses import dataclass
 from typing import Annotated
 
+from auto_gen_explore.agents.tool_execution import tool_concurrency
+
 _logger = logging.getLogger(__name__)
 
 
@@ -98,6 +100,7 @@ class MealsPlugin:
     # Meals
     #
 
+    @tool_concurrency(group="meals_state")
     def add_meal(
         self,
         name: str,
@@ -122,6 +125,7 @@ class MealsPlugin:
         else:
             return f"Dish {name} not found."
 
+    @tool_concurrency(group="meals_state")
     def remove_dish(
         self,
         name: str,
@@ -196,6 +200,7 @@ class MealsPlugin:
     #     self.time_to_be_ready = time
     #     return f"Time to be ready set to {time}."
 
+    @tool_concurrency(group="meals_state")
     def set_time_to_be_ready(
         self,
         time: str | datetime.datetime,
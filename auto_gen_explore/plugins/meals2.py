@@ -3,6 +3,9 @@ import logging
 from dataclasses import dataclass, asdict
 from typing import Annotated
 
+from auto_gen_explore.agents.templated_reflection import response_template
+from auto_gen_explore.plugins.intents import Intent
+
 _logger = logging.getLogger(__name__)
 
 # alternative version of MealsPlugin that requires the meal time to be passed in to get_meal_steps
@@ -99,6 +102,7 @@ class MealsPlugin:
     # Meals
     #
 
+    @response_template("{result}")
     def add_meal(
         self,
         name: str,
@@ -123,6 +127,7 @@ class MealsPlugin:
         else:
             return f"Dish {name} not found."
 
+    @response_template("{result}")
     def remove_dish(
         self,
         name: str,
@@ -206,6 +211,35 @@ class MealsPlugin:
     #     _logger.debug(f"Getting current date.")
     #     return datetime.datetime.now().date()
 
+    def intents(self) -> list[Intent]:
+        """Simple commands that can be handled without the LLM (e.g. "add frozen lasagne")"""
+        return [
+            Intent(
+                agent="meals_agent",
+                pattern=r"add (?:some |a |the )?(?P<frozen>frozen |fresh )?(?P<dish>[a-z]+)"
+                        r"(?: from (?P<from>frozen|fresh))?(?: to (?:the |my )?(?:meal|dinner|list))?",
+                tool=self.add_meal,
+                resolve=self._resolve_add_meal,
+                response="{result}",
+            ),
+            Intent(
+                agent="meals_agent",
+                pattern=r"remove (?:the )?(?P<dish>[a-z]+)(?: from (?:the |my )?(?:meal|dinner|list))?",
+                tool=self.remove_dish,
+                resolve=lambda match: {"name": match["dish"]} if match["dish"] in self.dish_instructions else None,
+                response="{result}",
+            ),
+        ]
+
+    def _resolve_add_meal(self, match) -> dict | None:
+        if match["dish"] not in self.dish_instructions:
+            return None
+        states = {state.strip() for state in (match["frozen"], match["from"]) if state}
+        if len(states) > 1:
+            return None  # e.g. "add frozen lasagne from fresh"
+        # default to fresh (as the meals agent is instructed to)
+        return {"name": match["dish"], "frozen": states == {"frozen"}}
+
     def save_state(self):
         return [asdict(d) for d in self.dishes]
 
@@ -0,0 +1,235 @@
+"""Running agent types in separate worker processes with AutoGen's gRPC worker runtime
+
+A GrpcWorkerAgentRuntimeHost routes messages between GrpcWorkerAgentRuntime workers (each agent
+type is registered by exactly one worker), so heavily used agent types can get a process - and a
+core - of their own. The host and workers here are all local: DistributedAgentWorkers spawns a
+worker process per group of agent types and waits for them to register.
+
+App modules run in workers must provide:
+    - register_agents(runtime, agent_types, conversation_store, input_provider)
+    - message_types - the message classes the agents publish (pydantic models, serialized as JSON)
+
+The handoff agents pass ConversationRefs rather than message lists, so they need a conversation
+store that's shared across processes: serve_conversation_store serves a ConversationStore from
+the host process (over a multiprocessing manager connection) and RemoteConversationStore is the
+client that workers use. It caches the contexts it has read or written - contexts are
+append-only, so cached messages never go stale - and fetches just the messages it doesn't have.
+
+The gRPC runtime needs autogen-ext's grpc extra - this project's distributed extra (poetry install
+--extras distributed), kept out of the main dependencies as it pins grpcio - so it's only imported
+when used.
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import threading
+from multiprocessing.managers import BaseManager
+from typing import Any, Sequence
+
+from autogen_core import try_get_known_serializers_for_type
+from autogen_core.models import LLMMessage
+
+from auto_gen_explore.agents.conversation_store import ConversationRef, ConversationStore, _Context
+from auto_gen_explore.agents.human_input import HumanInputProvider
+
+_logger = logging.getLogger(__name__)
+
+
+def _parse_address(address: str) -> tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+class _ConversationStoreService:
+    """ConversationStore shared with other processes (the manager serves each connection on its own thread)"""
+
+    def __init__(self):
+        self._store = ConversationStore()
+        self._lock = threading.Lock()
+
+    def start(self, session_id: str, messages: list[LLMMessage]) -> ConversationRef:
+        with self._lock:
+            return self._store.start(session_id, messages)
+
+    def append(self, ref: ConversationRef, messages: list[LLMMessage]) -> ConversationRef:
+        with self._lock:
+            return self._store.append(ref, messages)
+
+    def read_context(self, session_id: str, context_id: str, start: int, end: int
+                     ) -> tuple[ConversationRef | None, list[LLMMessage]]:
+        with self._lock:
+            return self._store.read_context(session_id, context_id, start, end)
+
+    def end_session(self, session_id: str):
+        with self._lock:
+            self._store.end_session(session_id)
+
+
+_served_store: _ConversationStoreService | None = None
+
+
+def _get_served_store() -> _ConversationStoreService:
+    return _served_store
+
+
+class _ConversationStoreManager(BaseManager):
+    pass
+
+
+_ConversationStoreManager.register("conversation_store", callable=_get_served_store)
+
+
+def serve_conversation_store(address: str, authkey: bytes):
+    """Serve a ConversationStore from this process (on a background thread) for RemoteConversationStores"""
+    global _served_store
+    _served_store = _ConversationStoreService()
+    manager = _ConversationStoreManager(address=_parse_address(address), authkey=authkey)
+    server = manager.get_server()
+    threading.Thread(target=server.serve_forever, name="conversation-store", daemon=True).start()
+    _logger.info(f"Serving conversation store on {address}")
+
+
+class RemoteConversationStore(ConversationStore):
+    """ConversationStore client for a store served by serve_conversation_store (see module docstring)
+
+    The local contexts are a cache - sessions beyond `max_sessions` are dropped (oldest first) and
+    fetched again if they're needed.
+    """
+
+    def __init__(self, address: str, authkey: bytes, max_sessions: int = 1000):
+        super().__init__()
+        manager = _ConversationStoreManager(address=_parse_address(address), authkey=authkey)
+        manager.connect()
+        self._service = manager.conversation_store()
+        self._max_sessions = max_sessions
+
+    def _cache_context(self, session_id: str, context: _Context):
+        contexts = self._sessions.get(session_id)
+        if contexts is None:
+            while len(self._sessions) >= self._max_sessions:
+                self._sessions.pop(next(iter(self._sessions)))
+            contexts = self._sessions[session_id] = {}
+        contexts[context.context_id] = context
+
+    def _context(self, ref: ConversationRef) -> _Context:
+        context = self._sessions.get(ref.session_id, {}).get(ref.context_id)
+        if context is None or context.length < ref.length:
+            parent, messages = self._service.read_context(
+                ref.session_id, ref.context_id, len(context.messages) if context is not None else 0, ref.length)
+            if context is None:
+                context = _Context(ref.context_id, parent)
+                self._cache_context(ref.session_id, context)
+            context.messages.extend(messages)
+        return context
+
+    def start(self, session_id: str, messages: Sequence[LLMMessage] = ()) -> ConversationRef:
+        ref = self._service.start(session_id, list(messages))
+        context = _Context(ref.context_id, None)
+        context.messages.extend(messages)
+        self._cache_context(session_id, context)
+        return ref
+
+    def append(self, ref: ConversationRef, messages: Sequence[LLMMessage]) -> ConversationRef:
+        new_ref = self._service.append(ref, list(messages))
+        if new_ref.context_id != ref.context_id:
+            # forked - the new context is just `messages` after `ref`
+            context = _Context(new_ref.context_id, ref)
+            context.messages.extend(messages)
+            self._cache_context(ref.session_id, context)
+        else:
+            context = self._sessions.get(ref.session_id, {}).get(ref.context_id)
+            if context is not None and context.length == ref.length:
+                context.messages.extend(messages)
+        return new_ref
+
+    def end_session(self, session_id: str):
+        self._service.end_session(session_id)
+        super().end_session(session_id)
+
+
+def start_agent_host(address: str):
+    """Start a gRPC agent host in this process (returns the GrpcWorkerAgentRuntimeHost)"""
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntimeHost
+    host = GrpcWorkerAgentRuntimeHost(address=address)
+    host.start()
+    return host
+
+
+async def start_worker_runtime(host_address: str, message_types: Sequence[type]):
+    """Start a gRPC worker runtime connected to the host (returns the GrpcWorkerAgentRuntime)"""
+    from autogen_ext.runtimes.grpc import GrpcWorkerAgentRuntime
+    runtime = GrpcWorkerAgentRuntime(host_address=host_address)
+    for message_type in message_types:
+        runtime.add_message_serializer(try_get_known_serializers_for_type(message_type))
+    await runtime.start()
+    return runtime
+
+
+async def _run_agent_worker(app_module: str, agent_types: Sequence[str], host_address: str,
+                            store_address: str | None, authkey: bytes | None, ready):
+    app = importlib.import_module(app_module)
+    runtime = await start_worker_runtime(host_address, app.message_types)
+    conversation_store = RemoteConversationStore(store_address, authkey) if store_address is not None else None
+    await app.register_agents(runtime, agent_types, conversation_store, None)
+    _logger.info(f"Worker registered {', '.join(agent_types)}")
+    ready.set()
+    await runtime.stop_when_signal()
+
+
+def _agent_worker_main(app_module: str, agent_types: Sequence[str], host_address: str,
+                       store_address: str | None, authkey: bytes | None, ready):
+    logging.basicConfig(format=f"[{'+'.join(agent_types)} %(asctime)s - %(name)s:%(lineno)d - %(levelname)s] %(message)s")
+    asyncio.run(_run_agent_worker(app_module, agent_types, host_address, store_address, authkey, ready))
+
+
+class DistributedAgentWorkers:
+    """Worker processes that register an app's agent types with the gRPC host - one process per group"""
+
+    def __init__(self, app_module: str, agent_type_groups: Sequence[Sequence[str]], host_address: str,
+                 store_address: str | None = None, authkey: bytes | None = None):
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: list[tuple[Any, Any]] = []
+        for agent_types in agent_type_groups:
+            ready = self._context.Event()
+            process = self._context.Process(
+                target=_agent_worker_main,
+                args=(app_module, list(agent_types), host_address, store_address, authkey, ready),
+                name=f"agent-worker-{'+'.join(agent_types)}", daemon=True)
+            self._workers.append((process, ready))
+
+    async def start(self, timeout: float = 60):
+        """Start the workers and wait for them to register their agents"""
+        for process, _ in self._workers:
+            process.start()
+        for process, ready in self._workers:
+            if not await asyncio.to_thread(ready.wait, timeout):
+                raise TimeoutError(f"Worker {process.name} didn't register its agents within {timeout}s")
+
+    async def stop(self):
+        for process, _ in self._workers:
+            process.terminate()  # stop_when_signal stops the worker runtime on SIGTERM
+        for process, _ in self._workers:
+            await asyncio.to_thread(process.join)
+
+
+class SessionEndWatcher(HumanInputProvider):
+    """Wraps an input provider to signal when sessions end (the agents call end_session)"""
+
+    def __init__(self, input_provider: HumanInputProvider):
+        self._input_provider = input_provider
+        self._ended: dict[str, asyncio.Event] = {}
+
+    def _event(self, session_id: str) -> asyncio.Event:
+        return self._ended.setdefault(session_id, asyncio.Event())
+
+    async def get_input(self, session_id: str, prompt: str) -> str:
+        return await self._input_provider.get_input(session_id, prompt)
+
+    def end_session(self, session_id: str):
+        self._input_provider.end_session(session_id)
+        self._event(session_id).set()
+
+    async def wait_for_session_end(self, session_id: str):
+        await self._event(session_id).wait()
+        self._ended.pop(session_id, None)
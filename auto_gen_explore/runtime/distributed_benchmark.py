@@ -0,0 +1,136 @@
+"""Benchmark of per-message overhead for the gRPC worker runtime vs SingleThreadedAgentRuntime
+
+A ping agent and a pong agent publish messages back and forth `--round-trips` times. With the
+single threaded runtime both agents are in this process; in distributed mode the pong agent runs
+in a worker process (via runtime.distributed.DistributedAgentWorkers) so every message is
+serialized and goes through the gRPC host. Each message can carry `--context-messages` chat
+messages to show how payload size affects the cost (compare with 0, i.e. passing a
+ConversationRef-sized message as the handoff agents do).
+
+Usage:
+    python -m auto_gen_explore.runtime.distributed_benchmark --round-trips 500 --context-messages 0 20
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Sequence
+
+from autogen_core import (AgentRuntime, MessageContext, RoutedAgent, SingleThreadedAgentRuntime, TopicId,
+                          TypeSubscription, message_handler)
+from autogen_core.models import LLMMessage, UserMessage
+from pydantic import BaseModel
+
+from auto_gen_explore.runtime.distributed import DistributedAgentWorkers, start_agent_host, start_worker_runtime
+
+ping_topic_type = "Ping"
+pong_topic_type = "Pong"
+
+
+class Ping(BaseModel):
+    seq: int
+    context: List[LLMMessage]
+
+
+class Pong(BaseModel):
+    seq: int
+    context: List[LLMMessage]
+
+
+message_types = [Ping, Pong]
+
+
+class PingAgent(RoutedAgent):
+    def __init__(self, round_trips: int, done: asyncio.Event) -> None:
+        super().__init__("Sends pings until it has had `round_trips` pongs")
+        self._round_trips = round_trips
+        self._done = done
+
+    @message_handler
+    async def handle_pong(self, message: Pong, ctx: MessageContext) -> None:
+        if message.seq >= self._round_trips:
+            self._done.set()
+            return
+        await self.publish_message(Ping(seq=message.seq + 1, context=message.context),
+                                   topic_id=TopicId(ping_topic_type, source=self.id.key))
+
+
+class PongAgent(RoutedAgent):
+    def __init__(self) -> None:
+        super().__init__("Replies to pings")
+
+    @message_handler
+    async def handle_ping(self, message: Ping, ctx: MessageContext) -> None:
+        await self.publish_message(Pong(seq=message.seq, context=message.context),
+                                   topic_id=TopicId(pong_topic_type, source=self.id.key))
+
+
+async def register_agents(runtime: AgentRuntime, agent_types: Sequence[str], conversation_store=None,
+                          input_provider=None, round_trips: int = 0, done: asyncio.Event | None = None):
+    """Register the ping (subscribed to pongs) and/or pong (subscribed to pings) agents"""
+    if ping_topic_type in agent_types:
+        await PingAgent.register(runtime, "ping_agent", lambda: PingAgent(round_trips, done))
+        await runtime.add_subscription(TypeSubscription(topic_type=pong_topic_type, agent_type="ping_agent"))
+    if pong_topic_type in agent_types:
+        await PongAgent.register(runtime, "pong_agent", lambda: PongAgent())
+        await runtime.add_subscription(TypeSubscription(topic_type=ping_topic_type, agent_type="pong_agent"))
+
+
+def _context(messages: int, message_chars: int) -> list[LLMMessage]:
+    return [UserMessage(content="x" * message_chars, source="User") for _ in range(messages)]
+
+
+async def _run_round_trips(runtime: AgentRuntime, done: asyncio.Event, context: list[LLMMessage]) -> float:
+    start = time.perf_counter()
+    await runtime.publish_message(Ping(seq=1, context=context), topic_id=TopicId(ping_topic_type, source="benchmark"))
+    await done.wait()
+    return time.perf_counter() - start
+
+
+async def benchmark_single_threaded(round_trips: int, context: list[LLMMessage]) -> float:
+    done = asyncio.Event()
+    runtime = SingleThreadedAgentRuntime()
+    await register_agents(runtime, [ping_topic_type, pong_topic_type], round_trips=round_trips, done=done)
+    runtime.start()
+    elapsed = await _run_round_trips(runtime, done, context)
+    await runtime.stop()
+    return elapsed
+
+
+async def benchmark_distributed(round_trips: int, context: list[LLMMessage], host_address: str) -> float:
+    host = start_agent_host(host_address)
+    workers = DistributedAgentWorkers(__name__, [[pong_topic_type]], host_address)
+    await workers.start()
+    done = asyncio.Event()
+    runtime = await start_worker_runtime(host_address, message_types)
+    await register_agents(runtime, [ping_topic_type], round_trips=round_trips, done=done)
+    try:
+        return await _run_round_trips(runtime, done, context)
+    finally:
+        await runtime.stop()
+        await workers.stop()
+        await host.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Per-message overhead of the gRPC worker runtime")
+    parser.add_argument("--round-trips", type=int, default=500)
+    parser.add_argument("--context-messages", type=int, nargs="+", default=[0, 20],
+                        help="Chat messages carried by each message (one run for each value)")
+    parser.add_argument("--message-chars", type=int, default=400, help="Length of each chat message")
+    parser.add_argument("--host-address", default="localhost:50070")
+    args = parser.parse_args()
+
+    messages = 2 * args.round_trips
+    print(f"{'runtime':<16} {'context':>8} {'total (s)':>10} {'per message (ms)':>17}")
+    for context_messages in args.context_messages:
+        context = _context(context_messages, args.message_chars)
+        for name, run in [
+            ("single-threaded", lambda: benchmark_single_threaded(args.round_trips, context)),
+            ("distributed", lambda: benchmark_distributed(args.round_trips, context, args.host_address)),
+        ]:
+            elapsed = await run()
+            print(f"{name:<16} {context_messages:>8} {elapsed:>10.3f} {elapsed / messages * 1000:>17.3f}", flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
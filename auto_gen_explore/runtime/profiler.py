@@ -0,0 +1,260 @@
+"""Profiling message handling in SingleThreadedAgentRuntime
+
+RuntimeProfiler records, for each message an agent handles:
+    - queue latency: from publish_message/send_message to the runtime taking the message off its
+      queue (recorded by ProfilingInterventionHandler, as intervention handlers run at dequeue)
+    - dispatch latency: from publish/send to the agent's handler starting
+    - handler duration, and whether the handler raised
+aggregated by agent type and message type, along with the number of messages in flight (queued
+in the runtime, and being handled by each agent type).
+
+Use single_threaded_runtime(profiler) to create a runtime with the profiler attached - agents must
+be registered after that, as the profiler wraps the agents created by the runtime's factories.
+
+With `interval_seconds` a summary is logged periodically (the profiler's logger is at INFO), and
+with `trace_path` every handled message (and each summary) is appended to a JSONL trace.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, TextIO
+
+from autogen_core import AgentId, DefaultInterventionHandler, MessageContext, SingleThreadedAgentRuntime
+
+_logger = logging.getLogger(__name__)
+
+_max_tracked_messages = 10000  # publish/dequeue times kept for messages not yet handled
+
+
+def _percentile(values: Deque[float], percentile: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+@dataclass
+class HandlerStats:
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    # recent samples for percentiles
+    durations: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+    queue_latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+    dispatch_latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "handler_mean_ms": self.total_seconds / self.count * 1000 if self.count > 0 else 0.0,
+            "handler_p95_ms": _percentile(self.durations, 0.95) * 1000,
+            "handler_max_ms": self.max_seconds * 1000,
+            "queue_p50_ms": _percentile(self.queue_latencies, 0.5) * 1000,
+            "queue_p95_ms": _percentile(self.queue_latencies, 0.95) * 1000,
+            "dispatch_p95_ms": _percentile(self.dispatch_latencies, 0.95) * 1000,
+        }
+
+
+class ProfilingInterventionHandler(DefaultInterventionHandler):
+    """Records when the runtime takes each published/sent message off its queue"""
+
+    def __init__(self, profiler: "RuntimeProfiler"):
+        self._profiler = profiler
+
+    async def on_send(self, message: Any, *, message_context: MessageContext, recipient: AgentId) -> Any:
+        self._profiler._on_dequeue(message_context.message_id)
+        return message
+
+    async def on_publish(self, message: Any, *, message_context: MessageContext) -> Any:
+        self._profiler._on_dequeue(message_context.message_id)
+        return message
+
+
+class RuntimeProfiler:
+    """Per agent type/message type handler latency and in-flight counts (see module docstring)"""
+
+    def __init__(self, interval_seconds: float = 0, trace_path: str | None = None):
+        self._interval_seconds = interval_seconds
+        self._trace: TextIO | None = open(trace_path, "a", encoding="utf-8", buffering=1) if trace_path else None
+        self.intervention_handler = ProfilingInterventionHandler(self)
+        self._runtimes: list[SingleThreadedAgentRuntime] = []
+        self._published: OrderedDict[str, float] = OrderedDict()  # message id -> publish time
+        self._dequeued: OrderedDict[str, float] = OrderedDict()  # message id -> dequeue time
+        self._undequeued = 0
+        self._stats: dict[tuple[str, str], HandlerStats] = defaultdict(HandlerStats)
+        self._handling: dict[str, int] = defaultdict(int)  # agent type -> handlers running
+        self._report_task: asyncio.Task | None = None
+
+    @staticmethod
+    def _track(times: OrderedDict[str, float], message_id: str, timestamp: float):
+        times[message_id] = timestamp
+        if len(times) > _max_tracked_messages:
+            times.popitem(last=False)
+
+    def _on_publish(self, message_id: str):
+        self._track(self._published, message_id, time.perf_counter())
+        self._undequeued += 1
+
+    def _on_dequeue(self, message_id: str):
+        self._track(self._dequeued, message_id, time.perf_counter())
+        if message_id in self._published:
+            self._undequeued -= 1
+
+    def instrument(self, runtime: SingleThreadedAgentRuntime):
+        """Profile the messages published/sent on the runtime and the agents it creates"""
+        self._runtimes.append(runtime)
+        publish_message = runtime.publish_message
+        send_message = runtime.send_message
+        register_factory = runtime.register_factory
+
+        async def profiled_publish_message(message, topic_id, *, message_id: str | None = None, **kwargs):
+            message_id = message_id or str(uuid.uuid4())
+            self._on_publish(message_id)
+            return await publish_message(message, topic_id, message_id=message_id, **kwargs)
+
+        async def profiled_send_message(message, recipient, *, message_id: str | None = None, **kwargs):
+            message_id = message_id or str(uuid.uuid4())
+            self._on_publish(message_id)
+            return await send_message(message, recipient, message_id=message_id, **kwargs)
+
+        async def profiled_register_factory(type, agent_factory, **kwargs):
+            if len(inspect.signature(agent_factory).parameters) != 0:
+                # deprecated (runtime, id) factories - registered without profiling
+                return await register_factory(type, agent_factory, **kwargs)
+
+            async def factory():
+                agent = agent_factory()
+                if inspect.isawaitable(agent):
+                    agent = await agent
+                self._instrument_agent(agent)
+                return agent
+            return await register_factory(type, factory, **kwargs)
+
+        runtime.publish_message = profiled_publish_message
+        runtime.send_message = profiled_send_message
+        runtime.register_factory = profiled_register_factory
+        self._start_reporting()
+
+    def _instrument_agent(self, agent):
+        on_message = agent.on_message
+
+        async def profiled_on_message(message: Any, ctx: MessageContext) -> Any:
+            agent_type = agent.id.type
+            start = time.perf_counter()
+            self._handling[agent_type] += 1
+            error = None
+            try:
+                return await on_message(message, ctx)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._handling[agent_type] -= 1
+                self._record(agent.id, message, ctx, start, time.perf_counter(), error)
+
+        agent.on_message = profiled_on_message
+
+    def _record(self, agent_id: AgentId, message: Any, ctx: MessageContext, start: float, end: float,
+                error: BaseException | None):
+        published = self._published.get(ctx.message_id)
+        dequeued = self._dequeued.get(ctx.message_id)
+        message_type = type(message).__name__
+        stats = self._stats[(agent_id.type, message_type)]
+        stats.count += 1
+        stats.errors += 1 if error is not None else 0
+        stats.total_seconds += end - start
+        stats.max_seconds = max(stats.max_seconds, end - start)
+        stats.durations.append(end - start)
+        if published is not None:
+            stats.dispatch_latencies.append(start - published)
+            if dequeued is not None:
+                stats.queue_latencies.append(dequeued - published)
+        if self._trace is not None:
+            self._write_trace({
+                "type": "handler",
+                "ts": time.time(),
+                "message_id": ctx.message_id,
+                "kind": "send" if ctx.is_rpc else "publish",
+                "message_type": message_type,
+                "agent_type": agent_id.type,
+                "agent_key": agent_id.key,
+                "topic": str(ctx.topic_id) if ctx.topic_id is not None else None,
+                "queue_ms": (dequeued - published) * 1000 if published is not None and dequeued is not None else None,
+                "dispatch_ms": (start - published) * 1000 if published is not None else None,
+                "handler_ms": (end - start) * 1000,
+                "error": repr(error) if error is not None else None,
+            })
+
+    def _write_trace(self, record: dict[str, Any]):
+        try:
+            self._trace.write(json.dumps(record) + "\n")
+        except (OSError, ValueError) as e:
+            _logger.warning(f"Failed to write runtime profile trace: {e}")
+
+    def summary(self) -> dict[str, Any]:
+        """Current in-flight counts and the handler stats for each agent type/message type"""
+        return {
+            "in_flight": {
+                "queued": sum(runtime.unprocessed_messages_count for runtime in self._runtimes),
+                "published_not_dequeued": self._undequeued,
+                "handling": {agent_type: count for agent_type, count in self._handling.items() if count > 0},
+            },
+            "handlers": {f"{agent_type}/{message_type}": stats.to_dict()
+                         for (agent_type, message_type), stats in sorted(self._stats.items())},
+        }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        in_flight = summary["in_flight"]
+        lines = [f"Runtime: {in_flight['queued']} queued, handling "
+                 + (", ".join(f"{agent_type}={count}" for agent_type, count in in_flight["handling"].items()) or "none")]
+        for name, stats in summary["handlers"].items():
+            lines.append(
+                f"    {name}: {stats['count']} handled ({stats['errors']} errors), "
+                f"handler mean {stats['handler_mean_ms']:.1f}ms p95 {stats['handler_p95_ms']:.1f}ms "
+                f"max {stats['handler_max_ms']:.1f}ms, queue p95 {stats['queue_p95_ms']:.1f}ms, "
+                f"dispatch p95 {stats['dispatch_p95_ms']:.1f}ms")
+        return "\n".join(lines)
+
+    def _start_reporting(self):
+        if self._interval_seconds <= 0 or self._report_task is not None:
+            return
+        try:
+            self._report_task = asyncio.get_running_loop().create_task(self._report_loop())
+        except RuntimeError:
+            _logger.warning("No running event loop - periodic runtime profile summaries are disabled")
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self._interval_seconds)
+            self.report()
+
+    def report(self):
+        """Log the summary (and add it to the trace)"""
+        _logger.info(self.format_summary())
+        if self._trace is not None:
+            self._write_trace({"type": "summary", "ts": time.time(), **self.summary()})
+
+    def close(self):
+        if self._report_task is not None:
+            self._report_task.cancel()
+            self._report_task = None
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+def single_threaded_runtime(profiler: RuntimeProfiler | None = None) -> SingleThreadedAgentRuntime:
+    """SingleThreadedAgentRuntime with the profiler attached (if there is one)"""
+    if profiler is None:
+        return SingleThreadedAgentRuntime()
+    runtime = SingleThreadedAgentRuntime(intervention_handlers=[profiler.intervention_handler])
+    profiler.instrument(runtime)
+    return runtime
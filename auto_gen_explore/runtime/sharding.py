@@ -0,0 +1,286 @@
+"""Sharding handoff sessions across worker processes
+
+The core handoff apps run every session on one SingleThreadedAgentRuntime, so one core does all
+the tool calls and message (de)serialization for every session. ShardedSessionDispatcher starts
+N worker processes, each running its own runtime from the app's create_runtime, and routes each
+session to one of them by consistent hash of the session id (the TopicId source the agents use as
+self.id.key). All of a session's agents are in one process, so handoffs stay in-process.
+
+An app module can be sharded if it provides:
+    - create_runtime(input_provider, profiler) - the runtime with the agents registered (profiled
+      by the RuntimeProfiler if it isn't None)
+    - UserLogin and user_topic_type - published to start a session
+
+Human input is handled by the dispatcher: when an agent in a worker asks for input, the prompt
+is sent to the dispatcher, which gets the input from its own HumanInputProvider (console,
+scripted, websocket) and sends it back to the session's shard.
+
+Per-shard stats (see ShardedSessionDispatcher.stats):
+    - queued: messages sent to the shard that it hasn't picked up yet
+    - busy: sessions that have been given input and haven't asked for more yet (i.e. work in
+      progress on the shard)
+    - sessions: active sessions on the shard
+
+If a shard fails (an exception in the worker - e.g. importing the app or creating its runtime - or
+the process exiting without stopping) the dispatcher raises ShardError from start() and
+wait_for_sessions() rather than waiting for it forever.
+"""
+import asyncio
+import bisect
+import hashlib
+import importlib
+import logging
+import multiprocessing
+import queue
+from dataclasses import dataclass, field
+from typing import Any
+
+from autogen_core import TopicId
+
+from auto_gen_explore.models import factory
+from auto_gen_explore.agents.human_input import HumanInputProvider, QueueInputProvider
+
+_logger = logging.getLogger(__name__)
+
+_poll_seconds = 1.0  # how often the dispatcher checks the shards are still alive while waiting for them
+
+
+class ShardError(RuntimeError):
+    """A shard failed, or exited without being stopped"""
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """Maps keys to shards so that changing the number of shards only moves ~1/N of the keys"""
+
+    def __init__(self, shards: int, replicas: int = 100):
+        if shards <= 0:
+            raise ValueError("shards must be greater than 0")
+        points = sorted((_hash(f"shard-{shard}-{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self._hashes = [hash for hash, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+class _ShardInputProvider(QueueInputProvider):
+    """Input provider for a worker's agents - prompts go to the dispatcher, input comes back on the queue"""
+
+    def __init__(self, shard: int, outbox):
+        super().__init__()
+        self._shard = shard
+        self._outbox = outbox
+
+    async def prompt(self, session_id: str, prompt: str):
+        self._outbox.put(("prompt", self._shard, session_id, prompt))
+
+    def end_session(self, session_id: str):
+        super().end_session(session_id)
+        self._outbox.put(("ended", self._shard, session_id, None))
+
+
+async def _run_shard(shard: int, app_module: str, inbox, outbox):
+    app = importlib.import_module(app_module)
+    input_provider = _ShardInputProvider(shard, outbox)
+    profiler = factory.runtime_profiler()
+    runtime = await app.create_runtime(input_provider, profiler)
+    runtime.start()
+    outbox.put(("ready", shard, None, None))
+    while True:
+        kind, session_id, text = await asyncio.to_thread(inbox.get)
+        outbox.put(("received", shard, session_id, None))
+        if kind == "stop":
+            break
+        if kind == "login":
+            await runtime.publish_message(app.UserLogin(), topic_id=TopicId(app.user_topic_type, source=session_id))
+        elif kind == "input":
+            input_provider.put_input(session_id, text)
+    await runtime.stop_when_idle()
+    if profiler is not None:
+        profiler.report()
+        profiler.close()
+    outbox.put(("stopped", shard, None, None))
+
+
+def _shard_main(shard: int, app_module: str, inbox, outbox):
+    logging.basicConfig(format=f"[shard {shard} %(asctime)s - %(name)s:%(lineno)d - %(levelname)s] %(message)s")
+    try:
+        asyncio.run(_run_shard(shard, app_module, inbox, outbox))
+    except BaseException as e:
+        # let the dispatcher know rather than leaving it waiting for the shard
+        outbox.put(("error", shard, None, f"{type(e).__name__}: {e}"))
+        raise
+
+
+@dataclass
+class ShardStats:
+    shard: int
+    sent: int = 0
+    received: int = 0
+    sessions: set[str] = field(default_factory=set)
+    busy_sessions: set[str] = field(default_factory=set)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "shard": self.shard,
+            "queued": self.sent - self.received,
+            "busy": len(self.busy_sessions),
+            "sessions": len(self.sessions),
+        }
+
+
+class ShardedSessionDispatcher:
+    """Runs an app's sessions across `shards` worker processes (see module docstring)"""
+
+    def __init__(self, app_module: str, shards: int, input_provider: HumanInputProvider):
+        self._app_module = app_module
+        self._shard_count = shards
+        self._input_provider = input_provider
+        self._ring = ConsistentHashRing(shards)
+        self._context = multiprocessing.get_context("spawn")
+        self._outbox = self._context.Queue()
+        self._inboxes = [self._context.Queue() for _ in range(shards)]
+        self._processes: list[multiprocessing.Process] = []
+        self._stats = [ShardStats(shard) for shard in range(shards)]
+        self._ready = 0
+        self._stopped: set[int] = set()
+        self._exited: set[int] = set()  # shards seen to have exited (but not stopped)
+        self._error: ShardError | None = None
+        self._all_ready = asyncio.Event()
+        self._sessions_ended = asyncio.Event()
+        self._input_tasks: set[asyncio.Task] = set()
+        self._reader: asyncio.Task | None = None
+
+    def shard_for(self, session_id: str) -> int:
+        return self._ring.shard_for(session_id)
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [stats.to_dict() for stats in self._stats]
+
+    def _send(self, shard: int, kind: str, session_id: str | None = None, text: str | None = None):
+        self._stats[shard].sent += 1
+        self._inboxes[shard].put((kind, session_id, text))
+
+    async def start(self, timeout: float = 60):
+        for shard in range(self._shard_count):
+            process = self._context.Process(
+                target=_shard_main, args=(shard, self._app_module, self._inboxes[shard], self._outbox),
+                name=f"session-shard-{shard}", daemon=True)
+            process.start()
+            self._processes.append(process)
+        self._reader = asyncio.create_task(self._read_outbox())
+        try:
+            await asyncio.wait_for(self._all_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            self._fail(ShardError(f"The shards didn't start within {timeout}s"))
+        if self._error is not None:
+            await self._terminate()
+            raise self._error
+
+    def login(self, session_id: str):
+        """Start a session on its shard"""
+        shard = self.shard_for(session_id)
+        self._stats[shard].sessions.add(session_id)
+        self._stats[shard].busy_sessions.add(session_id)
+        self._sessions_ended.clear()
+        self._send(shard, "login", session_id)
+
+    def send_input(self, session_id: str, text: str):
+        shard = self.shard_for(session_id)
+        self._stats[shard].busy_sessions.add(session_id)
+        self._send(shard, "input", session_id, text)
+
+    async def _get_input(self, session_id: str, prompt: str):
+        text = await self._input_provider.get_input(session_id, prompt)
+        self.send_input(session_id, text)
+
+    def _on_session_ended(self, shard: int, session_id: str):
+        self._stats[shard].sessions.discard(session_id)
+        self._stats[shard].busy_sessions.discard(session_id)
+        self._input_provider.end_session(session_id)
+        if all(len(stats.sessions) == 0 for stats in self._stats):
+            self._sessions_ended.set()
+
+    def _fail(self, error: ShardError):
+        if self._error is None:
+            _logger.error(str(error))
+            self._error = error
+        # wake anything waiting on the shards
+        self._all_ready.set()
+        self._sessions_ended.set()
+
+    def _check_processes(self):
+        for shard, process in enumerate(self._processes):
+            if shard in self._stopped or process.is_alive():
+                continue
+            if shard in self._exited:
+                self._fail(ShardError(f"Shard {shard} exited (exit code {process.exitcode}) without being stopped"))
+            else:
+                # it may have exited just after sending "stopped" - check again after the next poll
+                self._exited.add(shard)
+
+    async def _get_message(self) -> tuple[str, int, str | None, str | None] | None:
+        """The next message from the shards (None if a shard has failed)"""
+        while self._error is None:
+            try:
+                return await asyncio.to_thread(self._outbox.get, True, _poll_seconds)
+            except queue.Empty:
+                self._check_processes()
+        return None
+
+    async def _read_outbox(self):
+        while len(self._stopped) < self._shard_count:
+            message = await self._get_message()
+            if message is None:
+                return
+            kind, shard, session_id, text = message
+            if kind == "ready":
+                self._ready += 1
+                if self._ready == self._shard_count:
+                    self._all_ready.set()
+            elif kind == "received":
+                self._stats[shard].received += 1
+            elif kind == "prompt":
+                self._stats[shard].busy_sessions.discard(session_id)
+                task = asyncio.create_task(self._get_input(session_id, text))
+                self._input_tasks.add(task)
+                task.add_done_callback(self._input_tasks.discard)
+            elif kind == "ended":
+                self._on_session_ended(shard, session_id)
+            elif kind == "stopped":
+                self._stopped.add(shard)
+            elif kind == "error":
+                self._stopped.add(shard)
+                self._fail(ShardError(f"Shard {shard} failed: {text}"))
+
+    async def wait_for_sessions(self):
+        """Wait until all the sessions that have been started have ended"""
+        await self._sessions_ended.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _terminate(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            await asyncio.to_thread(process.join)
+
+    async def stop(self):
+        if self._error is None:
+            for shard in range(self._shard_count):
+                self._send(shard, "stop")
+        if self._reader is not None:
+            await self._reader
+        if self._error is not None:
+            # the failed shard won't stop the others' runtimes
+            await self._terminate()
+            return
+        for process in self._processes:
+            await asyncio.to_thread(process.join)
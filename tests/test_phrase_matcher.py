@@ -0,0 +1,130 @@
+import asyncio
+import random
+
+import pytest
+from autogen_agentchat.base import TerminatedException
+from autogen_agentchat.messages import TextMessage
+
+from auto_gen_explore.agents.phrase_matcher import PhraseMatcher, _skip_depth
+from auto_gen_explore.agents.termination import AgentTextMessageTermination, IncrementalTermination, TextContentTermination
+
+
+def naive_find_all(phrases, text, ignore_case=False):
+    """(end index, phrase) for every occurrence of every phrase, checking each position in turn"""
+    normalize = str.lower if ignore_case else str
+    text = normalize(text)
+    return {(start + len(phrase), phrase)
+            for phrase in phrases
+            for start in range(len(text) - len(phrase) + 1)
+            if text.startswith(normalize(phrase), start)}
+
+
+def random_cases(alphabet, count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        phrases = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 7)))
+                   for _ in range(rng.randint(1, 6))]
+        text = "".join(rng.choice(alphabet + "xy") for _ in range(rng.randint(0, 80)))
+        yield phrases, text
+
+
+def check(matcher, phrases, text, ignore_case=False):
+    expected = naive_find_all(phrases, text, ignore_case)
+    found = list(matcher.find_all(text))
+    assert len(found) == len(set(found)), (phrases, text)
+    assert set(found) == expected, (phrases, text)
+    assert [end for end, _ in found] == sorted(end for end, _ in found), (phrases, text)
+    first = matcher.search(text)
+    if len(expected) == 0:
+        assert first is None, (phrases, text)
+    else:
+        first_end = min(end for end, _ in expected)
+        assert (first_end, first) in expected, (phrases, text)
+
+
+@pytest.mark.parametrize("alphabet", ["ab", "abc"])
+def test_matches_naive(alphabet):
+    for phrases, text in random_cases(alphabet, 500, seed=len(alphabet)):
+        check(PhraseMatcher(phrases), phrases, text)
+
+
+@pytest.mark.parametrize("alphabet", ["aB", "aBc"])
+def test_matches_naive_ignore_case(alphabet):
+    for phrases, text in random_cases(alphabet, 500, seed=len(alphabet)):
+        text = "".join(char.swapcase() if index % 3 == 0 else char for index, char in enumerate(text))
+        check(PhraseMatcher(phrases, ignore_case=True), phrases, text, ignore_case=True)
+
+
+def test_overlapping_phrases():
+    phrases = ["he", "she", "his", "hers"]
+    text = "ushers and his shes"
+    matcher = PhraseMatcher(phrases)
+    check(matcher, phrases, text)
+    assert list(matcher.find_all("ushers")) == [(4, "she"), (4, "he"), (6, "hers")]
+    assert matcher.search(text) == "she"
+
+
+def test_phrases_longer_than_skip_depth():
+    long_phrase = "ab" * _skip_depth + "c"
+    phrases = [long_phrase, "abab" + "x", "ba"]
+    text = "x" + "ab" * (_skip_depth + 3) + "c" + "ababx"
+    check(PhraseMatcher(phrases), phrases, text)
+
+
+def test_empty_phrases():
+    with pytest.raises(ValueError):
+        PhraseMatcher([])
+    with pytest.raises(ValueError):
+        PhraseMatcher(["done", ""])
+
+
+class RecordingTermination(IncrementalTermination):
+    """Records the messages each call examines"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.examined: list[list[str]] = []
+
+    def _check(self, messages):
+        self.examined.append([message.content for message in messages])
+        return None
+
+
+def test_incremental_cursor():
+    messages = [TextMessage(source="user", content=str(index)) for index in range(5)]
+
+    async def run():
+        full = RecordingTermination()
+        delta = RecordingTermination()
+        for index in range(len(messages)):
+            await full(messages[:index + 1])  # the whole thread so far
+            await delta(messages[index:index + 1])  # just the new message
+        # a new thread (the message at the cursor differs) is examined from the start
+        await full([TextMessage(source="user", content="a"), TextMessage(source="user", content="b")])
+        await full.reset()
+        await full(messages[:2])
+        return full.examined, delta.examined
+
+    full, delta = asyncio.run(run())
+    assert delta == [[str(index)] for index in range(5)]
+    assert full == delta + [["a", "b"], ["0", "1"]]
+
+
+def test_latching():
+    def done():
+        return TextMessage(source="assistant", content="TERMINATE")
+
+    async def run():
+        latching = TextContentTermination("TERMINATE")
+        assert await latching([done()]) is not None
+        with pytest.raises(TerminatedException):
+            await latching([done()])
+        await latching.reset()
+        assert await latching([done()]) is not None
+
+        agent_text = AgentTextMessageTermination()
+        assert await agent_text([done()]) is not None
+        assert not agent_text.terminated
+        assert await agent_text([done()]) is not None
+
+    asyncio.run(run())